@@ -11,4 +11,5 @@ admin.site.register(models.UserMoneylineBet)
 admin.site.register(models.HandicapBetInfo)
 admin.site.register(models.UserHandicapBet)
 admin.site.register(models.TotalObjectsBetInfo)
-admin.site.register(models.UserTotalObjectsBet)
\ No newline at end of file
+admin.site.register(models.UserTotalObjectsBet)
+admin.site.register(models.TaskRun)
\ No newline at end of file
@@ -1,7 +1,12 @@
 import requests
 import json
 import environ
+import time
 from datetime import date, timedelta
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .telemetry import increment
+from .tracing import span, set_attributes
 
 
 def get_date_str(arg_date: date) -> str: 
@@ -20,7 +25,8 @@ def get_date_str(arg_date: date) -> str:
     return date_str
 
 
-def get_api_response(endpoint: str): 
+def request_api_football(endpoint: str) -> dict: 
+    """ Call API-Football and return the JSON body of its response """
     base_url = "https://v3.football.api-sports.io"
     env = environ.Env()
     environ.Env.read_env()
@@ -33,7 +39,26 @@ def get_api_response(endpoint: str):
             'x-rapidapi-host': 'v3.football.api-sports.io'
         },
     )
-    response = json.loads(raw_response.text)["response"]
+    set_attributes(status_code=raw_response.status_code)
+    return json.loads(raw_response.text)
+
+
+def get_api_response(endpoint: str): 
+    """
+    The results of the endpoint of API-Football, through the transport ```API_FOOTBALL_TRANSPORT```
+    (the real API by default, or the fake one of soccerapp/factories.py for the tests without the network). 
+    The transport is its dotted path, or the callable itself (e.g. the recorded responses of soccerapp/replay.py)
+    """
+    transport = getattr(settings, "API_FOOTBALL_TRANSPORT", "soccerapp.api.request_api_football")
+    if isinstance(transport, str): 
+        transport = import_string(transport)
+
+    start_time = time.perf_counter()
+    with span("api_football", "SPAN_KIND_CLIENT", endpoint=endpoint) as api_span: 
+        response = transport(endpoint)["response"]
+        increment("api_calls")
+        increment("api_seconds", time.perf_counter() - start_time)
+        api_span.set_attributes(num_results=len(response))
     return response
 
 
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class SoccerappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'soccerapp'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .middleware import install_query_recorder
+        from .querylog import install_slow_query_logger
+
+        # log the slow queries of every new connection 
+        connection_created.connect(install_slow_query_logger, dispatch_uid="soccerapp_slow_query_logger")
+        # count the queries of the requests on every new connection, the ones of the async queries too 
+        connection_created.connect(install_query_recorder, dispatch_uid="soccerapp_query_recorder")
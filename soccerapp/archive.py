@@ -0,0 +1,216 @@
+"""
+ARCHIVE OF THE FINISHED MATCHES AND SETTLED BETS
+
+Before the past matches are purged, they are streamed (with their bet infos and user bets)
+into gzip-compressed JSON lines files partitioned by league, season and week, one file per run:
+```ARCHIVE_DIR/league=<league>/season=<season>/week=<week>/<table>-<run>.jsonl.gz```
+
+The files of a run are written as hidden temporary files, and only renamed when the transaction
+of the purge commits, so a rolled back (or retried) purge doesn't archive its matches twice
+"""
+
+import gzip
+import json
+import time
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import QuerySet, F
+from .models import (
+    Match,
+    MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo,
+    UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet,
+)
+
+ARCHIVE_CHUNK_SIZE = 2000
+""" Number of rows fetched from the server-side cursor at a time """
+
+ARCHIVE_TEMP_MAX_AGE = 24 * 60 * 60
+""" Age (in seconds) after which the temporary files of a rolled back run are removed """
+
+ARCHIVED_TABLES = [
+    "match",
+    "moneyline_bet_info", "handicap_bet_info", "total_objects_bet_info",
+    "user_moneyline_bet", "user_handicap_bet", "user_total_objects_bet",
+]
+
+USER_BET_TABLES = {
+    UserMoneylineBet: "user_moneyline_bet",
+    UserHandicapBet: "user_handicap_bet",
+    UserTotalObjectsBet: "user_total_objects_bet",
+}
+""" Mapping the user bet models to their archived tables """
+
+
+def get_archive_dir() -> Path:
+    """ The root directory of the archive """
+    return Path(getattr(settings, "ARCHIVE_DIR", settings.BASE_DIR / "archive"))
+
+
+def get_season(match_date: date) -> str:
+    """ The season of the match date, seasons start in July. Example: 2025-2026 """
+    start_year = match_date.year if match_date.month >= 7 else match_date.year - 1
+    return f"{start_year}-{start_year + 1}"
+
+
+def get_week(match_date: date) -> str:
+    """ The ISO week of the match date. Example: 2025-W07 """
+    iso_year, iso_week, _ = match_date.isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+
+def get_partition(league: str, match_date: date) -> str:
+    """ The relative directory of the partition of the league, season, and week """
+    league_slug = league.lower().replace(" ", "_")
+    return f"league={league_slug}/season={get_season(match_date)}/week={get_week(match_date)}"
+
+
+def get_run_name() -> str:
+    """ The name of a run of the archive, sorted by its start. Example: 20250217T000000-1a2b3c4d """
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def remove_stale_temp_files(archive_dir: Optional[Path]=None) -> None:
+    """ Remove the temporary files the rolled back runs left behind """
+    for path in (archive_dir or get_archive_dir()).glob("league=*/season=*/week=*/.*.tmp"):
+        if time.time() - path.stat().st_mtime > ARCHIVE_TEMP_MAX_AGE:
+            path.unlink(missing_ok=True)
+
+
+class ArchiveWriter:
+    """
+    Write the rows to the temporary files of the run, keeping one open file per partition and table.
+    They're moved into the archive when the current transaction commits
+    """
+
+    def __init__(self, archive_dir: Optional[Path]=None) -> None:
+        self.archive_dir = archive_dir or get_archive_dir()
+        self.run = get_run_name()
+        self.files = {}
+        self.paths = []
+        self.counts = {table: 0 for table in ARCHIVED_TABLES}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # the archive of a failed run is never published
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, table: str, league: str, match_date: datetime, row: dict) -> None:
+        """ Write the row to the file of its table in the partition of the match """
+
+        path = self.archive_dir / get_partition(league, match_date) / f"{table}-{self.run}.jsonl.gz"
+        if path not in self.files:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.files[path] = gzip.open(self.get_temp_path(path), "wt", encoding="utf-8")
+
+        self.files[path].write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+        self.counts[table] += 1
+
+    def get_temp_path(self, path: Path) -> Path:
+        """ The hidden temporary file of the archive file, until the transaction commits """
+        return path.with_name(f".{path.name}.tmp")
+
+    def publish(self) -> None:
+        """ Move the temporary files of the run into the archive """
+        for path in self.paths:
+            self.get_temp_path(path).replace(path)
+        self.paths = []
+
+    def close(self) -> None:
+        """ Close the files of the run, published when the current transaction commits (right away without one) """
+        for archive_file in self.files.values():
+            archive_file.close()
+        self.paths.extend(self.files)
+        self.files = {}
+        transaction.on_commit(self.publish)
+
+    def discard(self) -> None:
+        """ Close and delete the temporary files of the run """
+        for path, archive_file in self.files.items():
+            archive_file.close()
+            self.get_temp_path(path).unlink(missing_ok=True)
+        self.files = {}
+
+
+def archive_rows(
+    writer: ArchiveWriter, table: str, queryset: QuerySet, league_field: F, date_field: F
+) -> None:
+    """
+    Stream the rows of the queryset to the archive.
+    The league and date fields (of the match) decide the partition of each row
+    """
+    for row in queryset.values().annotate(
+        archive_league=league_field, archive_date=date_field
+    ).iterator(chunk_size=ARCHIVE_CHUNK_SIZE):
+        league, match_date = row.pop("archive_league"), row.pop("archive_date")
+        writer.write(table, league, match_date, row)
+
+
+def archive_user_bets(writer: ArchiveWriter, user_bets: QuerySet) -> None:
+    """ Stream the user bets to the archive, in the partitions of their matches """
+    archive_rows(
+        writer, USER_BET_TABLES[user_bets.model], user_bets,
+        F("bet_info__match__league"), F("bet_info__match__date")
+    )
+
+
+def archive_matches(matches: QuerySet[Match]) -> Dict[str, int]:
+    """
+    Archive the given matches with their bet infos and user bets, once the current transaction commits.
+    Return the number of archived rows of each table
+    """
+    remove_stale_temp_files()
+    with ArchiveWriter() as writer:
+        archive_rows(writer, "match", matches, F("league"), F("date"))
+
+        # The bet infos of the matches
+        for table, bet_info_class in [
+            ("moneyline_bet_info", MoneylineBetInfo),
+            ("handicap_bet_info", HandicapBetInfo),
+            ("total_objects_bet_info", TotalObjectsBetInfo),
+        ]:
+            archive_rows(
+                writer, table, bet_info_class.objects.filter(match__in=matches),
+                F("match__league"), F("match__date")
+            )
+
+        # The bets the users placed on the matches (the ones of the dropped partitions are archived with them)
+        for user_bet_class in USER_BET_TABLES:
+            archive_user_bets(writer, user_bet_class.objects.filter(bet_info__match__in=matches))
+
+    print(f"{writer.counts['match']} past matches archived successfully!")
+    return writer.counts
+
+
+def read_archive(
+    table: str, league: Optional[str]=None, season: Optional[str]=None, week: Optional[str]=None,
+) -> Iterator[dict]:
+    """
+    Lazily load the archived rows of the table, optionally only from the given partitions.
+    Example: ```read_archive("match", league="La Liga", season="2025-2026")```
+    """
+    if table not in ARCHIVED_TABLES:
+        raise ValueError(f"The table {table} is not archived.")
+
+    league_dir = f"league={league.lower().replace(' ', '_')}" if league else "league=*"
+    season_dir = f"season={season}" if season else "season=*"
+    week_dir = f"week={week}" if week else "week=*"
+
+    # the files of the runs, and the single file of each table the archive had before them
+    paths = [
+        path for pattern in [f"{table}-*.jsonl.gz", f"{table}.jsonl.gz"]
+        for path in get_archive_dir().glob(f"{league_dir}/{season_dir}/{week_dir}/{pattern}")
+    ]
+    for path in sorted(paths):
+        with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+            for line in archive_file:
+                yield json.loads(line)
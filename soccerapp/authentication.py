@@ -0,0 +1,85 @@
+"""
+JWT AUTHENTICATION WITHOUT THE USER QUERY
+
+The user of the request is built from the claims of the access token (the user id, and the username that
+```MyTokenObtainPairSerializer``` adds), and the user is only queried when another field (e.g. the balance)
+is read or written. The views that only need the user filter by ```user_id=request.user.id```.
+"""
+
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from soccerapp.models import User
+
+
+class LazyTokenUser(SimpleLazyObject):
+    """
+    The user of the validated token. The id, the username and the authentication come from its claims,
+    any other attribute (or assignment, or ```save()```) loads the user from the database once,
+    failing the authentication if the user has been deleted or deactivated
+    """
+
+    def __init__(self, validated_token: Token) -> None:
+        self.__dict__["token"] = validated_token
+        super().__init__(self.load_user)
+
+    def load_user(self) -> User:
+        """ The user of the token, checked like the authentication of simple JWT """
+        try:
+            user = User.objects.get(**{api_settings.USER_ID_FIELD: self.id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    @property
+    def id(self) -> int:
+        return self.token[api_settings.USER_ID_CLAIM]
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+    @property
+    def username(self) -> str:
+        if "username" in self.token:
+            return self.token["username"]
+        # the tokens obtained before the username claim
+        return self.__getattr__("username")
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def is_anonymous(self) -> bool:
+        return False
+
+    @property
+    def is_loaded(self) -> bool:
+        """ If the user has been queried """
+        return self._wrapped is not empty
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __str__(self) -> str:
+        return self.username
+
+
+class JWTLazyUserAuthentication(JWTAuthentication):
+    """
+    Authentication of the access token (in the Authorization header) without querying the user.
+    Like the stateless authentication of simple JWT, the requests that only need the id of the user trust
+    the token of a user who has been deactivated since, until the token expires. The others load the user,
+    and fail for the deactivated one
+    """
+
+    def get_user(self, validated_token: Token) -> LazyTokenUser:
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        return LazyTokenUser(validated_token)
@@ -0,0 +1,189 @@
+"""
+MEASURES OF THE BENCHMARKS
+
+- ```measure()```: run a function (after its warm-up runs, and as many times as repeated) and measure its median
+wall time, its number of queries and the peak RSS of the process
+- ```save_baseline()``` and ```load_baseline()```: the results of a benchmark (with the commit of the code), as
+a JSON file to commit or to keep as an artifact of the CI
+- ```compare_results()```: the regressions of the results against a previous baseline: a lower throughput (of the
+stable measures only) or a higher peak RSS beyond the threshold, or more queries
+"""
+
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .middleware import QueryRecorder
+
+
+def get_rss() -> Optional[int]:
+    """ The current RSS of the process (in bytes), on Linux """
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def get_max_rss() -> int:
+    """ The peak RSS of the process since it started (in bytes) """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in bytes on macOS, in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class PeakRSSSampler:
+    """
+    Sample the RSS of the process from another thread, for the peak RSS of the measured function
+    (the peak of ```getrusage()``` is the one since the process started). Without /proc, the peak since the start
+    """
+
+    def __init__(self, interval: float=0.01) -> None:
+        self.interval = interval
+        self.peak = get_rss()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name="rss-sampler", daemon=True)
+
+    def sample(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, get_rss())
+
+    def __enter__(self) -> "PeakRSSSampler":
+        if self.peak is not None:
+            self.sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if self.peak is None:
+            self.peak = get_max_rss()
+            return
+        self.stopped.set()
+        self.sampler.join()
+        self.peak = max(self.peak, get_rss())
+
+
+def measure(
+    func: Callable[[], Any], num_items: int, repeat: int=1, warmup: int=0, reset: Optional[Callable[[], Any]]=None,
+) -> Tuple[Dict[str, Any], Any]:
+    """
+    Run the function on the items (e.g. the bets to settle) the warm-up times, then the repeated times, and return
+    its measures with the result of the last run. The seconds are the median of the runs (the throughput is the
+    number of items per second), and the spread is the range of the seconds over their median.
+    The reset function (not measured) is called after each run, to run the next one on the same data
+    """
+    durations, peak_rss, num_queries, result = [], 0, 0, None
+    for run in range(warmup + repeat):
+        query_recorder = QueryRecorder()
+        with PeakRSSSampler() as rss_sampler, connection.execute_wrapper(query_recorder):
+            start_time = time.perf_counter()
+            result = func()
+            duration = time.perf_counter() - start_time
+        if reset is not None:
+            reset()
+        if run < warmup:
+            continue
+        durations.append(duration)
+        peak_rss, num_queries = max(peak_rss, rss_sampler.peak), query_recorder.num_queries
+
+    median_duration = statistics.median(durations)
+    spread = (max(durations) - min(durations)) / median_duration if repeat > 1 and median_duration > 0 else None
+    return {
+        "items": num_items,
+        "seconds": round(median_duration, 4),
+        "best_seconds": round(min(durations), 4),
+        "runs": repeat,
+        "spread": round(spread, 3) if spread is not None else None,
+        "throughput": round(num_items / median_duration, 1) if median_duration > 0 else None,
+        "queries": num_queries,
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+    }, result
+
+
+MAX_SPREAD = 0.25
+""" The max spread of the repeated runs of a stable measure """
+
+
+def is_stable(result: Dict[str, Any], max_spread: float=MAX_SPREAD) -> bool:
+    """
+    If the repeated runs of the measure are close enough to each other, so its throughput can be compared.
+    The single runs (without spread) are taken as they are
+    """
+    return result.get("spread") is None or result["spread"] <= max_spread
+
+
+def get_commit() -> Optional[str]:
+    """ The commit of the code, to compare the results across the commits """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_baseline(path: str, benchmark: str, results: List[Dict[str, Any]], options: Dict[str, Any]) -> None:
+    """ Write the results of the benchmark, with its options and its environment, to the JSON file """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as baseline_file:
+        json.dump({
+            "benchmark": benchmark,
+            "created": timezone.now().isoformat(),
+            "commit": get_commit(),
+            "options": options,
+            "environment": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "database": connection.vendor,
+            },
+            "results": results,
+        }, baseline_file, indent=2, default=str)
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def compare_results(
+    previous_results: List[Dict[str, Any]], results: List[Dict[str, Any]], key_names: List[str], threshold: float,
+    max_spread: float=MAX_SPREAD,
+) -> Tuple[List[str], List[str]]:
+    """
+    Compare the results with the previous ones of the same keys (e.g. the engine and the number of bets).
+    The throughput only regresses if both measures are stable (see ```is_stable()```).
+    Return the lines of the comparison, and the ones of the regressions
+    """
+    previous_by_key = {tuple(result[name] for name in key_names): result for result in previous_results}
+    lines, regressions = [], []
+    for result in results:
+        key = tuple(result[name] for name in key_names)
+        previous = previous_by_key.get(key)
+        if previous is None:
+            continue
+
+        name = " ".join(str(value) for value in key)
+        changes = []
+        if previous["throughput"] and result["throughput"]:
+            throughput_change = result["throughput"] / previous["throughput"] - 1
+            stable = is_stable(previous, max_spread) and is_stable(result, max_spread)
+            changes.append(f"throughput {throughput_change:+.1%}" + ("" if stable else " (unstable, not gated)"))
+            if stable and throughput_change < -threshold:
+                regressions.append(f"{name}: throughput {previous['throughput']} -> {result['throughput']}/s")
+        if result["queries"] > previous["queries"]:
+            regressions.append(f"{name}: queries {previous['queries']} -> {result['queries']}")
+        changes.append(f"queries {previous['queries']} -> {result['queries']}")
+        rss_change = result["peak_rss_mb"] / previous["peak_rss_mb"] - 1 if previous["peak_rss_mb"] else 0
+        changes.append(f"peak RSS {rss_change:+.1%}")
+        if rss_change > threshold:
+            regressions.append(f"{name}: peak RSS {previous['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+        lines.append(f"{name}: {', '.join(changes)}")
+    return lines, regressions
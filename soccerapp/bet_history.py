@@ -0,0 +1,107 @@
+"""
+LOGIC OF THE BET HISTORY OF THE USER
+
+The bets of the 3 user bet tables are merged with a UNION ALL of the same projection
+(the fields of the bet info that differ between the markets are mapped to ```selection``` and ```line```),
+and summarized with one aggregate query per table grouped by league.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, List, Union
+from django.db.models import CharField, Count, DecimalField, F, Q, QuerySet, Sum, Value
+from django.db.models.functions import Concat
+from .models import UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet
+
+BET_HISTORY_MARKETS = {
+    "moneyline": (UserMoneylineBet, "bet_info__bet_team", None),
+    "handicap": (UserHandicapBet, "bet_info__bet_team", "bet_info__handicap_cover"),
+    "total_objects": (UserTotalObjectsBet, "bet_info__under_or_over", "bet_info__target_num_objects"),
+}
+""" Mapping the market to its user bet model, and the fields of its selection and line """
+
+BET_HISTORY_FIELDS = [
+    "id", "bet_type", "created_date", "bet_amount", "payout", "status", "time_type", "bet_object",
+    "selection", "line", "odd", "match_id", "match_name", "league", "match_date",
+]
+""" The shared projection of the bets of every market, in the order of the columns """
+
+
+def get_bet_history_querysets(user_id: int, status: Union[str, None]=None) -> List[QuerySet]:
+    """ The querysets of the bets of the user in each market, with the shared projection """
+
+    querysets = []
+    for bet_type, (model, selection_field, line_field) in BET_HISTORY_MARKETS.items():
+        bet_list = model.objects.filter(user_id=user_id)
+        if status:
+            bet_list = bet_list.filter(bet_info__status=status)
+
+        querysets.append(bet_list.annotate(
+            bet_type=Value(bet_type, output_field=CharField()),
+            status=F("bet_info__status"),
+            time_type=F("bet_info__time_type"),
+            bet_object=F("bet_info__bet_object"),
+            selection=F(selection_field),
+            # the moneyline bets don't have a line
+            line=F(line_field) if line_field else Value(None, output_field=DecimalField(max_digits=5, decimal_places=2)),
+            odd=F("bet_info__odd"),
+            match_id=F("bet_info__match__match_id"),
+            match_name=Concat(
+                F("bet_info__match__home_team"), Value(" vs "), F("bet_info__match__away_team"),
+                output_field=CharField(),
+            ),
+            league=F("bet_info__match__league"),
+            match_date=F("bet_info__match__date"),
+        ).values(*BET_HISTORY_FIELDS))
+    return querysets
+
+
+def summarize(num_bets: int, open_stake: Decimal, settled_stake: Decimal,
+              settled_payout: Decimal, num_settled: int, num_won: int) -> Dict[str, Any]:
+    """ The summary of the aggregates of a group of bets """
+    return {
+        "num_bets": num_bets,
+        "open_stake": "{:.2f}".format(open_stake),
+        "settled_profit": "{:.2f}".format(settled_payout - settled_stake),
+        "win_rate": round(num_won / num_settled, 4) if num_settled else None,
+    }
+
+
+def get_bet_summary(user_id: int) -> Dict[str, Any]:
+    """
+    The summary of the bets of the user (open stake, settled profit or loss, win rate), in total,
+    by bet type and by league. The settled bets are the ones with a payout, the won ones paid more than their amount
+    """
+
+    # The aggregates of each (bet type, league), computed by the database
+    groups = []
+    for bet_type, (model, _, _) in BET_HISTORY_MARKETS.items():
+        settled = Q(payout__isnull=False)
+        league_aggregates = model.objects.filter(user_id=user_id).values(
+            league=F("bet_info__match__league")
+        ).annotate(
+            num_bets=Count("id"),
+            open_stake=Sum("bet_amount", filter=Q(bet_info__status="Unsettled"), default=Decimal(0)),
+            settled_stake=Sum("bet_amount", filter=settled, default=Decimal(0)),
+            settled_payout=Sum("payout", filter=settled, default=Decimal(0)),
+            num_settled=Count("id", filter=settled),
+            num_won=Count("id", filter=Q(payout__gt=F("bet_amount"))),
+        ).order_by()
+        groups.extend((bet_type, aggregates) for aggregates in league_aggregates)
+
+    # Add up the aggregates of the groups (at most 3 bet types * 6 leagues)
+    aggregate_names = ["num_bets", "open_stake", "settled_stake", "settled_payout", "num_settled", "num_won"]
+    total = dict.fromkeys(aggregate_names, 0)
+    by_bet_type = {bet_type: dict.fromkeys(aggregate_names, 0) for bet_type in BET_HISTORY_MARKETS}
+    by_league = {}
+    for bet_type, aggregates in groups:
+        league_total = by_league.setdefault(aggregates["league"], dict.fromkeys(aggregate_names, 0))
+        for name in aggregate_names:
+            total[name] += aggregates[name]
+            by_bet_type[bet_type][name] += aggregates[name]
+            league_total[name] += aggregates[name]
+
+    return {
+        "total": summarize(**total),
+        "by_bet_type": {bet_type: summarize(**totals) for bet_type, totals in by_bet_type.items()},
+        "by_league": {league: summarize(**totals) for league, totals in sorted(by_league.items())},
+    }
@@ -0,0 +1,193 @@
+"""
+REAL-TIME EVENTS OF THE MATCHES AND THE BETS
+
+The tasks publish the events once their transaction commits:
+- match_finished: the match is finished, with its score (generic_update_match_scores)
+- odds_updated: the bet info of the markets of the match are uploaded (upload_match_bets)
+- bets_settled: the bets of the user are settled, with their payout and the new balance (settle_bet_list)
+
+The events go through the backend of ```EVENTS_BACKEND``` to the broker of each server process,
+which pushes them to the subscriptions of its clients (see the event stream in soccerapp/views/event_views.py):
+- InMemoryBackend: the events only reach the clients of the same process (development and tests)
+- PostgresBackend: NOTIFY on publish, and LISTEN in a thread of each server process,
+    so the events of the Celery workers reach every server
+"""
+
+import asyncio
+import json
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+
+ALL_MATCHES_CHANNEL = "match:*"
+""" The channel of the events of every match """
+
+
+def match_channel(match_id: int) -> str:
+    """ The channel of the events of the match. Example: match:1208021 """
+    return f"match:{match_id}"
+
+
+def user_channel(user_id: int) -> str:
+    """ The channel of the events of the bets of the user. Example: user:12 """
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """
+    The subscription of a client to the channels, its events are queued in the event loop of the client.
+    A slow client misses the events that don't fit in its queue
+    """
+
+    def __init__(self, broker: "EventBroker", channels: List[str]) -> None:
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=getattr(settings, "EVENTS_QUEUE_SIZE", 100))
+
+    def put(self, message: str) -> None:
+        """ Queue the message (thread-safe) """
+        def put_nowait() -> None:
+            if not self.queue.full():
+                self.queue.put_nowait(message)
+        self.loop.call_soon_threadsafe(put_nowait)
+
+    async def get(self) -> str:
+        """ The next message (JSON of the event) """
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """ The broker of the process, delivering the messages of the channels to their subscriptions """
+
+    def __init__(self) -> None:
+        self.subscriptions: Dict[str, set] = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        """ Subscribe to the channels, from the event loop of the client """
+        subscription = Subscription(self, list(channels))
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            for channel in subscription.channels:
+                channel_subscriptions = self.subscriptions.get(channel, set())
+                channel_subscriptions.discard(subscription)
+                if not channel_subscriptions:
+                    self.subscriptions.pop(channel, None)
+
+    def deliver(self, channels: Iterable[str], message: str) -> None:
+        """ Deliver the message to the subscriptions of the channels, once per subscription """
+        with self.lock:
+            subscriptions = set()
+            for channel in channels:
+                subscriptions.update(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+broker = EventBroker()
+""" The broker of this process """
+
+
+class InMemoryBackend:
+    """ Backend delivering the events to the broker of the same process """
+
+    def __init__(self, broker: EventBroker) -> None:
+        self.broker = broker
+
+    def start(self) -> None:
+        pass
+
+    def publish(self, channels: List[str], message: str) -> None:
+        self.broker.deliver(channels, message)
+
+
+class PostgresBackend:
+    """
+    Backend publishing the events with NOTIFY, the payload (at most 8000 bytes) has the channels and the message.
+    Each server process LISTENs on its own connection in a thread and delivers the events to its broker
+    """
+    pg_channel = "soccerbet_events"
+    max_payload_size = 7999 # in bytes, NOTIFY rejects the payloads of 8000 bytes or more
+    reconnect_delay = 5 # in seconds
+
+    def __init__(self, broker: EventBroker) -> None:
+        self.broker = broker
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        """ Start listening, once per process (from the first subscription) """
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name="soccerbet-events", daemon=True)
+                self.listener.start()
+
+    def publish(self, channels: List[str], message: str) -> None:
+        payload = json.dumps({"channels": channels, "message": message})
+        if len(payload.encode()) > self.max_payload_size:
+            raise ValueError(f"The payload of the event is {len(payload.encode())} bytes, more than NOTIFY allows.")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.pg_channel, payload])
+
+    def listen(self) -> None:
+        while True:
+            # a new connection, that isn't shared with the requests of the thread
+            listen_connection = connections.create_connection("default")
+            try:
+                listen_connection.ensure_connection()
+                listen_connection.set_autocommit(True)
+                with listen_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.pg_channel}")
+
+                # the notifications of psycopg 3
+                for notify in listen_connection.connection.notifies():
+                    payload = json.loads(notify.payload)
+                    self.broker.deliver(payload["channels"], payload["message"])
+            except Exception as exc:
+                print(f"Listening to the events failed: {exc}, reconnecting")
+            finally:
+                listen_connection.close()
+            time.sleep(self.reconnect_delay)
+
+
+@lru_cache(maxsize=None)
+def get_event_backend():
+    """ The backend of ```EVENTS_BACKEND``` """
+    backend_path = getattr(settings, "EVENTS_BACKEND", "soccerapp.events.InMemoryBackend")
+    return import_string(backend_path)(broker)
+
+
+def publish_event(channels: Iterable[str], event_type: str, data: Dict[str, Any]) -> None:
+    """
+    Publish the event to the channels. Inside a transaction, it's published once the transaction commits,
+    and failing to publish it doesn't fail the task (the failure is logged)
+    """
+    channels = list(channels)
+    message = json.dumps({"type": event_type, "data": data}, cls=DjangoJSONEncoder)
+
+    def publish() -> None:
+        try:
+            get_event_backend().publish(channels, message)
+        except Exception as exc:
+            print(f"Publishing the event {event_type} to {', '.join(channels)} failed: {exc}")
+
+    transaction.on_commit(publish, robust=True)
+
+
+def publish_match_event(match_id: int, event_type: str, data: Dict[str, Any]) -> None:
+    """ Publish the event of the match to its channel and the channel of every match """
+    publish_event([ALL_MATCHES_CHANNEL, match_channel(match_id)], event_type, {"match_id": match_id, **data})
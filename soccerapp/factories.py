@@ -0,0 +1,282 @@
+"""
+FACTORIES OF THE TEST AND BENCHMARK DATA
+
+- ```seed_dataset()```: a realistic dataset of several leagues (teams, standings, finished, today's and upcoming
+matches, their bet infos, and the bets of the users), the same for the same seed
+- ```FakeAPIFootball```: the transport of API-Football (see ```API_FOOTBALL_TRANSPORT```) answering without
+the network, with the same responses for the same seed and endpoint. The teams and the fixtures are the ones
+of ```seed_dataset()```, and the finished fixtures of a date are the matches of the database on that date
+
+Example: ```@override_settings(API_FOOTBALL_TRANSPORT="soccerapp.factories.fake_api_football")```
+"""
+
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from urllib.parse import parse_qs, urlsplit
+from django.contrib.auth.hashers import make_password
+from .models import (
+    LEAGUE_CHOICES, User, Team, TeamRanking, Match,
+    MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo,
+    UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet,
+)
+from .tasks import LEAGUES
+
+LEAGUE_NAMES = {league_id: league for league, league_id in LEAGUES.items()}
+
+TEAMS_PER_LEAGUE = 20
+
+BET_OBJECTS = ["Goals", "Corners", "Cards"]
+
+MONEYLINE_BET_IDS = {13, 1, 130, 55, 161, 158}
+HANDICAP_BET_IDS = {19, 9, 125, 56, 159, 81}
+""" The bet ids of API-Football (see ```api.get_objects_bets()```), the others are the total objects bets """
+
+
+def get_team_names(league: str) -> List[str]:
+    """ The teams of the league. Example: La Liga FC 7 """
+    return [f"{league} FC {i + 1}" for i in range(TEAMS_PER_LEAGUE)]
+
+
+def get_fixture_id(league: str, day: date, index: int) -> int:
+    """ The id of the fixture of the league on the day, the same for the database and the fake API """
+    return LEAGUES[league] * 10_000_000 + (day.toordinal() % 10_000) * 1000 + index
+
+
+def get_random_odd(rng: random.Random) -> str:
+    """ The decimal odd of API-Football, as a string. Example: 1.85 """
+    return f"{rng.uniform(1.15, 4.5):.2f}"
+
+
+def get_kickoff(day: date, index: int) -> datetime:
+    """ The time of the match of the day, every 10 minutes from midnight """
+    return datetime.combine(day, time(0, 0)) + timedelta(minutes=10 * index)
+
+
+class SeedData(NamedTuple):
+    """ The main objects of the seeded dataset """
+    users: List[User]
+    finished_matches: List[Match]
+    today_matches: List[Match]
+    upcoming_matches: List[Match]
+
+
+def seed_dataset(
+    seed: int=0, leagues: Sequence[str]=("Premiere League", "La Liga", "Bundesliga"),
+    matches_per_league: int=150, num_users: int=100, bets_per_user: int=30,
+) -> SeedData:
+    """
+    Seed the dataset: the teams and the standings of every league, and for each given league its matches,
+    a third of them finished (the days before, with their settled bets), a third today, and a third in the next
+    days. Each match has 14 bet infos, and each user has bets on random bet infos of each market
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    password = make_password("password")
+    users = User.objects.bulk_create([
+        User(username=f"user{i}", email=f"user{i}@gmail.com", password=password, balance=Decimal("10000.00"))
+        for i in range(num_users)
+    ])
+
+    teams = Team.objects.bulk_create([
+        Team(league=league, name=name, founded_year=1880 + rng.randrange(120), home_stadium=f"{name} Stadium",
+             logo=f"https://media.api-sports.io/football/teams/{i}.png", description="")
+        for league, _ in LEAGUE_CHOICES for i, name in enumerate(get_team_names(league))
+    ])
+    TeamRanking.objects.bulk_create([
+        TeamRanking(
+            league=team.league, team=team, rank=i % TEAMS_PER_LEAGUE + 1, points=90 - 3 * (i % TEAMS_PER_LEAGUE),
+            num_watches=38, num_wins=28 - i % TEAMS_PER_LEAGUE, num_loses=i % TEAMS_PER_LEAGUE, num_draws=10,
+        )
+        for i, team in enumerate(teams)
+    ])
+
+    matches = []
+    for league in leagues:
+        team_names = get_team_names(league)
+        for i in range(matches_per_league):
+            # the finished matches, today's matches, then the upcoming matches
+            period = i * 3 // matches_per_league
+            day = today + timedelta(days=[-1 - i % 7, 0, 1 + i % 7][period])
+            home_team, away_team = rng.sample(team_names, 2)
+            match = Match(
+                league=league, match_id=get_fixture_id(league, day, i), date=get_kickoff(day, i % 100),
+                home_team=home_team, away_team=away_team,
+            )
+            if period == 0:
+                match.status, match.updated_date = "Finished", day
+                match.halftime_score = f"{rng.randrange(3)}-{rng.randrange(3)}"
+                match.fulltime_score = f"{rng.randrange(5)}-{rng.randrange(5)}"
+                match.penalty, match.possesion = "None-None", "50%-50%"
+                match.total_shots, match.corners, match.cards = "10-10", "5-5", "2-2"
+            matches.append(match)
+    matches = Match.objects.bulk_create(matches, batch_size=500)
+
+    moneyline_infos, handicap_infos, total_infos = [], [], []
+    for i, match in enumerate(matches):
+        status = "Settled" if match.status == "Finished" else "Unsettled"
+        bet_object = BET_OBJECTS[i % len(BET_OBJECTS)]
+        for time_type in ["Full-time", "Half-time"]:
+            for bet_team in [match.home_team, "Draw", match.away_team]:
+                moneyline_infos.append(MoneylineBetInfo(
+                    match=match, time_type=time_type, bet_object=bet_object, bet_team=bet_team,
+                    odd=rng.choice([-150, -110, 120, 180, 250]), status=status,
+                ))
+            for bet_team, handicap_cover in [(match.home_team, -1), (match.away_team, 1)]:
+                handicap_infos.append(HandicapBetInfo(
+                    match=match, time_type=time_type, bet_object=bet_object, bet_team=bet_team, handicap_cover=handicap_cover,
+                    odd=rng.choice([-120, -110, 105]), status=status,
+                ))
+            for under_or_over in ["Under", "Over"]:
+                total_infos.append(TotalObjectsBetInfo(
+                    match=match, time_type=time_type, bet_object=bet_object, under_or_over=under_or_over,
+                    target_num_objects=2.5,
+                    odd=rng.choice([-115, 100, 130]), status=status,
+                ))
+    moneyline_infos = MoneylineBetInfo.objects.bulk_create(moneyline_infos, batch_size=1000)
+    handicap_infos = HandicapBetInfo.objects.bulk_create(handicap_infos, batch_size=1000)
+    total_infos = TotalObjectsBetInfo.objects.bulk_create(total_infos, batch_size=1000)
+
+    for user_bet_class, bet_infos in [
+        (UserMoneylineBet, moneyline_infos), (UserHandicapBet, handicap_infos), (UserTotalObjectsBet, total_infos),
+    ]:
+        user_bets = []
+        for user in users:
+            # at most one bet of the user per bet info
+            for bet_info in rng.sample(bet_infos, bets_per_user // 3):
+                bet_amount = Decimal(rng.randrange(5, 100))
+                payout = None
+                if bet_info.status == "Settled":
+                    payout = bet_amount * 2 if rng.random() < 0.45 else Decimal(0)
+                user_bets.append(user_bet_class(user=user, bet_info=bet_info, bet_amount=bet_amount, payout=payout))
+        user_bet_class.objects.bulk_create(user_bets, batch_size=1000)
+
+    return SeedData(
+        users=users,
+        finished_matches=[match for match in matches if match.status == "Finished"],
+        today_matches=[match for match in matches if match.date.date() == today],
+        upcoming_matches=[match for match in matches if match.date.date() > today],
+    )
+
+
+class FakeAPIFootball:
+    """
+    Transport of API-Football answering from the seed, without the network. Called with the endpoint
+    (Example: ```fixtures?league=140&season=2025&from=2025-05-05&to=2025-05-08```), return the JSON body
+    """
+
+    def __init__(self, seed: int=0, fixtures_per_day: int=3) -> None:
+        self.seed = seed
+        self.fixtures_per_day = fixtures_per_day
+
+    def __call__(self, endpoint: str) -> Dict[str, Any]:
+        url = urlsplit(endpoint)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        # the same response for the same endpoint
+        rng = random.Random(f"{self.seed}:{endpoint}")
+
+        if url.path == "teams":
+            response = self.get_teams(params)
+        elif url.path == "standings":
+            response = self.get_standings(params, rng)
+        elif url.path == "fixtures" and "date" in params:
+            response = self.get_finished_fixtures(params, rng)
+        elif url.path == "fixtures":
+            response = self.get_fixtures(params)
+        elif url.path == "fixtures/statistics":
+            response = self.get_statistics(rng)
+        elif url.path == "odds":
+            response = self.get_odds(params, rng)
+        else:
+            raise ValueError(f"The endpoint {endpoint} isn't faked.")
+        return {"get": url.path, "parameters": params, "errors": [], "results": len(response), "response": response}
+
+    def get_teams(self, params: Dict[str, str]) -> List[dict]:
+        return [
+            {
+                "team": {"name": name, "logo": f"https://media.api-sports.io/football/teams/{i}.png", "founded": 1900 + i},
+                "venue": {"name": f"{name} Stadium", "image": f"https://media.api-sports.io/football/venues/{i}.png"},
+            }
+            for i, name in enumerate(get_team_names(LEAGUE_NAMES[int(params["league"])]))
+        ]
+
+    def get_standings(self, params: Dict[str, str], rng: random.Random) -> List[dict]:
+        team_names = get_team_names(LEAGUE_NAMES[int(params["league"])])
+        rng.shuffle(team_names)
+        standings = []
+        for rank, name in enumerate(team_names, start=1):
+            wins, draws = 30 - rank, rng.randrange(10)
+            standings.append({
+                "rank": rank, "team": {"name": name}, "points": wins * 3 + draws,
+                "all": {"played": 38, "win": wins, "draw": draws, "lose": 38 - wins - draws},
+            })
+        return [{"league": {"standings": [standings]}}]
+
+    def get_fixtures(self, params: Dict[str, str]) -> List[dict]:
+        """ The fixtures of the league between the dates, a few every day """
+        league = LEAGUE_NAMES[int(params["league"])]
+        team_names = get_team_names(league)
+        from_day, to_day = date.fromisoformat(params["from"]), date.fromisoformat(params["to"])
+
+        fixtures = []
+        for day_offset in range((to_day - from_day).days + 1):
+            day = from_day + timedelta(days=day_offset)
+            for index in range(self.fixtures_per_day):
+                home_team, away_team = random.Random(f"{self.seed}:{league}:{day}:{index}").sample(team_names, 2)
+                fixtures.append({
+                    "fixture": {
+                        # the fixtures of the fake don't collide with the seeded matches
+                        "id": get_fixture_id(league, day, 900 + index),
+                        "date": get_kickoff(day, 100 + index).isoformat(),
+                    },
+                    "teams": {
+                        "home": {"name": home_team, "logo": "https://media.api-sports.io/football/teams/1.png"},
+                        "away": {"name": away_team, "logo": "https://media.api-sports.io/football/teams/2.png"},
+                    },
+                })
+        return fixtures
+
+    def get_finished_fixtures(self, params: Dict[str, str], rng: random.Random) -> List[dict]:
+        """ The matches of the league on the date, finished """
+        day = date.fromisoformat(params["date"])
+        match_ids = Match.objects.filter(
+            league=LEAGUE_NAMES[int(params["league"])],
+            date__gte=get_kickoff(day, 0), date__lt=get_kickoff(day + timedelta(days=1), 0),
+        ).order_by("match_id").values_list("match_id", flat=True)
+
+        def get_score() -> Dict[str, Optional[int]]:
+            return {"home": rng.randrange(4), "away": rng.randrange(4)}
+
+        return [
+            {
+                "fixture": {"id": match_id},
+                "score": {"halftime": get_score(), "fulltime": get_score(), "penalty": {"home": None, "away": None}},
+            }
+            for match_id in match_ids
+        ]
+
+    def get_statistics(self, rng: random.Random) -> List[dict]:
+        """ The statistics of both teams, the shots (2), corners (7), possession (9) and cards (10) are used """
+        home_possession = rng.randrange(30, 70)
+        statistics = []
+        for possession in [home_possession, 100 - home_possession]:
+            values = [rng.randrange(20) for _ in range(11)]
+            values[9] = f"{possession}%"
+            statistics.append({"statistics": [{"type": f"stat {i}", "value": value} for i, value in enumerate(values)]})
+        return statistics
+
+    def get_odds(self, params: Dict[str, str], rng: random.Random) -> List[dict]:
+        bet_id = int(params["bet"])
+        if bet_id in MONEYLINE_BET_IDS:
+            labels = ["Home", "Draw", "Away"]
+        elif bet_id in HANDICAP_BET_IDS:
+            labels = ["Home -1", "Away +1", "Home +1", "Away -1"]
+        else:
+            labels = ["Over 2.5", "Under 2.5", "Over 3.5", "Under 3.5"]
+        values = [{"value": label, "odd": get_random_odd(rng)} for label in labels]
+        return [{"bookmakers": [{"id": int(params["bookmaker"]), "bets": [{"id": bet_id, "values": values}]}]}]
+
+
+fake_api_football = FakeAPIFootball()
+""" The fake of API-Football for ```API_FOOTBALL_TRANSPORT```, with the seed 0 """
@@ -0,0 +1,430 @@
+"""
+SYNTHETIC SEASONS FOR THE SCALE TESTS
+
+```generate_season()``` creates, the same for the same seed:
+- the full season of each league: the double round-robin of its teams, a matchday every week, and the results
+(scores and stats) of the matches before today
+- the market ladders of each match, shaped like the odds of API-Football: the moneyline, the handicap lines
+(with the quarter lines) and the total lines of the goals, corners and cards, full-time and half-time, with
+the odds of a Poisson model of the teams and the margin of the bookmaker
+- the bettors, whose activity follows a power law (a few bettors place most of the bets), with their unsettled bets
+
+On PostgreSQL, the rows are loaded with ```COPY```, so millions of bets load in minutes.
+"""
+
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from .api import convert_american_odd
+from .models import (
+    User, Match,
+    MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo,
+    UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet,
+)
+from .partitions import PARTITIONED_MODELS, create_partition, get_partitions, get_week_start
+from .tasks import LEAGUES
+
+GENERATED_MATCH_ID_START = 1_900_000_000
+""" The match ids of the generated seasons start from this id, far from the ids of API-Football """
+
+BETTOR_PREFIX = "bettor"
+""" The username of the generated bettors. Example: bettor42 """
+
+HANDICAP_LINES = [-2.0, -1.75, -1.5, -1.25, -1.0, -0.75, -0.5, -0.25, 0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0]
+""" The handicap lines of the home team, the away team gets the opposite line """
+
+TOTAL_LINES = {
+    "Goals": [0.5, 1.5, 1.75, 2.0, 2.25, 2.5, 2.75, 3.0, 3.5, 4.5],
+    "Corners": [7.5, 8.5, 9.5, 10.5, 11.5, 12.5],
+    "Cards": [2.5, 3.5, 4.5, 5.5, 6.5],
+}
+""" The total lines of each bet object (full-time, the half-time lines are about the half of them) """
+
+EXPECTED_OBJECTS = {"Goals": (1.5, 1.15), "Corners": (5.5, 4.6), "Cards": (2.1, 2.3)}
+""" The expected number of objects of the home team and the away team in a full-time match of equal teams """
+
+HALF_TIME_SHARE = 0.45
+""" The share of the objects of the match in its first half """
+
+MARGIN = 1.06
+""" The margin of the bookmaker on the probabilities """
+
+MARKET_SHARES = {"moneyline": 0.5, "handicap": 0.25, "total_objects": 0.25}
+""" The share of the bets of each market """
+
+LOAD_BATCH_SIZE = 5000
+
+
+@dataclass
+class SeasonStats:
+    """ The number of generated rows, and the time to generate and load them """
+    matches: int = 0
+    finished_matches: int = 0
+    bet_infos: int = 0
+    users: int = 0
+    bets: Dict[str, int] = field(default_factory=dict)
+    duration: float = 0.0
+
+
+def poisson_pmf(expected: float, max_count: int=30) -> List[float]:
+    """ The probabilities of 0 to max_count objects """
+    probabilities = [math.exp(-expected)]
+    for count in range(1, max_count + 1):
+        probabilities.append(probabilities[-1] * expected / count)
+    return probabilities
+
+
+def sample_poisson(rng: random.Random, expected: float) -> int:
+    """ Knuth's algorithm, the expected numbers of a match are small """
+    threshold, count, product = math.exp(-expected), 0, rng.random()
+    while product > threshold:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def get_american_odd(probability: float) -> int:
+    """ The American odd of the outcome of the probability, with the margin of the bookmaker """
+    decimal_odd = min(max(1 / (probability * MARGIN), 1.02), 50.0)
+    return convert_american_odd(round(decimal_odd, 2))
+
+
+def get_line_probability(distribution: Dict[int, float], line: float) -> float:
+    """
+    The probability that the value plus the line wins (is over 0), where a push refunds the bet:
+    the probability of the win among the decided outcomes. A quarter line is half of each of its 2 lines
+    """
+    if (line * 4) % 2 == 1:
+        return (get_line_probability(distribution, line - 0.25) + get_line_probability(distribution, line + 0.25)) / 2
+    win = sum(probability for value, probability in distribution.items() if value + line > 0)
+    lose = sum(probability for value, probability in distribution.items() if value + line < 0)
+    return win / (win + lose) if win + lose > 0 else 0.5
+
+
+class Fixture:
+    """ A match of the season, with the expected number of objects of its teams """
+
+    def __init__(self, league: str, index: int, kickoff: datetime, home_team: str, away_team: str, strength: float) -> None:
+        self.league = league
+        self.index = index
+        self.kickoff = kickoff
+        self.home_team = home_team
+        self.away_team = away_team
+        # the home team's edge over the away team, in the scale of the log of the expected numbers
+        self.strength = strength
+
+    def get_expected(self, bet_object: str, time_type: str) -> Tuple[float, float]:
+        home_expected, away_expected = EXPECTED_OBJECTS[bet_object]
+        share = HALF_TIME_SHARE if time_type == "Half-time" else 1.0
+        return (
+            home_expected * share * math.exp(self.strength / 2),
+            away_expected * share * math.exp(-self.strength / 2),
+        )
+
+    def get_distributions(self, bet_object: str, time_type: str) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """ The distributions of the difference (home minus away) and of the total of the objects """
+        home_expected, away_expected = self.get_expected(bet_object, time_type)
+        home_pmf, away_pmf = poisson_pmf(home_expected), poisson_pmf(away_expected)
+        differences, totals = {}, {}
+        for home_count, home_probability in enumerate(home_pmf):
+            for away_count, away_probability in enumerate(away_pmf):
+                probability = home_probability * away_probability
+                differences[home_count - away_count] = differences.get(home_count - away_count, 0) + probability
+                totals[home_count + away_count] = totals.get(home_count + away_count, 0) + probability
+        return differences, totals
+
+    def get_market_ladders(self) -> Dict[str, List[dict]]:
+        """ The bet infos of the match for each market, without the match """
+        ladders = {"moneyline": [], "handicap": [], "total_objects": []}
+        for bet_object in ["Goals", "Corners", "Cards"]:
+            for time_type in ["Full-time", "Half-time"]:
+                differences, totals = self.get_distributions(bet_object, time_type)
+                home_win = sum(probability for value, probability in differences.items() if value > 0)
+                away_win = sum(probability for value, probability in differences.items() if value < 0)
+                for bet_team, probability in [
+                    (self.home_team, home_win), ("Draw", 1 - home_win - away_win), (self.away_team, away_win),
+                ]:
+                    ladders["moneyline"].append({
+                        "time_type": time_type, "bet_object": bet_object, "bet_team": bet_team,
+                        "odd": get_american_odd(probability),
+                    })
+
+                for line in HANDICAP_LINES:
+                    home_cover = get_line_probability(differences, line)
+                    for bet_team, handicap_cover, probability in [
+                        (self.home_team, line, home_cover), (self.away_team, -line, 1 - home_cover),
+                    ]:
+                        ladders["handicap"].append({
+                            "time_type": time_type, "bet_object": bet_object, "bet_team": bet_team,
+                            "handicap_cover": Decimal(str(handicap_cover)), "odd": get_american_odd(probability),
+                        })
+
+                share = HALF_TIME_SHARE if time_type == "Half-time" else 1.0
+                for full_time_line in TOTAL_LINES[bet_object]:
+                    # the half-time lines are the half of the full-time ones, rounded to the quarter lines
+                    line = full_time_line if share == 1.0 else max(round(full_time_line * share * 4) / 4, 0.5)
+                    over = get_line_probability(totals, -line)
+                    for under_or_over, probability in [("Over", over), ("Under", 1 - over)]:
+                        ladders["total_objects"].append({
+                            "time_type": time_type, "bet_object": bet_object, "under_or_over": under_or_over,
+                            "target_num_objects": Decimal(str(line)), "odd": get_american_odd(probability),
+                        })
+
+        # the same line can come from 2 full-time lines, once per bet info
+        seen, unique_totals = set(), []
+        for bet_info in ladders["total_objects"]:
+            key = (bet_info["time_type"], bet_info["bet_object"], bet_info["under_or_over"], bet_info["target_num_objects"])
+            if key not in seen:
+                seen.add(key)
+                unique_totals.append(bet_info)
+        ladders["total_objects"] = unique_totals
+        return ladders
+
+    def get_result(self, rng: random.Random) -> Dict[str, str]:
+        """ The scores and stats of the finished match, in the format of the matches updated from API-Football """
+        home_goals = sample_poisson(rng, self.get_expected("Goals", "Full-time")[0])
+        away_goals = sample_poisson(rng, self.get_expected("Goals", "Full-time")[1])
+        # each goal is scored in the first half with the half-time share
+        home_halftime = sum(rng.random() < HALF_TIME_SHARE for _ in range(home_goals))
+        away_halftime = sum(rng.random() < HALF_TIME_SHARE for _ in range(away_goals))
+        home_corners, away_corners = (sample_poisson(rng, expected) for expected in self.get_expected("Corners", "Full-time"))
+        home_cards, away_cards = (sample_poisson(rng, expected) for expected in self.get_expected("Cards", "Full-time"))
+        home_possession = min(max(round(50 + 8 * self.strength + rng.gauss(0, 6)), 25), 75)
+        return {
+            "halftime_score": f"{home_halftime}-{away_halftime}",
+            "fulltime_score": f"{home_goals}-{away_goals}",
+            "penalty": "None-None",
+            "possesion": f"{home_possession}%-{100 - home_possession}%",
+            "total_shots": f"{home_goals * 3 + sample_poisson(rng, 8)}-{away_goals * 3 + sample_poisson(rng, 7)}",
+            "corners": f"{home_corners}-{away_corners}",
+            "cards": f"{home_cards}-{away_cards}",
+        }
+
+
+def get_round_robin(teams: Sequence[str]) -> List[List[Tuple[str, str]]]:
+    """
+    The matchdays of the double round-robin of the teams (the circle method): each team plays each other
+    team once at home and once away, and one match per matchday
+    """
+    teams = list(teams) + ([None] if len(teams) % 2 else [])
+    num_teams = len(teams)
+    first_half = []
+    for round_index in range(num_teams - 1):
+        matchday = []
+        for i in range(num_teams // 2):
+            home_team, away_team = teams[i], teams[num_teams - 1 - i]
+            if home_team is not None and away_team is not None:
+                # alternate the home team of the first fixture of each round
+                matchday.append((home_team, away_team) if (i > 0 or round_index % 2 == 0) else (away_team, home_team))
+        first_half.append(matchday)
+        # rotate every team but the first one
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    return first_half + [[(away_team, home_team) for home_team, away_team in matchday] for matchday in first_half]
+
+
+def get_season_fixtures(rng: random.Random, league: str, num_teams: int, season_start: date) -> List[Fixture]:
+    """ The fixtures of the season of the league, the matchdays are on the weekends """
+    teams = [f"{league} Club {i + 1}" for i in range(num_teams)]
+    strengths = {team: rng.gauss(0, 0.35) for team in teams}
+    fixtures = []
+    for matchday_index, matchday in enumerate(get_round_robin(teams)):
+        # the Saturday of the week of the matchday
+        saturday = get_week_start(season_start) + timedelta(weeks=matchday_index, days=5)
+        for home_team, away_team in matchday:
+            kickoff = datetime.combine(saturday, datetime.min.time()) + timedelta(
+                days=rng.randrange(2), hours=rng.choice([12, 14, 15, 17, 19]), minutes=rng.choice([0, 30]))
+            fixtures.append(Fixture(
+                league, len(fixtures), kickoff, home_team, away_team,
+                # the home advantage, and the difference of the teams
+                0.25 + strengths[home_team] - strengths[away_team],
+            ))
+    return fixtures
+
+
+def get_activity_counts(rng: random.Random, num_users: int, num_bets: int, alpha: float) -> List[int]:
+    """
+    The number of bets of each user, following the power law of the exponent alpha (the Zipf law):
+    the user of rank r places about 1 / r^alpha of the bets. The users are shuffled, so the ids don't give the rank
+    """
+    weights = [1 / (rank ** alpha) for rank in range(1, num_users + 1)]
+    total_weight = sum(weights)
+    counts = [int(num_bets * weight / total_weight) for weight in weights]
+    # the rest of the rounding goes to the most active users
+    for i in range(num_bets - sum(counts)):
+        counts[i % num_users] += 1
+    rng.shuffle(counts)
+    return counts
+
+
+def get_next_id(model) -> int:
+    return (model.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+
+
+def load_rows(model, fields: Sequence[str], rows: Iterable[tuple]) -> int:
+    """
+    Load the rows (the values of the fields, in order) into the table of the model, with ```COPY``` on PostgreSQL,
+    with bulk inserts on the other databases. Return the number of rows
+    """
+    model_fields = [model._meta.get_field(name) for name in fields]
+    num_rows = 0
+    if connection.vendor == "postgresql":
+        quote_name = connection.ops.quote_name
+        columns = ", ".join(quote_name(model_field.column) for model_field in model_fields)
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    num_rows += 1
+        return num_rows
+
+    attnames = [model_field.attname for model_field in model_fields]
+    batch = []
+    for row in rows:
+        batch.append(model(**dict(zip(attnames, row))))
+        if len(batch) == LOAD_BATCH_SIZE:
+            num_rows += len(model.objects.bulk_create(batch))
+            batch = []
+    num_rows += len(model.objects.bulk_create(batch))
+    return num_rows
+
+
+def reset_sequences(models: Sequence) -> None:
+    """ The ids of the loaded rows were given, so the sequences continue after them """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def create_season_partitions(first_day: date, last_day: date) -> None:
+    """ The weekly partitions of the user bet tables for the bets of the season, before they are loaded """
+    if connection.vendor != "postgresql":
+        return
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        existing_weeks = {week_start for _, week_start in get_partitions(table)}
+        week_start = get_week_start(first_day)
+        while week_start <= last_day:
+            if week_start not in existing_weeks:
+                create_partition(table, week_start)
+            week_start += timedelta(weeks=1)
+
+
+def delete_generated_season() -> None:
+    """ Delete the generated matches (with their bet infos and bets) and bettors """
+    for user_bet_class in PARTITIONED_MODELS:
+        user_bet_class.objects.filter(user__username__startswith=BETTOR_PREFIX).delete()
+    for bet_info_class in [MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo]:
+        bet_info_class.objects.filter(match__match_id__gte=GENERATED_MATCH_ID_START).delete()
+    Match.objects.filter(match_id__gte=GENERATED_MATCH_ID_START).delete()
+    User.objects.filter(username__startswith=BETTOR_PREFIX).delete()
+
+
+def generate_season(
+    num_leagues: int=3, num_teams: int=20, num_users: int=1000, num_bets: int=100_000,
+    seed: int=0, season_start: Optional[date]=None, alpha: float=1.1, today: Optional[date]=None,
+) -> SeasonStats:
+    """
+    Generate the seasons of the first leagues, their market ladders, and the bettors with about num_bets bets
+    (a bettor bets at most once on each bet info). By default, the season started 19 weeks ago, so half of its
+    matches are finished. Run it in a transaction
+    """
+    start_time = time.perf_counter()
+    rng = random.Random(seed)
+    today = today or date.today()
+    season_start = season_start or today - timedelta(weeks=19)
+    stats = SeasonStats()
+
+    # the domestic leagues, the Champions League isn't a round-robin
+    leagues = [league for league in LEAGUES if league != "Champions League"][:num_leagues]
+    fixtures = [
+        fixture for league in leagues
+        for fixture in get_season_fixtures(random.Random(f"{seed}:{league}"), league, num_teams, season_start)
+    ]
+    for fixture in fixtures:
+        fixture.match_id = GENERATED_MATCH_ID_START + leagues.index(fixture.league) * 10_000 + fixture.index
+
+    # the matches, with the results of the finished ones
+    match_pk_start = get_next_id(Match)
+    match_rows = []
+    for i, fixture in enumerate(fixtures):
+        result = fixture.get_result(rng) if fixture.kickoff.date() < today else None
+        match_rows.append((
+            match_pk_start + i, fixture.league, fixture.match_id, fixture.kickoff, fixture.home_team, fixture.away_team,
+            "Finished" if result else "Not Finished", fixture.kickoff.date() if result else None,
+            *([result[name] for name in [
+                "halftime_score", "fulltime_score", "penalty", "possesion", "total_shots", "corners", "cards",
+            ]] if result else [None] * 7),
+        ))
+    stats.matches = load_rows(Match, [
+        "id", "league", "match_id", "date", "home_team", "away_team", "status", "updated_date",
+        "halftime_score", "fulltime_score", "penalty", "possesion", "total_shots", "corners", "cards",
+    ], match_rows)
+    stats.finished_matches = sum(row[6] == "Finished" for row in match_rows)
+
+    # the market ladders of the matches, and the kickoff of each bet info for the dates of its bets
+    bet_info_classes = {"moneyline": MoneylineBetInfo, "handicap": HandicapBetInfo, "total_objects": TotalObjectsBetInfo}
+    bet_info_fields = {
+        "moneyline": ["bet_team"],
+        "handicap": ["bet_team", "handicap_cover"],
+        "total_objects": ["under_or_over", "target_num_objects"],
+    }
+    bet_info_pk_starts = {market: get_next_id(bet_info_class) for market, bet_info_class in bet_info_classes.items()}
+    bet_info_kickoffs = {market: [] for market in bet_info_classes}
+    bet_info_rows = {market: [] for market in bet_info_classes}
+    for i, fixture in enumerate(fixtures):
+        for market, ladder in fixture.get_market_ladders().items():
+            for bet_info in ladder:
+                bet_info_rows[market].append((
+                    bet_info_pk_starts[market] + len(bet_info_rows[market]), match_pk_start + i,
+                    bet_info["time_type"], bet_info["bet_object"],
+                    *[bet_info[name] for name in bet_info_fields[market]], bet_info["odd"], "Unsettled",
+                ))
+                bet_info_kickoffs[market].append(fixture.kickoff.date())
+    for market, bet_info_class in bet_info_classes.items():
+        stats.bet_infos += load_rows(bet_info_class, [
+            "id", "match", "time_type", "bet_object", *bet_info_fields[market], "odd", "status",
+        ], bet_info_rows[market])
+    del bet_info_rows
+
+    # the bettors
+    user_pk_start = get_next_id(User)
+    password = make_password(None) # the bettors can't log in
+    stats.users = load_rows(User, [
+        "id", "username", "email", "password", "balance", "first_name", "last_name",
+        "is_superuser", "is_staff", "is_active", "date_joined",
+    ], (
+        (user_pk_start + i, f"{BETTOR_PREFIX}{i}", f"{BETTOR_PREFIX}{i}@soccerbet.test", password,
+         Decimal("10000.00"), "", "", False, False, True, datetime.combine(season_start, datetime.min.time()))
+        for i in range(num_users)
+    ))
+    reset_sequences([Match, MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo, User])
+
+    # the bets of each bettor, at most one per bet info, placed in the week before the match
+    create_season_partitions(season_start - timedelta(days=7), max(fixture.kickoff.date() for fixture in fixtures))
+    user_bet_classes = {"moneyline": UserMoneylineBet, "handicap": UserHandicapBet, "total_objects": UserTotalObjectsBet}
+    activity_counts = get_activity_counts(rng, num_users, num_bets, alpha)
+    for market, user_bet_class in user_bet_classes.items():
+        market_rng = random.Random(f"{seed}:{market}")
+        kickoffs = bet_info_kickoffs[market]
+
+        def get_bet_rows() -> Iterator[tuple]:
+            for i, activity_count in enumerate(activity_counts):
+                num_market_bets = min(round(activity_count * MARKET_SHARES[market]), len(kickoffs))
+                for bet_info_index in market_rng.sample(range(len(kickoffs)), num_market_bets):
+                    bet_amount = Decimal(min(max(round(market_rng.lognormvariate(3, 1)), 1), 5000))
+                    created_date = kickoffs[bet_info_index] - timedelta(days=market_rng.randrange(7))
+                    yield (user_pk_start + i, bet_info_pk_starts[market] + bet_info_index, bet_amount, created_date)
+
+        stats.bets[market] = load_rows(user_bet_class, ["user", "bet_info", "bet_amount", "created_date"], get_bet_rows())
+
+    stats.duration = time.perf_counter() - start_time
+    return stats
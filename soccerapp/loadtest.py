@@ -0,0 +1,437 @@
+"""
+LOAD TESTING OF THE API SERVER
+
+A small asyncio HTTP/1.1 client: each simulated client keeps its connection alive and sends its requests
+one after another, for the given duration, and the latencies of the responses are summarized by percentiles.
+It doesn't need any other package, so it runs wherever the management commands run.
+
+- ```run_load()```: the load of the concurrent clients, summarized by name of the requests
+- ```log_in_users()``` and ```BettingScenarios```: the users logged in through ```login```, and their weighted mix
+of scenarios (browse the matches, view the markets, place the bets and slips, edit and withdraw the bets)
+- ```start_server()```: the local gunicorn or uvicorn server under load
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+
+class LoadRequest(NamedTuple):
+    """ A request of the load test, the ```name``` groups the latencies in the summary """
+    name: str
+    method: str
+    path: str
+    headers: Dict[str, str] = {}
+    body: Union[bytes, None] = None
+
+
+class HTTPConnection:
+    """ Keep-alive HTTP/1.1 connection to the server, reopened when the server closes it """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def open(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def read_body(self, headers: Dict[str, str], status: int, method: str) -> bytes:
+        """ The body of the response, with its content length or in chunks """
+        if status == 204 and int(headers.get("content-length", 0)):
+            # the deletions of the bets answer 204 with their message, which is on the connection anyway
+            await self.reader.readexactly(int(headers["content-length"]))
+            return b""
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return b""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                chunk_size = int((await self.reader.readline()).split(b";")[0], 16)
+                if chunk_size == 0:
+                    # the trailers end with a blank line
+                    while (await self.reader.readline()) not in (b"\r\n", b""):
+                        pass
+                    return body
+                # each chunk ends with CRLF
+                body += (await self.reader.readexactly(chunk_size + 2))[:-2]
+        if "content-length" in headers:
+            return await self.reader.readexactly(int(headers["content-length"]))
+        # without the length, the body ends with the connection
+        body = await self.reader.read()
+        await self.close()
+        return body
+
+    async def request(self, method: str, path: str, headers: Dict[str, str]={}, body: Union[bytes, None]=None
+                      ) -> Tuple[int, Dict[str, str], bytes]:
+        """ Send the request, and return the status, the headers (lowercase names) and the body of the response """
+        reused = self.writer is not None
+        if not reused:
+            await self.open()
+
+        request_headers = {"Host": f"{self.host}:{self.port}", "Connection": "keep-alive", **headers}
+        if body is not None:
+            request_headers["Content-Length"] = str(len(body))
+        head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in request_headers.items())
+        try:
+            self.writer.write(head.encode("latin-1") + b"\r\n" + (body or b""))
+            await self.writer.drain()
+            status_line = await self.reader.readline()
+        except (BrokenPipeError, ConnectionResetError):
+            status_line = b""
+        if not status_line:
+            if reused:
+                # the server closed the idle connection, send the request again on a new one
+                await self.close()
+                return await self.request(method, path, headers, body)
+            raise ConnectionError("The server closed the connection.")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        response_body = await self.read_body(response_headers, status, method)
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, response_headers, response_body
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """ The percentile of the sorted values (nearest rank) """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize_latencies(latencies: List[float], num_errors: int, duration: float) -> Dict[str, Any]:
+    """ The summary of the latencies (in seconds) of the requests, in milliseconds """
+    latencies = sorted(latencies)
+    num_requests = len(latencies) + num_errors
+    return {
+        "requests": len(latencies),
+        "errors": num_errors,
+        "error_rate": round(num_errors / num_requests, 4) if num_requests else 0.0,
+        "requests_per_second": round(len(latencies) / duration, 1) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def run_client(base_url: str, client_index: int, next_request: Callable[[int], LoadRequest],
+                     deadline: float, latencies: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    """ Send the requests of the client until the deadline, recording the latency of each of them """
+    url = urlsplit(base_url)
+    connection = HTTPConnection(url.hostname, url.port or 80)
+    try:
+        while time.perf_counter() < deadline:
+            load_request = next_request(client_index)
+            start_time = time.perf_counter()
+            try:
+                status, _, _ = await connection.request(
+                    load_request.method, url.path.rstrip("/") + load_request.path,
+                    load_request.headers, load_request.body,
+                )
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                # count the error, and open a new connection for the next request
+                errors[load_request.name] = errors.get(load_request.name, 0) + 1
+                await connection.close()
+                continue
+
+            latency = time.perf_counter() - start_time
+            # the requests of the scenarios are valid, so a client error is an error too
+            if status >= 400:
+                errors[load_request.name] = errors.get(load_request.name, 0) + 1
+            else:
+                latencies.setdefault(load_request.name, []).append(latency)
+    finally:
+        await connection.close()
+
+
+async def run_load(base_url: str, next_request: Callable[[int], LoadRequest],
+                   concurrency: int, duration: float) -> Dict[str, Any]:
+    """
+    Run the load of the concurrent clients against the server of the base url for the duration (in seconds).
+    ```next_request(client_index)``` gives the next request of the client.
+    The summary has the total and the summary of each name of the requests
+    """
+    latencies, errors = {}, {}
+    start_time = time.perf_counter()
+    await asyncio.gather(*[
+        run_client(base_url, client_index, next_request, start_time + duration, latencies, errors)
+        for client_index in range(concurrency)
+    ])
+    elapsed_time = time.perf_counter() - start_time
+
+    names = sorted(set(latencies) | set(errors))
+    return {
+        "concurrency": concurrency,
+        "duration": round(elapsed_time, 2),
+        "total": summarize_latencies(
+            [latency for name in names for latency in latencies.get(name, [])],
+            sum(errors.values()), elapsed_time,
+        ),
+        "requests": {
+            name: summarize_latencies(latencies.get(name, []), errors.get(name, 0), elapsed_time) for name in names
+        },
+    }
+
+
+async def wait_for_server(base_url: str, timeout: float=30) -> None:
+    """ Wait until the server of the base url accepts the connections """
+    url = urlsplit(base_url)
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"The server at {base_url} isn't up after {timeout} seconds.")
+            await asyncio.sleep(0.2)
+
+
+def get_server_command(server: str, workers: int, port: int) -> List[str]:
+    """ The command of the local server: gunicorn (WSGI) or uvicorn (ASGI) """
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "soccerbet.wsgi:application",
+                "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "soccerbet.asgi:application",
+            "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+
+
+def start_server(command: List[str], cwd: str, env: Dict[str, str]={}) -> subprocess.Popen:
+    """ Start the server in its own process group, with the environment variables added to the current ones """
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "soccerbet.settings"),
+        **env,
+    }
+    return subprocess.Popen(command, cwd=cwd, env=env, start_new_session=True)
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    """ Stop the server and its workers """
+    os.killpg(server.pid, signal.SIGTERM)
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+
+
+async def log_in_users(base_url: str, usernames: List[str], password: str, concurrency: int=16
+                       ) -> Tuple[List[Optional[str]], Dict[str, Any]]:
+    """
+    Log in the users through ```login```, a few at once. Return the access token of each user
+    (```None``` if its login failed), and the summary of the latencies of the logins
+    """
+    url = urlsplit(base_url)
+    path = url.path.rstrip("/") + "/soccerapp/login"
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def log_in(username: str) -> Optional[str]:
+        nonlocal errors
+        connection = HTTPConnection(url.hostname, url.port or 80)
+        body = json.dumps({"username": username, "password": password}).encode()
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                status, _, response_body = await connection.request(
+                    "POST", path, {"Content-Type": "application/json"}, body)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                status, response_body = None, b""
+            finally:
+                await connection.close()
+            if status != 200:
+                errors += 1
+                return None
+            latencies.append(time.perf_counter() - start_time)
+            return json.loads(response_body)["access"]
+
+    start_time = time.perf_counter()
+    tokens = await asyncio.gather(*[log_in(username) for username in usernames])
+    return tokens, summarize_latencies(latencies, errors, time.perf_counter() - start_time)
+
+
+MARKET_ROUTES = {
+    "moneyline": ("moneyline_bets", "moneyline_bet_info"),
+    "handicap": ("handicap_bets", "handicap_bet_info"),
+    "total_objects": ("total_bets", "total_bet_info"),
+}
+""" Mapping the market type to its routes of the user bets and of the bet infos """
+
+SCENARIO_WEIGHTS = {
+    "browse_matches": 35,
+    "view_markets": 30,
+    "place_bets": 15,
+    "place_slip": 10,
+    "edit_bet": 6,
+    "withdraw_bet": 4,
+}
+""" The default weights of the scenarios of ```BettingScenarios``` """
+
+
+class LoadUser:
+    """
+    A logged in user of the scenarios: the ids of the bet infos it can still bet on, and its bets
+    (id and bet info id) it can edit or withdraw, of each market
+    """
+
+    def __init__(self, user_id: int, token: str, bet_info_ids: Dict[str, List[int]],
+                 placed_bets: Dict[str, List[Tuple[int, int]]]) -> None:
+        self.user_id = user_id
+        self.headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        self.bet_info_ids = bet_info_ids
+        self.placed_bets = placed_bets
+
+
+class BettingScenarios:
+    """
+    The weighted mix of scenarios of the users, one user for each client. ```next_request(client_index)```
+    (for ```run_load()```) gives the next request of the scenario of the client, and picks its next scenario
+    when it's done. The names of the requests are their endpoints
+    """
+
+    def __init__(self, users: List[LoadUser], match_ids: List[int], leagues: List[str],
+                 weights: Dict[str, int]=SCENARIO_WEIGHTS, seed: int=0) -> None:
+        self.users = users
+        self.match_ids = match_ids
+        self.leagues = leagues
+        self.weights = {scenario: weight for scenario, weight in weights.items() if weight > 0}
+        self.rngs = [random.Random(f"{seed}:{client_index}") for client_index in range(len(users))]
+        self.queues = [deque() for _ in users]
+
+    def next_request(self, client_index: int) -> LoadRequest:
+        queue, rng, user = self.queues[client_index], self.rngs[client_index], self.users[client_index]
+        for _ in range(10):
+            if queue:
+                break
+            scenario = rng.choices(list(self.weights), weights=list(self.weights.values()))[0]
+            queue.extend(getattr(self, scenario)(user, rng))
+        if not queue:
+            # the bets of the user are all placed or withdrawn
+            queue.extend(self.browse_matches(user, rng))
+        return queue.popleft()
+
+    def get_new_bets(self, user: LoadUser, market: str, num_bets: int, rng: random.Random) -> List[dict]:
+        bet_info_ids = user.bet_info_ids[market]
+        return [
+            {"bet_info": {"id": bet_info_ids.pop()}, "bet_amount": f"{rng.randrange(1, 20) * 5}.00"}
+            for _ in range(min(num_bets, len(bet_info_ids)))
+        ]
+
+    def browse_matches(self, user: LoadUser, rng: random.Random) -> List[LoadRequest]:
+        """ The upcoming matches of a league, then one of them """
+        return [
+            LoadRequest("GET matches", "GET", f"/soccerapp/matches?status=NF&league={rng.choice(self.leagues)}",
+                        user.headers),
+            LoadRequest("GET matches/<match_id>", "GET", f"/soccerapp/matches/{rng.choice(self.match_ids)}",
+                        user.headers),
+        ]
+
+    def view_markets(self, user: LoadUser, rng: random.Random) -> List[LoadRequest]:
+        """ The markets of a match, then the bet infos of one of them """
+        match_id = rng.choice(self.match_ids)
+        _, bet_info_route = MARKET_ROUTES[rng.choice(list(MARKET_ROUTES))]
+        return [
+            LoadRequest("GET match/<match_id>/markets", "GET", f"/soccerapp/match/{match_id}/markets", user.headers),
+            LoadRequest(f"GET match/<match_id>/{bet_info_route}", "GET",
+                        f"/soccerapp/match/{match_id}/{bet_info_route}?bet_object=Goals", user.headers),
+        ]
+
+    def place_bets(self, user: LoadUser, rng: random.Random) -> List[LoadRequest]:
+        """ A few bets of a market """
+        market = rng.choice(list(MARKET_ROUTES))
+        bets = self.get_new_bets(user, market, rng.randint(1, 3), rng)
+        if not bets:
+            return []
+        bet_route, _ = MARKET_ROUTES[market]
+        return [LoadRequest(f"POST {bet_route}", "POST", f"/soccerapp/{bet_route}", user.headers,
+                            json.dumps(bets).encode())]
+
+    def place_slip(self, user: LoadUser, rng: random.Random) -> List[LoadRequest]:
+        """ A bet slip with a bet of each market """
+        if not all(user.bet_info_ids[market] for market in MARKET_ROUTES):
+            return []
+        bet_slip = {market: self.get_new_bets(user, market, 1, rng) for market in MARKET_ROUTES}
+        return [LoadRequest("POST bet_slip", "POST", "/soccerapp/bet_slip", user.headers,
+                            json.dumps(bet_slip).encode())]
+
+    def edit_bet(self, user: LoadUser, rng: random.Random) -> List[LoadRequest]:
+        """ The bets of a market, then a new bet amount of one of them """
+        market = rng.choice(list(MARKET_ROUTES))
+        if not user.placed_bets[market]:
+            return []
+        bet_id, bet_info_id = rng.choice(user.placed_bets[market])
+        bet_route, _ = MARKET_ROUTES[market]
+        bet = {"user": user.user_id, "bet_info": {"id": bet_info_id}, "bet_amount": f"{rng.randrange(1, 20) * 5}.00"}
+        return [
+            LoadRequest(f"GET {bet_route}", "GET", f"/soccerapp/{bet_route}?status=Unsettled", user.headers),
+            LoadRequest(f"PUT {bet_route}/<pk>", "PUT", f"/soccerapp/{bet_route}/{bet_id}", user.headers,
+                        json.dumps(bet).encode()),
+        ]
+
+    def withdraw_bet(self, user: LoadUser, rng: random.Random) -> List[LoadRequest]:
+        """ The history of the bets, then the withdrawal of one of them """
+        market = rng.choice(list(MARKET_ROUTES))
+        if not user.placed_bets[market]:
+            return []
+        bet_id, _ = user.placed_bets[market].pop(rng.randrange(len(user.placed_bets[market])))
+        bet_route, _ = MARKET_ROUTES[market]
+        return [
+            LoadRequest("GET bets", "GET", "/soccerapp/bets?status=Unsettled", user.headers),
+            LoadRequest(f"DELETE {bet_route}/<pk>", "DELETE", f"/soccerapp/{bet_route}/{bet_id}", user.headers),
+        ]
+
+
+def compare_summaries(previous_summaries: Dict[str, Dict[str, Any]], summaries: Dict[str, Dict[str, Any]],
+                      threshold: float) -> Tuple[List[str], List[str]]:
+    """
+    Compare the summaries of each endpoint with the previous ones. Return the lines of the comparison, and the
+    ones of the regressions: a lower throughput or a higher p99 beyond the threshold, or a higher error rate
+    """
+    lines, regressions = [], []
+    for name, summary in summaries.items():
+        previous = previous_summaries.get(name)
+        if previous is None:
+            continue
+
+        changes = []
+        if previous["requests_per_second"] and summary["requests_per_second"]:
+            throughput_change = summary["requests_per_second"] / previous["requests_per_second"] - 1
+            changes.append(f"throughput {throughput_change:+.1%}")
+            if throughput_change < -threshold:
+                regressions.append(
+                    f"{name}: throughput {previous['requests_per_second']} -> {summary['requests_per_second']} req/s")
+        if previous["p99_ms"] and summary["p99_ms"]:
+            p99_change = summary["p99_ms"] / previous["p99_ms"] - 1
+            changes.append(f"p99 {p99_change:+.1%}")
+            if p99_change > threshold:
+                regressions.append(f"{name}: p99 {previous['p99_ms']} -> {summary['p99_ms']} ms")
+        changes.append(f"error rate {previous['error_rate']:.2%} -> {summary['error_rate']:.2%}")
+        if summary["error_rate"] > previous["error_rate"]:
+            regressions.append(f"{name}: error rate {previous['error_rate']:.2%} -> {summary['error_rate']:.2%}")
+        lines.append(f"{name}: {', '.join(changes)}")
+    return lines, regressions
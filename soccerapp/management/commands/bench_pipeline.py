@@ -0,0 +1,199 @@
+import contextlib
+import io
+import random
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from soccerapp.api import request_api_football
+from soccerapp.benchmarks import compare_results, load_baseline, measure, save_baseline
+from soccerapp.factories import FakeAPIFootball
+from soccerapp.generator import BETTOR_PREFIX
+from soccerapp.models import (
+    Match, User, TaskRun, MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo,
+    UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet,
+)
+from soccerapp.replay import RecordingTransport, ReplayTransport
+from soccerapp.tasks import LEAGUES, delete_past_betinfos_and_matches
+from soccerapp.telemetry import TaskTelemetry, current_run, increment
+from soccerapp.uploaders import (
+    upload_matches, upload_match_bets, update_match_scores, delete_empty_bet_infos, settle_bets,
+)
+
+PIPELINE_BETTOR_PREFIX = f"{BETTOR_PREFIX}_pipeline"
+""" The prefix of the usernames of the synthetic bettors of the pipeline """
+
+ROW_COUNTERS = ["rows_inserted", "rows_updated", "rows_deleted", "rows_archived", "bets_settled", "balance_updates"]
+""" The counters of the telemetry adding up to the rows touched by a stage """
+
+MARKETS = [
+    (MoneylineBetInfo, UserMoneylineBet),
+    (HandicapBetInfo, UserHandicapBet),
+    (TotalObjectsBetInfo, UserTotalObjectsBet),
+]
+
+
+def place_bets(matches, num_users: int, bets_per_user: int, rng: random.Random) -> None:
+    """
+    Create the bettors, and their bets on random bet infos of the matches. The bets are created at once
+    (without the validation of the bet slip, the kickoffs of a recording can be past)
+    """
+    password = make_password(None)
+    users = User.objects.bulk_create([
+        User(
+            username=f"{PIPELINE_BETTOR_PREFIX}{i}", email=f"{PIPELINE_BETTOR_PREFIX}{i}@soccerbet.test",
+            password=password, balance=Decimal("10000.00"),
+        )
+        for i in range(num_users)
+    ])
+    increment("rows_inserted", len(users))
+
+    bet_infos = [
+        (user_bet_class, bet_info)
+        for bet_info_class, user_bet_class in MARKETS
+        for bet_info in bet_info_class.objects.filter(match__in=matches)
+    ]
+    user_bet_lists = {user_bet_class: [] for _, user_bet_class in MARKETS}
+    for user in users:
+        for user_bet_class, bet_info in rng.sample(bet_infos, min(bets_per_user, len(bet_infos))):
+            bet_amount = Decimal(rng.randrange(10, 100))
+            user.balance -= bet_amount
+            user_bet_lists[user_bet_class].append(user_bet_class(user=user, bet_info=bet_info, bet_amount=bet_amount))
+
+    for user_bet_class, user_bet_list in user_bet_lists.items():
+        increment("rows_inserted", len(user_bet_class.objects.bulk_create(user_bet_list, batch_size=1000)))
+    increment("rows_updated", User.objects.bulk_update(users, ["balance"], batch_size=250))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the pipeline of a league on the recorded responses of API-Football, with their simulated "
+        "latency: the upload of the matches and their bets, the bets of synthetic users, the update of the scores, "
+        "the deletion of the empty bet infos, the settlement, and the deletion of the past matches. Report the "
+        "wall time, the requests to the API, the queries and the rows touched of each stage. "
+        "With --record, run the pipeline on the source (the fake API, or the real one) and record its responses. "
+        "The pipeline runs in a transaction that is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("recording", help="JSON file of the recorded responses of API-Football")
+        parser.add_argument(
+            "--record", choices=["fake", "api"],
+            help="Record the responses of the source to the file instead of replaying them "
+                 "(fake: soccerapp/factories.py, api: the real API-Football)",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.1,
+            help="Simulated latency of each replayed request, in seconds (default: 0.1)",
+        )
+        parser.add_argument("--league", choices=list(LEAGUES), default="La Liga", help="League of the pipeline")
+        parser.add_argument("--users", type=int, default=100, help="Number of synthetic bettors (default: 100)")
+        parser.add_argument("--bets-per-user", type=int, default=10, help="Number of bets of each bettor (default: 10)")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the bets and of the fake API (default: 0)")
+        parser.add_argument("--save", help="Write the results as a JSON baseline to this file")
+        parser.add_argument("--compare", help="Compare the results with the JSON baseline of this file")
+        parser.add_argument(
+            "--threshold", type=float, default=0.1,
+            help="Max loss of throughput (or gain of peak RSS) against the baseline, as a fraction (default: 0.1)",
+        )
+
+    def run_stage(self, name: str, func, transport):
+        """ Run the stage and measure it. Its counters include the ones of the task runs it records """
+        telemetry, num_calls = TaskTelemetry(), transport.num_calls
+        last_task_run = TaskRun.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        token = current_run.set(telemetry)
+        try:
+            # the uploaders print each match
+            with contextlib.redirect_stdout(io.StringIO()):
+                measures, result = measure(func, 0)
+        finally:
+            current_run.reset(token)
+
+        counters = telemetry.get_counters()
+        for task_run in TaskRun.objects.filter(pk__gt=last_task_run):
+            for counter, value in task_run.counters.items():
+                counters[counter] = counters.get(counter, 0) + value
+        rows = sum(counters.get(counter, 0) for counter in ROW_COUNTERS)
+        measures.update(
+            items=rows, throughput=round(rows / measures["seconds"], 1) if measures["seconds"] > 0 else None,
+        )
+
+        self.results.append({
+            "stage": name, "requests": transport.num_calls - num_calls, "rows": rows, **measures,
+            "counters": {counter: counters[counter] for counter in ROW_COUNTERS if counter in counters},
+        })
+        self.stdout.write(
+            f"{name}: {measures['seconds']:.2f}s, {transport.num_calls - num_calls} requests, "
+            f"{measures['queries']} queries, {rows} rows touched"
+        )
+        return result
+
+    def run_pipeline(self, transport, options) -> None:
+        league, rng = options["league"], random.Random(options["seed"])
+        with tempfile.TemporaryDirectory() as archive_dir, \
+                override_settings(API_FOOTBALL_TRANSPORT=transport, ARCHIVE_DIR=archive_dir), transaction.atomic():
+            if User.objects.filter(username__startswith=PIPELINE_BETTOR_PREFIX).exists():
+                raise CommandError("The bettors of the pipeline already exist.")
+
+            matches = self.run_stage(
+                "upload_matches", lambda: list(upload_matches(league, LEAGUES[league])), transport)
+            self.run_stage("upload_match_bets", lambda: upload_match_bets(matches), transport)
+            self.run_stage(
+                "place_bets", lambda: place_bets(matches, options["users"], options["bets_per_user"], rng), transport)
+            finished_matches = self.run_stage(
+                "update_match_scores", lambda: list(update_match_scores(league, LEAGUES[league])), transport)
+            self.run_stage("delete_empty_bet_infos", lambda: delete_empty_bet_infos(finished_matches), transport)
+            self.run_stage("settle_bets", lambda: settle_bets(finished_matches), transport)
+
+            # the settled matches are past their days limit 2 weeks later
+            Match.objects.filter(pk__in=[match.pk for match in finished_matches]).update(
+                updated_date=date.today() - timedelta(days=15))
+            self.run_stage("delete_past_betinfos_and_matches", delete_past_betinfos_and_matches, transport)
+
+            # don't keep the pipeline
+            transaction.set_rollback(True)
+
+    def handle(self, *args, **options):
+        if options["record"] == "fake":
+            transport = RecordingTransport(FakeAPIFootball(seed=options["seed"], fixtures_per_day=10), "fake")
+        elif options["record"] == "api":
+            transport = RecordingTransport(request_api_football, "api")
+        else:
+            try:
+                transport = ReplayTransport(options["recording"], options["latency"])
+            except FileNotFoundError:
+                raise CommandError(f"The recording {options['recording']} doesn't exist, record it with --record.")
+
+        self.results = []
+        self.run_pipeline(transport, options)
+        total_seconds = sum(result["seconds"] for result in self.results)
+        self.stdout.write(
+            f"Pipeline of {options['league']}: {total_seconds:.2f}s, "
+            f"{sum(result['requests'] for result in self.results)} requests, "
+            f"{sum(result['queries'] for result in self.results)} queries, "
+            f"{sum(result['rows'] for result in self.results)} rows touched"
+        )
+
+        if options["record"]:
+            transport.save(options["recording"])
+            self.stdout.write(f"{len(transport.responses)} responses recorded to {options['recording']}")
+
+        if options["save"]:
+            save_baseline(options["save"], "bench_pipeline", self.results, {
+                "league": options["league"], "users": options["users"], "bets_per_user": options["bets_per_user"],
+                "seed": options["seed"], "latency": options["latency"], "record": options["record"],
+            })
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if options["compare"]:
+            baseline = load_baseline(options["compare"])
+            lines, regressions = compare_results(baseline["results"], self.results, ["stage"], options["threshold"])
+            self.stdout.write(f"Compared with the baseline of {baseline['created']}:")
+            for line in lines:
+                self.stdout.write(f"  {line}")
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regression against the baseline.")
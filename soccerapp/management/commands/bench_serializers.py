@@ -0,0 +1,101 @@
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from soccerapp.models import Match, MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo
+from soccerapp.renderers import ORJSONRenderer
+from soccerapp.serializers import (
+    MatchSerializer, MatchReadSerializer,
+    MoneylineBetInfoSerializer, MoneylineBetInfoReadSerializer,
+    HandicapBetInfoSerizalizer, HandicapBetInfoReadSerializer,
+    TotalObjectsBetInfoSerializer, TotalObjectsBetInfoReadSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the serialization (and rendering) time per 1,000 matches and bet infos, "
+        "of the model serializers and the JSON renderer of DRF against the read serializers and the orjson renderer. "
+        "The rows are created in a transaction that is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Number of rows of each list (default: 1000)")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs, the best is kept (default: 5)")
+
+    def seed(self, num_rows: int) -> None:
+        """ Create the matches (half of them finished) and one bet info of each type per match """
+
+        matches = Match.objects.bulk_create([
+            Match(
+                league="La Liga", match_id=10**9 + i, date=datetime(2100, 1, 1, 12) + timedelta(hours=i),
+                home_team=f"Home {i}", away_team=f"Away {i}",
+                home_team_logo="https://media.api-sports.io/football/teams/541.png",
+                away_team_logo="https://media.api-sports.io/football/teams/529.png",
+                status="Finished" if i % 2 else "Not Finished",
+                updated_date=datetime(2100, 1, 2).date() if i % 2 else None,
+                halftime_score="1-0", fulltime_score="2-1", penalty="None-None", possesion="55-45",
+                total_shots="12-8", corners="6-3", cards="2-1",
+            )
+            for i in range(num_rows)
+        ], batch_size=500)
+        MoneylineBetInfo.objects.bulk_create([
+            MoneylineBetInfo(match=match, time_type="Full-time", bet_team=match.home_team, odd=120)
+            for match in matches
+        ], batch_size=500)
+        HandicapBetInfo.objects.bulk_create([
+            HandicapBetInfo(match=match, time_type="Full-time", bet_team=match.home_team, handicap_cover=1.5, odd=-110)
+            for match in matches
+        ], batch_size=500)
+        TotalObjectsBetInfo.objects.bulk_create([
+            TotalObjectsBetInfo(match=match, time_type="Half-time", under_or_over="Over", target_num_objects=2.5, odd=150)
+            for match in matches
+        ], batch_size=500)
+
+    def time_best(self, render, repeat: int):
+        """ The best time of the runs, and the rendered bytes """
+        best_time = None
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            content = render()
+            run_time = time.perf_counter() - start_time
+            best_time = run_time if best_time is None else min(best_time, run_time)
+        return best_time, content
+
+    def handle(self, *args, **options):
+        num_rows, repeat = options["rows"], options["repeat"]
+        json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+
+        with transaction.atomic():
+            self.seed(num_rows)
+            matches = Match.objects.filter(match_id__gte=10**9)
+
+            benchmarks = [
+                ("matches", Match.objects.filter(pk__in=matches), MatchSerializer, MatchReadSerializer, None),
+                ("moneyline bet infos", MoneylineBetInfo.objects.filter(match__in=matches).order_by("pk"),
+                    MoneylineBetInfoSerializer, MoneylineBetInfoReadSerializer, "match"),
+                ("handicap bet infos", HandicapBetInfo.objects.filter(match__in=matches).order_by("pk"),
+                    HandicapBetInfoSerizalizer, HandicapBetInfoReadSerializer, "match"),
+                ("total objects bet infos", TotalObjectsBetInfo.objects.filter(match__in=matches).order_by("pk"),
+                    TotalObjectsBetInfoSerializer, TotalObjectsBetInfoReadSerializer, "match"),
+            ]
+            for name, queryset, model_serializer, read_serializer, related_field in benchmarks:
+                model_queryset = queryset.select_related(related_field) if related_field else queryset
+
+                before_time, before_content = self.time_best(
+                    lambda: json_renderer.render(model_serializer(model_queryset.all(), many=True).data), repeat)
+                after_time, after_content = self.time_best(
+                    lambda: orjson_renderer.render(read_serializer(queryset.all()).data), repeat)
+
+                if before_content != after_content:
+                    raise CommandError(f"The read serializer of the {name} doesn't render the same JSON.")
+
+                scale = 1000 / num_rows * 1000 # milliseconds per 1,000 rows
+                self.stdout.write(
+                    f"{name}: {before_time * scale:.1f} ms -> {after_time * scale:.1f} ms per 1,000 rows "
+                    f"({before_time / after_time:.1f}x faster)"
+                )
+
+            # Don't keep the benchmark rows
+            transaction.set_rollback(True)
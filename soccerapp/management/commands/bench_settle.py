@@ -0,0 +1,131 @@
+import contextlib
+import io
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from soccerapp.benchmarks import MAX_SPREAD, compare_results, load_baseline, measure, save_baseline
+from soccerapp.generator import BETTOR_PREFIX, GENERATED_MATCH_ID_START, generate_season
+from soccerapp.models import Match, User, UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet
+from soccerapp.settle import settle_bet_list
+from soccerapp.uploaders import settle_bets
+
+MARKETS = {"moneyline": UserMoneylineBet, "handicap": UserHandicapBet, "total_objects": UserTotalObjectsBet}
+
+
+def settle_by_market(matches) -> None:
+    """ Settle the bets of each market at once """
+    for market, user_bet_class in MARKETS.items():
+        settle_bet_list(market, user_bet_class.objects.filter(bet_info__match__in=matches))
+
+
+def settle_by_match(matches) -> None:
+    """ Settle the bets match by match, as the settlement task does """
+    settle_bets(matches)
+
+
+SETTLE_ENGINES = {
+    "settle_bet_list": settle_by_market,
+    "settle_bets": settle_by_match,
+}
+""" Mapping the name of the engine to the function settling the bets of the matches """
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the settlement engines over generated seasons of each number of bets (see soccerapp/generator.py): "
+        "the median throughput (bets per second) of the repeated runs after the warm-up, the peak RSS and the number "
+        "of queries. The results can be saved as a JSON baseline, and compared with a previous baseline, failing on "
+        "the regressions (of the throughput only when the runs are stable). "
+        "Every dataset is generated in a transaction that is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[1000, 10_000],
+            help="Numbers of bets of the datasets, e.g. 1000 10000 100000 1000000 10000000 (default: 1000 10000)",
+        )
+        parser.add_argument(
+            "--engines", nargs="+", choices=list(SETTLE_ENGINES), default=list(SETTLE_ENGINES),
+            help="Engines to benchmark (default: all)",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the datasets (default: 0)")
+        parser.add_argument("--repeat", type=int, default=5, help="Measured runs of each engine (default: 5)")
+        parser.add_argument(
+            "--warmup", type=int, default=1, help="Runs of each engine before the measured ones (default: 1)")
+        parser.add_argument("--save", help="Write the results as a JSON baseline to this file")
+        parser.add_argument("--compare", help="Compare the results with the JSON baseline of this file")
+        parser.add_argument(
+            "--threshold", type=float, default=0.1,
+            help="Max loss of throughput (or gain of peak RSS) against the baseline, as a fraction (default: 0.1)",
+        )
+        parser.add_argument(
+            "--max-spread", type=float, default=MAX_SPREAD,
+            help="Max spread of the runs (their range over their median) for the throughput to be compared, "
+                 f"as a fraction (default: {MAX_SPREAD})",
+        )
+
+    def run_size(self, num_bets: int, engines: list, seed: int, repeat: int, warmup: int) -> list:
+        """
+        Generate the dataset, and measure each engine on it.
+        Every run of every engine settles the same unsettled bets
+        """
+        results = []
+        with transaction.atomic():
+            if User.objects.filter(username__startswith=BETTOR_PREFIX).exists():
+                raise CommandError("A season is already generated, delete it with generate_season --flush.")
+
+            # every match of the season is finished, so every bet is settled
+            stats = generate_season(
+                num_leagues=3, num_users=max(num_bets // 50, 10), num_bets=num_bets, seed=seed,
+                season_start=date.today() - timedelta(weeks=40),
+            )
+            matches = Match.objects.filter(match_id__gte=GENERATED_MATCH_ID_START, status="Finished")
+            num_settled_bets = sum(stats.bets.values())
+
+            for engine in engines:
+                savepoint_id = transaction.savepoint()
+                # the settlement prints each match
+                with contextlib.redirect_stdout(io.StringIO()):
+                    measures, _ = measure(
+                        lambda: SETTLE_ENGINES[engine](matches), num_settled_bets, repeat=repeat, warmup=warmup,
+                        reset=lambda: transaction.savepoint_rollback(savepoint_id),
+                    )
+
+                results.append({"engine": engine, "bets": num_bets, **measures})
+                spread = f", spread {measures['spread']:.1%}" if measures["spread"] is not None else ""
+                self.stdout.write(
+                    f"{engine} {num_bets} bets: {measures['items']} settled in {measures['seconds']:.2f}s "
+                    f"(median of {measures['runs']}{spread}, {measures['throughput']} bets/s), "
+                    f"{measures['queries']} queries, peak RSS {measures['peak_rss_mb']} MB"
+                )
+
+            # don't keep the dataset
+            transaction.set_rollback(True)
+        return results
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1 or options["warmup"] < 0:
+            raise CommandError("The runs must be repeated at least once, after a positive number of warm-up runs.")
+
+        results = []
+        for num_bets in options["sizes"]:
+            results.extend(self.run_size(
+                num_bets, options["engines"], options["seed"], options["repeat"], options["warmup"]))
+
+        if options["save"]:
+            save_baseline(options["save"], "bench_settle", results, {
+                "sizes": options["sizes"], "engines": options["engines"], "seed": options["seed"],
+                "repeat": options["repeat"], "warmup": options["warmup"],
+            })
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if options["compare"]:
+            baseline = load_baseline(options["compare"])
+            lines, regressions = compare_results(
+                baseline["results"], results, ["engine", "bets"], options["threshold"], options["max_spread"])
+            self.stdout.write(f"Compared with the baseline of {baseline['created']}:")
+            for line in lines:
+                self.stdout.write(f"  {line}")
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regression against the baseline.")
@@ -0,0 +1,85 @@
+import asyncio
+import itertools
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from soccerapp.loadtest import (
+    LoadRequest, get_server_command, run_load, start_server, stop_server, wait_for_server,
+)
+
+DEFAULT_PATHS = [
+    "/soccerapp/matches?status=NF",
+    "/soccerapp/matches?status=NF&league=epl&page_size=50",
+    "/soccerapp/standings?league=epl",
+    "/soccerapp/teams?league=lal",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput and the latencies of the public reads served by the sync views (gunicorn, WSGI) "
+        "and by the async views (uvicorn, ASGI) with the same number of workers, at increasing concurrency. "
+        "The response cache is turned off on both servers, so every request queries the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Number of workers of each server (default: 2)")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64],
+                            help="Numbers of concurrent clients (default: 1 8 32 64)")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds of load per run (default: 10)")
+        parser.add_argument("--port", type=int, default=8100, help="Port of the servers (default: 8100)")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="Path to request, can be repeated (default: the lists of matches, standings, teams)")
+
+    def run_server_load(self, name, command, async_views, base_url, paths, options):
+        """ The summaries of the load of each concurrency against the server, with the response cache turned off """
+        server = start_server(command, settings.BASE_DIR, {
+            "CACHE_URL": "dummycache://",
+            "ASYNC_READ_VIEWS": "on" if async_views else "off",
+        })
+        try:
+            asyncio.run(wait_for_server(base_url))
+            summaries = []
+            for concurrency in options["concurrency"]:
+                # each client goes through the paths in turn
+                next_paths = [itertools.cycle(paths[i % len(paths):] + paths[:i % len(paths)]) for i in range(concurrency)]
+                summary = asyncio.run(run_load(
+                    base_url, lambda client_index: LoadRequest("read", "GET", next(next_paths[client_index])),
+                    concurrency, options["duration"],
+                ))
+                total = summary["total"]
+                self.stdout.write(
+                    f"{name} | {concurrency} clients: {total['requests_per_second']} req/s, "
+                    f"p50 {total['p50_ms']} ms, p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms, "
+                    f"{total['errors']} errors"
+                )
+                summaries.append(summary)
+            return summaries
+        finally:
+            stop_server(server)
+
+    def handle(self, *args, **options):
+        workers, port = options["workers"], options["port"]
+        paths = options["paths"] or DEFAULT_PATHS
+        base_url = f"http://127.0.0.1:{port}"
+
+        try:
+            import gunicorn, uvicorn # noqa: F401
+        except ImportError:
+            raise CommandError("The comparison needs gunicorn and uvicorn (see requirements.txt).")
+
+        sync_summaries = self.run_server_load(
+            "sync (gunicorn)", get_server_command("gunicorn", workers, port), False, base_url, paths, options,
+        )
+        async_summaries = self.run_server_load(
+            "async (uvicorn)", get_server_command("uvicorn", workers, port), True, base_url, paths, options,
+        )
+
+        for sync_summary, async_summary in zip(sync_summaries, async_summaries):
+            sync_total, async_total = sync_summary["total"], async_summary["total"]
+            speedup = async_total["requests_per_second"] / sync_total["requests_per_second"] \
+                if sync_total["requests_per_second"] else 0.0
+            self.stdout.write(
+                f"{sync_summary['concurrency']} clients: {sync_total['requests_per_second']} -> "
+                f"{async_total['requests_per_second']} req/s ({speedup:.2f}x), "
+                f"p99 {sync_total['p99_ms']} -> {async_total['p99_ms']} ms"
+            )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from soccerapp.partitions import create_bet_partitions
+
+
+class Command(BaseCommand):
+    help = "Create the weekly partitions of the user bet tables ahead of time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--weeks-ahead", type=int, default=4,
+            help="Number of weeks after this week to create the partitions for (default: 4)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The user bet tables are only partitioned on PostgreSQL.")
+
+        with transaction.atomic():
+            created_partitions = create_bet_partitions(options["weeks_ahead"])
+        for name in created_partitions:
+            self.stdout.write(f"Created partition {name}")
@@ -0,0 +1,52 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from soccerapp.generator import BETTOR_PREFIX, delete_generated_season, generate_season
+from soccerapp.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the synthetic seasons of the leagues (fixtures, market ladders and results) and the bettors "
+        "with their bets, the same for the same seed (see soccerapp/generator.py). "
+        "Example for 10 million bets: --users 100000 --bets 10000000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--leagues", type=int, default=3, help="Number of domestic leagues (default: 3)")
+        parser.add_argument("--teams", type=int, default=20, help="Number of teams of each league (default: 20)")
+        parser.add_argument("--users", type=int, default=1000, help="Number of bettors (default: 1000)")
+        parser.add_argument("--bets", type=int, default=100_000, help="Number of bets, about (default: 100000)")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator (default: 0)")
+        parser.add_argument(
+            "--season-start", type=date.fromisoformat,
+            help="First day of the season, YYYY-MM-DD (default: 19 weeks ago, half of the season is finished)",
+        )
+        parser.add_argument(
+            "--alpha", type=float, default=1.1,
+            help="Exponent of the power law of the activity of the bettors (default: 1.1)",
+        )
+        parser.add_argument("--flush", action="store_true", help="Delete the season generated before")
+
+    def handle(self, *args, **options):
+        if not 1 <= options["leagues"] <= 5:
+            raise CommandError("The number of leagues is between 1 and 5.")
+
+        with transaction.atomic():
+            if options["flush"]:
+                delete_generated_season()
+            elif User.objects.filter(username__startswith=BETTOR_PREFIX).exists():
+                raise CommandError("A season is already generated, delete it with --flush.")
+
+            stats = generate_season(
+                num_leagues=options["leagues"], num_teams=options["teams"], num_users=options["users"],
+                num_bets=options["bets"], seed=options["seed"], season_start=options["season_start"],
+                alpha=options["alpha"],
+            )
+
+        self.stdout.write(
+            f"{stats.matches} matches ({stats.finished_matches} finished), {stats.bet_infos} bet infos, "
+            f"{stats.users} bettors and {sum(stats.bets.values())} bets "
+            f"({', '.join(f'{count} {market}' for market, count in stats.bets.items())}) "
+            f"generated successfully in {stats.duration:.1f}s!"
+        )
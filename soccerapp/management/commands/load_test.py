@@ -0,0 +1,207 @@
+import asyncio
+import importlib
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from soccerapp.benchmarks import load_baseline, save_baseline
+from soccerapp.factories import seed_dataset
+from soccerapp.loadtest import (
+    SCENARIO_WEIGHTS, BettingScenarios, LoadUser, compare_summaries, get_server_command, log_in_users, run_load,
+    start_server, stop_server, wait_for_server,
+)
+from soccerapp.models import (
+    Match, User, MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo,
+    UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet,
+)
+from soccerapp.views.main_views import LEAGUES_MAP
+
+LOAD_USER_PREFIX = "loadtest"
+""" The prefix of the usernames of the synthetic users of the load test """
+
+LOAD_USER_PASSWORD = "LoadTest123!"
+
+MARKETS = {
+    "moneyline": (MoneylineBetInfo, UserMoneylineBet),
+    "handicap": (HandicapBetInfo, UserHandicapBet),
+    "total_objects": (TotalObjectsBetInfo, UserTotalObjectsBet),
+}
+
+DEFAULT_MIX = " ".join(f"{scenario}={weight}" for scenario, weight in SCENARIO_WEIGHTS.items())
+
+MAX_NEW_BETS = 200
+""" The max number of bet infos of each market a user can bet on during the load """
+
+
+def parse_weight(value: str):
+    """ The weight of a scenario, as ```<scenario>=<weight>``` """
+    scenario, _, weight = value.partition("=")
+    if scenario not in SCENARIO_WEIGHTS or not weight.isdigit():
+        raise ValueError(value)
+    return scenario, int(weight)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the REST API against the seeded database: log in the synthetic users through the login endpoint, "
+        "then run their weighted mix of scenarios (browse the matches, view the markets, place the bets and the "
+        "slips, edit and withdraw the bets) against a local gunicorn or uvicorn server for the duration. "
+        "Report the p50, p95 and p99 latencies, the throughput and the error rate of each endpoint, "
+        "which can be saved as JSON and compared with the results of another commit"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            help="Base url of a running server, e.g. http://127.0.0.1:8000 (default: start the --server)",
+        )
+        parser.add_argument("--server", choices=["gunicorn", "uvicorn"], default="gunicorn",
+                            help="Local server to start (default: gunicorn)")
+        parser.add_argument("--workers", type=int, default=2, help="Number of workers of the server (default: 2)")
+        parser.add_argument("--port", type=int, default=8100, help="Port of the server (default: 8100)")
+        parser.add_argument("--users", type=int, default=50,
+                            help="Number of synthetic users, each one a concurrent client (default: 50)")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds of load (default: 30)")
+        parser.add_argument("--bets-per-user", type=int, default=5,
+                            help="Bets of each market placed by each user before the load, "
+                                 "to be edited and withdrawn (default: 5)")
+        parser.add_argument("--mix", type=parse_weight, nargs="+", default=[],
+                            help=f"Weights of the scenarios, e.g. place_bets=30 (default: {DEFAULT_MIX})")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the scenarios (default: 0)")
+        parser.add_argument("--seed-dataset", action="store_true",
+                            help="Seed the empty database with the dataset of soccerapp/factories.py first")
+        parser.add_argument("--save", help="Write the results as JSON to this file")
+        parser.add_argument("--compare", help="Compare the results with the JSON results of this file")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2,
+            help="Max loss of throughput (or gain of p99) of an endpoint against the previous results, "
+                 "as a fraction (default: 0.2)",
+        )
+
+    @transaction.atomic
+    def create_users(self, num_users: int, bets_per_user: int, duration: float, rng: random.Random):
+        """
+        Create the synthetic users (replacing the ones of the previous load test), and their bets on the matches
+        that begin after the load. Return the users with the bet infos they can bet on and their bets,
+        the ids of the matches and the leagues
+        """
+        User.objects.filter(username__startswith=LOAD_USER_PREFIX).delete()
+        matches = Match.objects.filter(
+            status="Not Finished", date__gt=timezone.now() + timedelta(seconds=duration + 60),
+        )
+        bet_info_ids = {
+            market: list(
+                bet_info_class.objects.filter(match__in=matches, status="Unsettled").values_list("pk", flat=True))
+            for market, (bet_info_class, _) in MARKETS.items()
+        }
+        if not all(bet_info_ids.values()):
+            raise CommandError("No upcoming match with its bet infos, seed the database with --seed-dataset.")
+
+        password = make_password(LOAD_USER_PASSWORD)
+        users = User.objects.bulk_create([
+            User(username=f"{LOAD_USER_PREFIX}{i}", email=f"{LOAD_USER_PREFIX}{i}@soccerbet.test",
+                 password=password, balance=Decimal("1000000.00"))
+            for i in range(num_users)
+        ])
+
+        user_bet_info_ids, user_bet_lists = [], {market: [] for market in MARKETS}
+        for user in users:
+            user_bet_info_ids.append({})
+            for market, (_, user_bet_class) in MARKETS.items():
+                num_sampled_ids = min(bets_per_user + MAX_NEW_BETS, len(bet_info_ids[market]))
+                sampled_ids = rng.sample(bet_info_ids[market], num_sampled_ids)
+                user_bet_info_ids[-1][market] = sampled_ids[bets_per_user:]
+                user_bet_lists[market].extend(
+                    user_bet_class(user=user, bet_info_id=bet_info_id, bet_amount=Decimal("10.00"))
+                    for bet_info_id in sampled_ids[:bets_per_user]
+                )
+
+        placed_bets = [{market: [] for market in MARKETS} for _ in users]
+        user_indexes = {user.pk: i for i, user in enumerate(users)}
+        for market, (_, user_bet_class) in MARKETS.items():
+            for user_bet in user_bet_class.objects.bulk_create(user_bet_lists[market], batch_size=1000):
+                placed_bets[user_indexes[user_bet.user_id]][market].append((user_bet.pk, user_bet.bet_info_id))
+
+        league_codes = {league: code for code, league in LEAGUES_MAP.items()}
+        leagues = sorted({league_codes[league] for league in matches.values_list("league", flat=True).distinct()})
+        return (
+            list(zip(users, user_bet_info_ids, placed_bets)),
+            list(matches.values_list("match_id", flat=True)),
+            leagues,
+        )
+
+    async def run_users_load(self, base_url: str, users, match_ids, leagues, options):
+        """ Log in the users, then run their scenarios. Return the summaries of the logins and of the load """
+        await wait_for_server(base_url)
+        tokens, login_summary = await log_in_users(
+            base_url, [user.username for user, _, _ in users], LOAD_USER_PASSWORD)
+        load_users = [
+            LoadUser(user.pk, token, bet_info_ids, placed_bets)
+            for (user, bet_info_ids, placed_bets), token in zip(users, tokens) if token is not None
+        ]
+        if not load_users:
+            raise CommandError(f"None of the users could log in to {base_url}.")
+
+        scenarios = BettingScenarios(
+            load_users, match_ids, leagues, {**SCENARIO_WEIGHTS, **dict(options["mix"])}, options["seed"])
+        summary = await run_load(base_url, scenarios.next_request, len(load_users), options["duration"])
+        return login_summary, summary
+
+    def handle(self, *args, **options):
+        if options["seed_dataset"]:
+            with transaction.atomic():
+                seed_dataset()
+        users, match_ids, leagues = self.create_users(
+            options["users"], options["bets_per_user"], options["duration"], random.Random(options["seed"]))
+
+        base_url, server = options["base_url"], None
+        try:
+            if base_url is None:
+                try:
+                    importlib.import_module(options["server"])
+                except ImportError:
+                    raise CommandError(f"The load test needs {options['server']} (see requirements.txt).")
+                base_url = f"http://127.0.0.1:{options['port']}"
+                server = start_server(
+                    get_server_command(options["server"], options["workers"], options["port"]), settings.BASE_DIR,
+                    {"ASYNC_READ_VIEWS": "on" if options["server"] == "uvicorn" else "off"},
+                )
+            login_summary, summary = asyncio.run(self.run_users_load(base_url, users, match_ids, leagues, options))
+        finally:
+            if server is not None:
+                stop_server(server)
+            User.objects.filter(username__startswith=LOAD_USER_PREFIX).delete()
+
+        summaries = {"login": login_summary, **summary["requests"], "total": summary["total"]}
+        self.stdout.write(f"{len(users)} users for {summary['duration']}s against {base_url}:")
+        for name, endpoint_summary in summaries.items():
+            self.stdout.write(
+                f"  {name}: {endpoint_summary['requests_per_second']} req/s, p50 {endpoint_summary['p50_ms']} ms, "
+                f"p95 {endpoint_summary['p95_ms']} ms, p99 {endpoint_summary['p99_ms']} ms, "
+                f"error rate {endpoint_summary['error_rate']:.2%}"
+            )
+
+        if options["save"]:
+            save_baseline(options["save"], "load_test", [
+                {"endpoint": name, **endpoint_summary} for name, endpoint_summary in summaries.items()
+            ], {
+                "server": None if options["base_url"] else options["server"], "workers": options["workers"],
+                "users": options["users"], "duration": options["duration"], "seed": options["seed"],
+                "mix": {**SCENARIO_WEIGHTS, **dict(options["mix"])},
+            })
+            self.stdout.write(f"Results written to {options['save']}")
+
+        if options["compare"]:
+            previous = load_baseline(options["compare"])
+            lines, regressions = compare_summaries(
+                {result["endpoint"]: result for result in previous["results"]}, summaries, options["threshold"])
+            self.stdout.write(f"Compared with the results of {previous.get('commit') or previous['created']}:")
+            for line in lines:
+                self.stdout.write(f"  {line}")
+            if regressions:
+                raise CommandError("Regressions against the previous results:\n" + "\n".join(regressions))
+            self.stdout.write("No regression against the previous results.")
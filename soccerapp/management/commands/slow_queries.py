@@ -0,0 +1,37 @@
+import json
+from django.core.management.base import BaseCommand
+from soccerapp.querylog import read_slow_queries, summarize_slow_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "List the fingerprints of the logged slow queries (see soccerapp/querylog.py) that took the most time "
+        "in total, with their call sites and their last sampled plan"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=10, help="Number of fingerprints to list (default: 10)")
+        parser.add_argument("--file", help="Log of the slow queries (default: SLOW_QUERY_FILE)")
+        parser.add_argument("--plans", action="store_true", help="Print the last sampled plan of each fingerprint")
+        parser.add_argument("--json", action="store_true", help="Print the summaries in JSON")
+
+    def handle(self, *args, **options):
+        summaries = summarize_slow_queries(read_slow_queries(options["file"]))[:options["top"]]
+        if options["json"]:
+            self.stdout.write(json.dumps(summaries, indent=2))
+            return
+        if not summaries:
+            self.stdout.write("No slow queries logged.")
+            return
+
+        for rank, summary in enumerate(summaries, start=1):
+            self.stdout.write(
+                f"{rank}. {summary['fingerprint']}: {summary['count']} queries, total {summary['total'] * 1000:.1f} ms, "
+                f"mean {summary['mean'] * 1000:.1f} ms, max {summary['max'] * 1000:.1f} ms"
+            )
+            self.stdout.write(f"   {summary['query'][:500]}")
+            for call_site, count in sorted(summary["call_sites"].items(), key=lambda item: item[1], reverse=True)[:3]:
+                self.stdout.write(f"   from {call_site} ({count})")
+            if options["plans"]:
+                plan = json.dumps(summary["plan"], indent=2) if summary["plan"] is not None else "not sampled"
+                self.stdout.write(f"   plan: {plan}")
@@ -0,0 +1,289 @@
+"""
+PERFORMANCE METRICS OF THE REQUESTS
+
+The metrics middleware (see soccerapp/middleware.py) records, for each route (the URL pattern of the view,
+e.g. soccerapp/match/<int:match_id>/handicap_bet_info) and method, the wall time, the number and the time
+of the database queries, and the size of the response, into the histograms of its process.
+
+Each process writes the snapshot of its histograms to its own file in ```METRICS_DIR``` (at most every
+```METRICS_FLUSH_INTERVAL``` seconds), and ```/metrics``` merges the files of every process (the server workers)
+into the Prometheus text format. The files of the workers that exited are merged into ```exited.json```,
+so the counters never go backwards.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+import uuid
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+
+HISTOGRAMS = {
+    "request_duration_seconds": (
+        "Wall time of the requests",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    "db_queries": (
+        "Number of database queries per request",
+        (0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+    ),
+    "db_duration_seconds": (
+        "Time of the database queries per request",
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    ),
+    "response_bytes": (
+        "Size of the responses (except the streams)",
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+""" Mapping the name of the histogram to its help and its buckets (upper bounds) """
+
+METRIC_PREFIX = "soccerbet_"
+
+EXITED_SNAPSHOT = "exited.json"
+""" The file of the merged snapshots of the processes that exited """
+
+
+class MetricsRegistry:
+    """
+    The histograms of the process, keyed by (route, method). Each histogram is the count of each bucket
+    (and of the values above the last bucket), the sum and the count of the values
+    """
+
+    def __init__(self) -> None:
+        self.histograms: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = {} # (route, method, status) to the count
+        self.lock = Lock()
+        self.flushed_at = time.monotonic()
+        self.pid, self.process_id = None, None
+
+    def observe(self, route: str, method: str, status: int, values: Dict[str, float]) -> None:
+        """ Record the values (by histogram name) of the request """
+        with self.lock:
+            route_histograms = self.histograms.setdefault((route, method), {})
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                histogram = route_histograms.get(name)
+                if histogram is None:
+                    histogram = route_histograms[name] = {"buckets": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+                histogram["buckets"][bisect_left(buckets, value)] += 1
+                histogram["sum"] += value
+                histogram["count"] += 1
+
+            response_key = (route, method, str(status))
+            self.responses[response_key] = self.responses.get(response_key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """ The snapshot of the metrics, in JSON """
+        with self.lock:
+            return {
+                "histograms": [
+                    {"route": route, "method": method, "name": name, **histogram, "buckets": list(histogram["buckets"])}
+                    for (route, method), route_histograms in self.histograms.items()
+                    for name, histogram in route_histograms.items()
+                ],
+                "responses": [
+                    {"route": route, "method": method, "status": status, "count": count}
+                    for (route, method, status), count in self.responses.items()
+                ],
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.histograms, self.responses = {}, {}
+
+    def get_snapshot_path(self) -> str:
+        """
+        The file of the process: its pid, and a random id so a new process reusing the pid
+        doesn't overwrite the counters of the one that exited. Example: 4242-1a2b3c4d.json
+        """
+        if self.pid != os.getpid():
+            # a new process, or the worker forked from the process
+            self.pid, self.process_id = os.getpid(), uuid.uuid4().hex[:8]
+        return os.path.join(settings.METRICS_DIR, f"{self.pid}-{self.process_id}.json")
+
+    def flush(self, force: bool=False) -> None:
+        """
+        Write the snapshot to the file of the process, at most every flush interval unless forced.
+        The errors are only logged, the metrics can't fail the request
+        """
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.flushed_at < getattr(settings, "METRICS_FLUSH_INTERVAL", 5):
+                return
+            self.flushed_at = now
+
+        try:
+            write_snapshot(self.get_snapshot_path(), self.snapshot())
+        except OSError as exc:
+            print(f"The metrics couldn't be flushed: {exc}")
+
+
+registry = MetricsRegistry()
+""" The metrics of this process """
+
+
+def write_snapshot(path: str, snapshot: Dict[str, Any]) -> None:
+    """ Replace the file with the snapshot at once, so it's never read half written """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # a temporary file of its own, as two threads of the process can flush at the same time
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(temp_fd, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """ The snapshot of the file, or None if it's gone or half written """
+    try:
+        with open(path) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_process_alive(file_name: str) -> bool:
+    """ If the process of the snapshot file is still running (the files of unknown names are kept) """
+    pid = file_name.split("-")[0].removesuffix(".json")
+    if not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_exited_snapshots(metrics_dir: str) -> None:
+    """
+    Merge the snapshots of the processes that exited into the exited snapshot, and remove their files.
+    The exited snapshot lists the files it merged, so they're never counted twice if they couldn't be removed
+    """
+    exited_path = os.path.join(metrics_dir, EXITED_SNAPSHOT)
+    exited_snapshot = read_snapshot(exited_path) or {"histograms": [], "responses": [], "merged": []}
+    file_names = [
+        file_name for file_name in os.listdir(metrics_dir)
+        if file_name.endswith(".json") and file_name != EXITED_SNAPSHOT
+        and file_name not in exited_snapshot["merged"] and not is_process_alive(file_name)
+    ]
+    if not file_names:
+        return
+
+    snapshots = [read_snapshot(os.path.join(metrics_dir, file_name)) for file_name in file_names]
+    merged = merge_snapshots([exited_snapshot, *[snapshot for snapshot in snapshots if snapshot is not None]])
+    write_snapshot(exited_path, {
+        "histograms": [
+            {"route": route, "method": method, "name": name, **histogram}
+            for (route, method, name), histogram in merged["histograms"].items()
+        ],
+        "responses": [
+            {"route": route, "method": method, "status": status, "count": count}
+            for (route, method, status), count in merged["responses"].items()
+        ],
+        # the files that are still there, they're removed right after
+        "merged": [
+            file_name for file_name in [*exited_snapshot["merged"], *file_names]
+            if os.path.exists(os.path.join(metrics_dir, file_name))
+        ],
+    })
+    for file_name in file_names:
+        try:
+            os.unlink(os.path.join(metrics_dir, file_name))
+        except FileNotFoundError:
+            continue
+
+
+def read_snapshots() -> List[Dict[str, Any]]:
+    """ The snapshots of every process, with the current one of this process, and the one of the exited processes """
+    registry.flush(force=True)
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+
+    with open(os.path.join(settings.METRICS_DIR, ".lock"), "w") as lock_file:
+        # one scrape at a time, so the files aren't merged while they're read
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            merge_exited_snapshots(settings.METRICS_DIR)
+        except OSError as exc:
+            print(f"The snapshots of the exited processes couldn't be merged: {exc}")
+
+        exited_snapshot = read_snapshot(os.path.join(settings.METRICS_DIR, EXITED_SNAPSHOT))
+        merged_file_names = exited_snapshot["merged"] if exited_snapshot else []
+        snapshots = [exited_snapshot] if exited_snapshot else []
+        for file_name in sorted(os.listdir(settings.METRICS_DIR)):
+            if not file_name.endswith(".json") or file_name == EXITED_SNAPSHOT or file_name in merged_file_names:
+                continue
+            snapshot = read_snapshot(os.path.join(settings.METRICS_DIR, file_name))
+            if snapshot is not None:
+                snapshots.append(snapshot)
+    return snapshots
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """ Add up the histograms and the response counts of the snapshots """
+    histograms, responses = {}, {}
+    for snapshot in snapshots:
+        for histogram in snapshot["histograms"]:
+            key = (histogram["route"], histogram["method"], histogram["name"])
+            if key not in histograms:
+                histograms[key] = {"buckets": list(histogram["buckets"]), "sum": histogram["sum"], "count": histogram["count"]}
+                continue
+            merged_histogram = histograms[key]
+            merged_histogram["buckets"] = [a + b for a, b in zip(merged_histogram["buckets"], histogram["buckets"])]
+            merged_histogram["sum"] += histogram["sum"]
+            merged_histogram["count"] += histogram["count"]
+
+        for response in snapshot["responses"]:
+            key = (response["route"], response["method"], response["status"])
+            responses[key] = responses.get(key, 0) + response["count"]
+    return {"histograms": histograms, "responses": responses}
+
+
+def format_labels(**labels: str) -> str:
+    """ The labels in the Prometheus format. Example: {route="soccerapp/matches",method="GET"} """
+    escaped_labels = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    ]
+    return "{" + ",".join(escaped_labels) + "}"
+
+
+def format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(merged: Dict[str, Any]) -> str:
+    """ The merged metrics in the Prometheus text format (version 0.0.4) """
+    lines = [
+        f"# HELP {METRIC_PREFIX}requests_total Number of the responses",
+        f"# TYPE {METRIC_PREFIX}requests_total counter",
+    ]
+    for (route, method, status), count in sorted(merged["responses"].items()):
+        lines.append(f"{METRIC_PREFIX}requests_total{format_labels(route=route, method=method, status=status)} {count}")
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        metric_name = METRIC_PREFIX + name
+        lines.extend([f"# HELP {metric_name} {help_text}", f"# TYPE {metric_name} histogram"])
+
+        for (route, method, histogram_name), histogram in sorted(merged["histograms"].items()):
+            if histogram_name != name:
+                continue
+            # the buckets of Prometheus are cumulative
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip([*buckets, "+Inf"], histogram["buckets"]):
+                cumulative_count += bucket_count
+                labels = format_labels(route=route, method=method, le=format_number(upper_bound))
+                lines.append(f"{metric_name}_bucket{labels} {cumulative_count}")
+            labels = format_labels(route=route, method=method)
+            lines.append(f"{metric_name}_sum{labels} {format_number(histogram['sum'])}")
+            lines.append(f"{metric_name}_count{labels} {histogram['count']}")
+    return "\n".join(lines) + "\n"
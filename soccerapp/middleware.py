@@ -0,0 +1,195 @@
+"""
+MIDDLEWARES OF THE APP
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .metrics import registry
+from .profiling import profiled
+from .tracing import span
+
+
+class QueryRecorder:
+    """ The execute wrapper of the connection, counting the queries of the request and their time """
+
+    def __init__(self) -> None:
+        self.num_queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start_time
+            self.num_queries += 1
+
+
+current_query_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar("current_query_recorder", default=None)
+""" The recorder of the current request, also seen by the threads of its async queries """
+
+
+def record_request_queries(execute, sql, params, many, context):
+    """ The execute wrapper of every connection, counting the query into the recorder of the current request """
+    query_recorder = current_query_recorder.get()
+    if query_recorder is None:
+        return execute(sql, params, many, context)
+    return query_recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    """
+    Receiver of ```connection_created```, adding the wrapper to the new connection. The connections are
+    per thread, so the async queries run on the connection of the thread of the ORM, not of the request
+    """
+    if record_request_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_request_queries)
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryRecorder]:
+    """ Count the queries of the block, on every connection """
+    query_recorder = QueryRecorder()
+    token = current_query_recorder.set(query_recorder)
+    try:
+        yield query_recorder
+    finally:
+        current_query_recorder.reset(token)
+
+
+class MetricsMiddleware:
+    """
+    Record the wall time, the database queries and the size of the response of each request
+    into the metrics of the route of its view (see soccerapp/metrics.py)
+    """
+    # the async requests aren't adapted through a thread under ASGI
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def get_route(self, request) -> str:
+        """ The URL pattern of the view, the requests that don't match any view are grouped together """
+        resolver_match = getattr(request, "resolver_match", None)
+        return resolver_match.route if resolver_match is not None else "unmatched"
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        start_time = time.perf_counter()
+        with record_queries() as query_recorder:
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start_time, query_recorder)
+        return response
+
+    async def __acall__(self, request):
+        start_time = time.perf_counter()
+        with record_queries() as query_recorder:
+            response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start_time, query_recorder)
+        return response
+
+    def observe(self, request, response, duration: float, query_recorder: QueryRecorder) -> None:
+        """ Record the values of the request into the metrics """
+        values = {
+            "request_duration_seconds": duration,
+            "db_queries": query_recorder.num_queries,
+            "db_duration_seconds": query_recorder.duration,
+        }
+        if not response.streaming:
+            values["response_bytes"] = len(response.content)
+
+        registry.observe(self.get_route(request), request.method, response.status_code, values)
+        registry.flush()
+
+
+class TracingMiddleware:
+    """ Open the root span of each request (see soccerapp/tracing.py), named after the route of its view """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with span(request.method, "SPAN_KIND_SERVER", path=request.path) as request_span:
+            response = self.get_response(request)
+            self.name_span(request_span, request, response)
+        return response
+
+    async def __acall__(self, request):
+        with span(request.method, "SPAN_KIND_SERVER", path=request.path) as request_span:
+            response = await self.get_response(request)
+            self.name_span(request_span, request, response)
+        return response
+
+    def name_span(self, request_span, request, response) -> None:
+        """ Name the span after the route of the view, with the status of the response """
+        resolver_match = getattr(request, "resolver_match", None)
+        route = resolver_match.route if resolver_match is not None else "unmatched"
+        request_span.name = f"{request.method} {route}"
+        request_span.set_attributes(route=route, status_code=response.status_code)
+
+
+SENSITIVE_PARAMS = {"token", "access", "refresh", "password", "cursor"}
+""" The query params left out of the profiles (the JWT of the event stream, the cursors of the pages) """
+
+
+class ProfilingMiddleware:
+    """
+    Profile the request (see soccerapp/profiling.py) when it's sampled, or when it has the header
+    ```X-Profile``` with the profiling token. The async requests are profiled on the thread of the event loop
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def get_tags(self, request) -> dict:
+        """ The tags of the profile of the request """
+        params = {name: value for name, value in request.GET.items() if name.lower() not in SENSITIVE_PARAMS}
+        return {"method": request.method, "path": request.path, "params": params}
+
+    def is_forced(self, request) -> bool:
+        """ Whether the request has the header ```X-Profile``` with the profiling token """
+        profiling_token = getattr(settings, "PROFILING_TOKEN", "")
+        return bool(profiling_token) and request.headers.get("X-Profile") == profiling_token
+
+    def tag_response(self, tags: dict, request, response) -> None:
+        """ Tag the profile with the route of the view and the status of the response """
+        resolver_match = getattr(request, "resolver_match", None)
+        tags["route"] = resolver_match.route if resolver_match is not None else "unmatched"
+        tags["status_code"] = response.status_code
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        tags = self.get_tags(request)
+        with profiled(f"{request.method} {request.path}", tags, force=self.is_forced(request)):
+            response = self.get_response(request)
+            self.tag_response(tags, request, response)
+        return response
+
+    async def __acall__(self, request):
+        tags = self.get_tags(request)
+        with profiled(f"{request.method} {request.path}", tags, force=self.is_forced(request)):
+            response = await self.get_response(request)
+            self.tag_response(tags, request, response)
+        return response
@@ -0,0 +1,105 @@
+import datetime
+from django.db import migrations, models
+
+# The user bet tables and the bet info tables they reference
+PARTITIONED_TABLES = [
+    ("soccerapp_usermoneylinebet", "soccerapp_moneylinebetinfo"),
+    ("soccerapp_userhandicapbet", "soccerapp_handicapbetinfo"),
+    ("soccerapp_usertotalobjectsbet", "soccerapp_totalobjectsbetinfo"),
+]
+
+COLUMNS = "id, bet_amount, created_date, payout, bet_info_id, user_id"
+
+
+def partition_user_bets(apps, schema_editor):
+    """
+    Convert the user bet tables into tables partitioned by range of created_date.
+    Every existing bet goes to the default partition, the weekly partitions are created
+    (and filled) by the command ```create_bet_partitions```
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for table, bet_info_table in PARTITIONED_TABLES:
+        sequence = f"{table}_partitioned_id_seq"
+        schema_editor.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        schema_editor.execute(f"CREATE SEQUENCE {sequence}")
+        # The partition key has to be a part of the primary key
+        schema_editor.execute(f"""
+            CREATE TABLE {table} (
+                id bigint NOT NULL DEFAULT nextval('{sequence}'),
+                bet_amount numeric(12, 2) NOT NULL,
+                created_date date NOT NULL,
+                payout numeric(12, 2) NULL,
+                bet_info_id bigint NOT NULL
+                    REFERENCES {bet_info_table} (id) DEFERRABLE INITIALLY DEFERRED,
+                user_id bigint NOT NULL
+                    REFERENCES soccerapp_user (id) DEFERRABLE INITIALLY DEFERRED,
+                PRIMARY KEY (id, created_date)
+            ) PARTITION BY RANGE (created_date)
+        """)
+        schema_editor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+        # Move the bets to the partitioned table
+        schema_editor.execute(
+            f"INSERT INTO {table} ({COLUMNS}) SELECT {COLUMNS} FROM {table}_unpartitioned")
+        schema_editor.execute(
+            f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+        schema_editor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+        schema_editor.execute(f"DROP TABLE {table}_unpartitioned")
+
+        schema_editor.execute(f"CREATE INDEX {table}_user_id_idx ON {table} (user_id)")
+        schema_editor.execute(f"CREATE INDEX {table}_bet_info_id_idx ON {table} (bet_info_id)")
+
+
+def unpartition_user_bets(apps, schema_editor):
+    """ Convert the partitioned user bet tables back into regular tables """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for table, bet_info_table in PARTITIONED_TABLES:
+        sequence = f"{table}_partitioned_id_seq"
+        schema_editor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+        schema_editor.execute(
+            f"CREATE TABLE {table}_unpartitioned (LIKE {table} INCLUDING DEFAULTS)")
+        schema_editor.execute(
+            f"INSERT INTO {table}_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM {table}")
+        schema_editor.execute(f"DROP TABLE {table}")
+        schema_editor.execute(f"ALTER TABLE {table}_unpartitioned RENAME TO {table}")
+
+        schema_editor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD FOREIGN KEY (bet_info_id) "
+            f"REFERENCES {bet_info_table} (id) DEFERRABLE INITIALLY DEFERRED")
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD FOREIGN KEY (user_id) "
+            f"REFERENCES soccerapp_user (id) DEFERRABLE INITIALLY DEFERRED")
+        schema_editor.execute(f"CREATE INDEX {table}_user_id_idx ON {table} (user_id)")
+        schema_editor.execute(f"CREATE INDEX {table}_bet_info_id_idx ON {table} (bet_info_id)")
+        schema_editor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soccerapp', '0019_alter_handicapbetinfo_settled_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userhandicapbet',
+            name='created_date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.AlterField(
+            model_name='usermoneylinebet',
+            name='created_date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.AlterField(
+            model_name='usertotalobjectsbet',
+            name='created_date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.RunPython(partition_user_bets, unpartition_user_bets),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soccerapp', '0020_partition_user_bets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'date', 'id'], name='match_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['league', 'status', 'date', 'id'], name='match_league_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userhandicapbet',
+            index=models.Index(fields=['user', 'created_date', 'id'], name='handicapbet_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermoneylinebet',
+            index=models.Index(fields=['user', 'created_date', 'id'], name='moneylinebet_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertotalobjectsbet',
+            index=models.Index(fields=['user', 'created_date', 'id'], name='totalbet_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-19 14:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soccerapp', '0021_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=150)),
+                ('league', models.CharField(blank=True, choices=[('Champions League', 'UCL'), ('Premiere League', 'EPL'), ('La Liga', 'LAL'), ('Bundesliga', 'BUN'), ('Serie A', 'SER'), ('League 1', 'LEA')], max_length=100, null=True)),
+                ('status', models.CharField(choices=[('Succeeded', 'OK'), ('Failed', 'KO')], max_length=20)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration', models.FloatField(default=0, verbose_name='The wall time of the run (in seconds)')),
+                ('stages', models.JSONField(default=dict)),
+                ('counters', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['task_name', 'started_at'], name='taskrun_task_started_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+from datetime import date
 
 LEAGUE_CHOICES= [
     ("Champions League", "UCL"), 
@@ -113,6 +114,11 @@ class Match(models.Model):
 
     class Meta: 
         ordering = ["date"]
+        # the keyset pagination of the list of matches (see soccerapp/pagination.py)
+        indexes = [
+            models.Index(fields=["status", "date", "id"], name="match_status_date_idx"), 
+            models.Index(fields=["league", "status", "date", "id"], name="match_league_status_date_idx"), 
+        ]
 
     def __str__(self) -> str:
         """ Example: Real Madrid vs Barcelona """
@@ -147,9 +153,14 @@ class UserMoneylineBet(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     bet_info = models.ForeignKey(MoneylineBetInfo, on_delete=models.CASCADE)
     bet_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
-    created_date = models.DateField(null=True, blank=True)
+    # The partition key of the user bet tables (partitioned by week)
+    created_date = models.DateField(default=date.today)
     payout = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
 
+    class Meta: 
+        # the keyset pagination of the bets of the user (see soccerapp/pagination.py)
+        indexes = [models.Index(fields=["user", "created_date", "id"], name="moneylinebet_user_date_idx")]
+
     def __str__(self) -> str: 
         """ example mikequan19 bet $50: Manchester United -200 """
         return f"{self.user.username} bet {self.bet_amount}, {self.bet_info}"
@@ -183,9 +194,14 @@ class UserHandicapBet(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     bet_info = models.ForeignKey(HandicapBetInfo, on_delete=models.CASCADE)
     bet_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
-    created_date = models.DateField(null=True, blank=True)
+    # The partition key of the user bet tables (partitioned by week)
+    created_date = models.DateField(default=date.today)
     payout = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
 
+    class Meta: 
+        # the keyset pagination of the bets of the user (see soccerapp/pagination.py)
+        indexes = [models.Index(fields=["user", "created_date", "id"], name="handicapbet_user_date_idx")]
+
     def __str__(self) -> str: 
         """ Example: mikequan19 bet $50: Manchester United -1.5 -200 """
         return f"{self.user.username} bet {self.bet_amount}, {self.bet_info}"
@@ -227,9 +243,40 @@ class UserTotalObjectsBet(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     bet_info = models.ForeignKey(TotalObjectsBetInfo, on_delete=models.CASCADE)
     bet_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
-    created_date = models.DateField(null=True, blank=True)
+    # The partition key of the user bet tables (partitioned by week)
+    created_date = models.DateField(default=date.today)
     payout = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
 
+    class Meta: 
+        # the keyset pagination of the bets of the user (see soccerapp/pagination.py)
+        indexes = [models.Index(fields=["user", "created_date", "id"], name="totalbet_user_date_idx")]
+
     def __str__(self) -> str: 
         """ Example: mikequan19 bet $50: Over 5 goals 200 """
         return f"{self.user.username} bet {self.bet_amount}, {self.bet_info}"
+
+
+class TaskRun(models.Model): 
+    """ 
+    A run of the Celery task, with the time of its stages and its counters (see soccerapp/telemetry.py).
+    Example of stages: {"upload_matches": 1.52, "upload_match_bets": 8.03}, counters: {"api_calls": 91, "rows_inserted": 340}
+    """
+
+    task_name = models.CharField(max_length=150)
+    # the league of the run, for the tasks run per league 
+    league = models.CharField(max_length=100, choices=LEAGUE_CHOICES, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=[("Succeeded", "OK"), ("Failed", "KO")])
+    started_at = models.DateTimeField(default=timezone.now)
+    duration = models.FloatField("The wall time of the run (in seconds)", default=0)
+    stages = models.JSONField(default=dict)
+    counters = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+
+    class Meta: 
+        ordering = ["-started_at"]
+        indexes = [models.Index(fields=["task_name", "started_at"], name="taskrun_task_started_idx")]
+
+    def __str__(self) -> str: 
+        """ Example: update_league_scores_and_settle (La Liga) Succeeded in 2.31s """
+        league = f" ({self.league})" if self.league else ""
+        return f"{self.task_name}{league} {self.status} in {self.duration:.2f}s"
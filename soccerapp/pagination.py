@@ -0,0 +1,177 @@
+"""
+KEYSET (CURSOR) PAGINATION OF THE LONG LISTS
+
+The page after the cursor is filtered with the values of the ordering fields of the last item of the previous page,
+instead of an offset, so the pages are stable under concurrent inserts and every page costs the same
+(an index range scan), however deep it is. The pagination is opt-in: the lists are only paginated when the request
+has the ```cursor``` or ```page_size``` params.
+"""
+
+import base64
+import json
+from typing import Any, List, Tuple, Union
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+from django.db.models import Q, QuerySet
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.validators import ValidationError
+
+
+def encode_cursor(position: List[Any]) -> str:
+    """ Encode the position (the values of the ordering fields) into the opaque cursor """
+    # the dates keep their microseconds, unlike with DjangoJSONEncoder
+    raw_cursor = json.dumps(position, default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
+
+
+INVALID_CURSOR_ERROR = {"error": "Invalid cursor", "detail": "The cursor isn't given by the previous page."}
+
+
+def decode_cursor(cursor: str, num_fields: int) -> List[Any]:
+    """ Decode the cursor into the position, the fields are compared to their ISO format for the dates """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        position = None
+    if not isinstance(position, list) or len(position) != num_fields:
+        raise ValidationError(INVALID_CURSOR_ERROR)
+    return position
+
+
+class KeysetPagination(BasePagination):
+    """
+    Base keyset pagination. The subclasses define the ```ordering```, whose fields must all go
+    in the same direction and end with a unique field, and be backed by an index.
+    The params are read from ```request.GET```, for the DRF requests and the requests of the async views
+    """
+    ordering: Tuple[str, ...] = ("id",)
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request) -> int:
+        """ The page size of the params, capped at the max page size """
+        try:
+            page_size = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({"error": "Invalid page size", "detail": "The page size must be an integer."})
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_keyset_filter(self, position: List[Any]) -> Q:
+        """
+        The filter of the items after the position, for the ordering (a, b): a > x OR (a = x AND b > y).
+        The redundant a >= x lets the database scan the index range of the first field
+        """
+        descending = self.ordering[0].startswith("-")
+        fields = [field.lstrip("-") for field in self.ordering]
+        after_lookup, start_lookup = ("lt", "lte") if descending else ("gt", "gte")
+
+        keyset_filter = Q()
+        for i, field in enumerate(fields):
+            equal_filter = Q(**{field: value for field, value in zip(fields[:i], position[:i])})
+            keyset_filter |= equal_filter & Q(**{f"{field}__{after_lookup}": position[i]})
+        return Q(**{f"{fields[0]}__{start_lookup}": position[0]}) & keyset_filter
+
+    def get_position(self, item: Any) -> List[Any]:
+        """ The values of the ordering fields of the item (model instance, named row or dictionary) """
+        fields = [field.lstrip("-") for field in self.ordering]
+        if isinstance(item, dict):
+            return [item[field] for field in fields]
+        return [getattr(item, field) for field in fields]
+
+    def filter_after_cursor(self, queryset: QuerySet, request) -> QuerySet:
+        """ Filter the items after the cursor of the params (if any), ordered by the keyset """
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.GET.get(self.cursor_query_param)
+        if not cursor:
+            return queryset
+
+        position = decode_cursor(cursor, len(self.ordering))
+        try:
+            return queryset.filter(self.get_keyset_filter(position))
+        except (DjangoValidationError, ValueError, TypeError):
+            raise ValidationError(INVALID_CURSOR_ERROR)
+
+    def get_page_of_items(self, items: List[Any], page_size: int) -> List[Any]:
+        """ The items of the page, and the cursor of the next page. The extra item tells if there's a next page """
+        page = items[:page_size]
+        self.next_cursor = encode_cursor(self.get_position(page[-1])) if len(items) > page_size else None
+        return page
+
+    def get_page(self, queryset: QuerySet, page_size: int) -> List[Any]:
+        return self.get_page_of_items(list(queryset[:page_size + 1]), page_size)
+
+    def is_paginated(self, request) -> bool:
+        query_params = request.GET
+        return self.cursor_query_param in query_params or self.page_size_query_param in query_params
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> Union[List[Any], None]:
+        if not self.is_paginated(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        return self.get_page(self.filter_after_cursor(queryset, request), page_size)
+
+    async def apaginate_queryset(self, queryset: QuerySet, request, view=None) -> Union[List[Any], None]:
+        """ Async version of ```paginate_queryset()``` for the async views """
+        if not self.is_paginated(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = self.filter_after_cursor(queryset, request)
+        items = [item async for item in queryset[:page_size + 1]]
+        return self.get_page_of_items(items, page_size)
+
+    def paginate_union(self, querysets: List[QuerySet], request, view=None) -> List[Any]:
+        """
+        Paginate the UNION ALL of the querysets (always paginated). The keyset filter goes into each of them,
+        and so does the limit when the database supports it, so each table only reads its rows of the page
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        parts = [self.filter_after_cursor(queryset, request) for queryset in querysets]
+        if connection.features.supports_slicing_ordering_in_compound:
+            parts = [part[:page_size + 1] for part in parts]
+        else:
+            parts = [part.order_by() for part in parts]
+        union = parts[0].union(*parts[1:], all=True).order_by(*self.ordering)
+        return self.get_page(union, page_size)
+
+    def get_next_link(self) -> Union[str, None]:
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class MatchPagination(KeysetPagination):
+    """ Pagination of the matches, from the earliest """
+    ordering = ("date", "id")
+
+
+class UserBetPagination(KeysetPagination):
+    """ Pagination of the bets of the user, from the latest """
+    ordering = ("-created_date", "-id")
+
+
+class BetHistoryPagination(KeysetPagination):
+    """ Pagination of the bets of every market of the user, whose ids are only unique with the bet type """
+    ordering = ("-created_date", "-id", "-bet_type")
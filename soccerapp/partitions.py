@@ -0,0 +1,165 @@
+"""
+WEEKLY PARTITIONS OF THE USER BET TABLES (POSTGRESQL ONLY)
+
+The user bet tables are partitioned by range of ```created_date```, one partition per week
+(Monday to Sunday), plus a default partition for the bets without a matching partition.
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+from django.db import connection, transaction
+from .archive import ArchiveWriter, archive_user_bets
+from .models import Match, UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet
+
+PARTITIONED_MODELS = [UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet]
+""" The models whose tables are partitioned by week """
+
+PARTITION_NAME_PATTERN = re.compile(r"_p(\d{8})$")
+
+
+def get_week_start(day: date) -> date:
+    """ The Monday of the week of the given day """
+    return day - timedelta(days=day.weekday())
+
+
+def get_partition_name(table: str, week_start: date) -> str:
+    """ Example: soccerapp_usermoneylinebet_p20251006 """
+    return f"{table}_p{week_start.strftime('%Y%m%d')}"
+
+
+def get_partitions(table: str) -> List[Tuple[str, date]]:
+    """ The list of the weekly partitions of the table, with the first day of their week """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [table],
+        )
+        partition_names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in partition_names:
+        # The default partition doesn't have a week
+        matched = PARTITION_NAME_PATTERN.search(name)
+        if matched:
+            week_start = datetime.strptime(matched[1], "%Y%m%d").date()
+            partitions.append((name, week_start))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(table: str, week_start: date) -> str:
+    """
+    Create the partition of the table for the week. The bets of that week that are
+    already in the default partition are moved to the new partition.
+    """
+    quote_name = connection.ops.quote_name
+    name = get_partition_name(table, week_start)
+    week_end = week_start + timedelta(days=7)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {quote_name(name)} "
+            f"(LIKE {quote_name(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS ("
+            f"DELETE FROM {quote_name(table + '_default')} "
+            f"WHERE created_date >= '{week_start.isoformat()}' AND created_date < '{week_end.isoformat()}' "
+            f"RETURNING *"
+            f") INSERT INTO {quote_name(name)} SELECT * FROM moved"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote_name(table)} ATTACH PARTITION {quote_name(name)} "
+            f"FOR VALUES FROM ('{week_start.isoformat()}') TO ('{week_end.isoformat()}')"
+        )
+    return name
+
+
+def create_bet_partitions(weeks_ahead: int=4) -> List[str]:
+    """
+    Create the missing weekly partitions of the user bet tables, from the oldest bet in the
+    default partition (or this week) up to the given number of weeks ahead.
+    Return the names of the created partitions
+    """
+    if connection.vendor != "postgresql":
+        return []
+
+    quote_name = connection.ops.quote_name
+    last_week_start = get_week_start(date.today()) + timedelta(weeks=weeks_ahead)
+    created_partitions = []
+
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        existing_weeks = {week_start for _, week_start in get_partitions(table)}
+
+        # The bets without their partition start from the oldest one
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN(created_date) FROM {quote_name(table + '_default')}")
+            oldest_date = cursor.fetchone()[0]
+
+        week_start = get_week_start(min(oldest_date or date.today(), date.today()))
+        while week_start <= last_week_start:
+            if week_start not in existing_weeks:
+                created_partitions.append(create_partition(table, week_start))
+            week_start += timedelta(weeks=1)
+
+    print(f"{len(created_partitions)} bet partitions created successfully!")
+    return created_partitions
+
+
+def drop_bet_partitions(before: date, match_filter_date: date) -> List[str]:
+    """
+    Detach and drop the weekly partitions whose week ends before the given date, and whose bets
+    all belong to the finished matches last updated before the match filter date (the purged ones).
+    Their bets are archived first, then each partition is dropped in its own short transaction,
+    as the detach locks the whole table. Return the names of the dropped partitions
+    """
+    if connection.vendor != "postgresql":
+        return []
+
+    quote_name = connection.ops.quote_name
+    dropped_partitions = []
+
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        bet_info_table = model._meta.get_field("bet_info").related_model._meta.db_table
+
+        for name, week_start in get_partitions(table):
+            week_end = week_start + timedelta(days=7)
+            if week_end > before:
+                continue
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Keep the partition if any of its bets belongs to a match that is still live
+                # (a match without its updated date is never past the filter date)
+                cursor.execute(
+                    f"SELECT EXISTS ("
+                    f"SELECT 1 FROM {quote_name(name)} bet "
+                    f"JOIN {quote_name(bet_info_table)} info ON info.id = bet.bet_info_id "
+                    f"JOIN {quote_name(Match._meta.db_table)} bet_match ON bet_match.id = info.match_id "
+                    f"WHERE NOT (bet_match.status = 'Finished' "
+                    f"AND COALESCE(bet_match.updated_date, 'infinity'::date) < %s)"
+                    f")",
+                    [match_filter_date],
+                )
+                if cursor.fetchone()[0]:
+                    continue
+
+                # the range of the week only reads the partition, and the archive is published on commit
+                with ArchiveWriter() as writer:
+                    archive_user_bets(
+                        writer, model.objects.filter(created_date__gte=week_start, created_date__lt=week_end))
+
+                # DETACH ... CONCURRENTLY isn't allowed with the default partition
+                cursor.execute(f"ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(name)}")
+                cursor.execute(f"DROP TABLE {quote_name(name)}")
+            dropped_partitions.append(name)
+
+    print(f"{len(dropped_partitions)} past bet partitions dropped successfully!")
+    return dropped_partitions
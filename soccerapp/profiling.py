@@ -0,0 +1,194 @@
+"""
+ON-DEMAND PROFILING OF THE SLOW REQUESTS AND TASKS
+
+A request or a task run is profiled when:
+- ```PROFILING_ENABLED```, for a random ```PROFILING_SAMPLE_RATE``` of the requests and the runs, and its profile
+is only kept when it takes more than ```PROFILING_THRESHOLD``` seconds
+- the request has the header ```X-Profile: <PROFILING_TOKEN>```, or the task is sent with the header ```profile```
+(e.g. ```update_league_scores_and_settle.apply_profiled(("La Liga",))```), and its profile is always kept
+
+The profiler samples the stack of the thread every ```PROFILING_INTERVAL``` seconds from another thread, so
+the profiled code runs at full speed, and writes the sampled stacks in the folded format of the flamegraphs
+(```<stack> <count>```, for flamegraph.pl or speedscope). With ```PROFILING_MODE=cprofile```, it runs cProfile
+instead, and writes the pstats file (for snakeviz). Each profile is written to ```PROFILING_DIR``` with the
+JSON of its name (the route or the task), its arguments and its duration, and only the last
+```PROFILING_MAX_FILES``` profiles are kept.
+"""
+
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+from celery import Task
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.text import slugify
+
+
+def format_frame(frame) -> str:
+    """ The function of the frame and its file. Example: settle_bet_list (soccerapp/settle.py:142) """
+    code = frame.f_code
+    file_path = "/".join(code.co_filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({file_path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """ Sample the stack of the thread from another thread, counting the sampled stacks """
+    extension = "folded"
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name="profiling-sampler", daemon=True)
+
+    def sample(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(format_frame(frame))
+                frame = frame.f_back
+            if stack:
+                # the folded stacks go from the root to the leaf
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self.sampler.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.sampler.join()
+
+    def get_num_samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as profile_file:
+            for stack, count in self.stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+
+
+class CProfileProfiler:
+    """ The deterministic profiler, when the sampling one isn't available """
+    extension = "prof"
+
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def get_num_samples(self) -> int:
+        return 0
+
+    def write(self, path: str) -> None:
+        self.profile.dump_stats(path)
+
+
+def get_profiler():
+    if getattr(settings, "PROFILING_MODE", "sampling") == "cprofile" or not hasattr(sys, "_current_frames"):
+        return CProfileProfiler()
+    return SamplingProfiler(getattr(settings, "PROFILING_INTERVAL", 0.005))
+
+
+def get_profiling_dir() -> str:
+    return getattr(settings, "PROFILING_DIR", "/tmp/soccerbet_profiles")
+
+
+def save_profile(profiler, name: str, tags: Dict[str, Any], duration: float) -> str:
+    """ Write the profile and its JSON to the profiling directory, then apply the retention. Return the path """
+    profiling_dir = get_profiling_dir()
+    os.makedirs(profiling_dir, exist_ok=True)
+    # the timestamp first, so the names sort by date
+    name_slug = slugify(name.replace("/", " "))[:80]
+    stem = f"{timezone.now():%Y%m%dT%H%M%S%f}-{name_slug}"
+    profile_path = os.path.join(profiling_dir, f"{stem}.{profiler.extension}")
+    profiler.write(profile_path)
+
+    with open(os.path.join(profiling_dir, f"{stem}.json"), "w") as info_file:
+        json.dump({
+            "name": name, "tags": tags, "duration": round(duration, 4),
+            "profile": os.path.basename(profile_path), "samples": profiler.get_num_samples(),
+        }, info_file, cls=DjangoJSONEncoder, default=str)
+
+    apply_retention(profiling_dir, getattr(settings, "PROFILING_MAX_FILES", 100))
+    print(f"Profile of {name} ({duration:.2f}s) written to {profile_path}")
+    return profile_path
+
+
+def apply_retention(profiling_dir: str, max_profiles: int) -> None:
+    """ Delete the oldest profiles (and their JSON) beyond the max number of profiles """
+    stems = sorted({file_name.split(".")[0] for file_name in os.listdir(profiling_dir)})
+    for stem in stems[:max(len(stems) - max_profiles, 0)]:
+        for extension in ["json", SamplingProfiler.extension, CProfileProfiler.extension]:
+            try:
+                os.remove(os.path.join(profiling_dir, f"{stem}.{extension}"))
+            except FileNotFoundError:
+                pass
+
+
+def should_sample() -> bool:
+    """ If the request (or task run) is picked by the sample rate """
+    return getattr(settings, "PROFILING_ENABLED", False) and random.random() < getattr(settings, "PROFILING_SAMPLE_RATE", 0.01)
+
+
+@contextmanager
+def profiled(name: str, tags: Dict[str, Any], force: bool=False) -> Iterator[Dict[str, Any]]:
+    """
+    Profile the block when it's forced or sampled. The tags can be completed inside the block,
+    and the profile is written if it's forced, or if the block took more than the threshold
+    """
+    if not force and not should_sample():
+        yield tags
+        return
+
+    profiler = get_profiler()
+    try:
+        profiler.start()
+    except ValueError:
+        # cProfile profiles one thread at a time
+        yield tags
+        return
+    start_time = time.perf_counter()
+    try:
+        yield tags
+    finally:
+        duration = time.perf_counter() - start_time
+        profiler.stop()
+        if force or duration >= getattr(settings, "PROFILING_THRESHOLD", 1.0):
+            try:
+                save_profile(profiler, name, tags, duration)
+            except OSError as exc:
+                # the profiling never fails the request or the task
+                print(f"The profile of {name} couldn't be written: {exc}")
+
+
+class ProfiledTask(Task):
+    """
+    Base of the tasks that can be profiled, when they're sent with the header ```profile```
+    (the arguments are checked against the signature of the task when it's sent, so it can't be one of them)
+    """
+
+    def apply_profiled(self, args=None, kwargs=None, **options):
+        """ Send the task to be profiled. Example: ```update_league_scores_and_settle.apply_profiled(("La Liga",))``` """
+        return self.apply_async(args, kwargs, headers={**options.pop("headers", {}), "profile": True}, **options)
+
+    def is_profiled(self) -> bool:
+        """ If the run has the header ```profile```, in the headers of the request or merged into it by the worker """
+        return bool((self.request.headers or {}).get("profile") or getattr(self.request, "profile", False))
+
+    def __call__(self, *args, **kwargs):
+        with profiled(self.name, {"args": args, "kwargs": kwargs}, force=self.is_profiled()):
+            return super().__call__(*args, **kwargs)
@@ -0,0 +1,217 @@
+"""
+LOG OF THE SLOW QUERIES
+
+When ```SLOW_QUERY_LOG_ENABLED```, every database connection (of the servers and the Celery workers) gets the execute
+wrapper ```SlowQueryLogger```, which logs the queries slower than ```SLOW_QUERY_THRESHOLD``` seconds to the rotating
+JSON lines file of the process next to ```SLOW_QUERY_FILE``` (e.g. slow_queries.4242.jsonl), with:
+- the fingerprint of the query: the hash of its SQL without the values, so the same ORM query of every match
+has the same fingerprint (the values aren't logged)
+- its call site: the frames of the app that ran it, the innermost first
+- for a sample (```SLOW_QUERY_EXPLAIN_RATE```) of them on PostgreSQL, the plan of the query,
+from ```EXPLAIN (ANALYZE off, FORMAT JSON)``` so the query isn't run again
+
+```python manage.py slow_queries``` lists the fingerprints that took the most time.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+import traceback
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, List, Optional
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from .tracing import get_process_path
+
+NORMALIZE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"), # the strings
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"), # the numbers
+    (re.compile(r"%s"), "?"), # the parameters
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\(\?(?:, \?)*\)"), "(...)"), # the lists of values, e.g. IN (...)
+    (re.compile(r"\(\.\.\.\)(?:, \(\.\.\.\))+"), "(...)"), # the rows of the bulk inserts
+]
+
+MAX_STACK_FRAMES = 10
+
+
+def normalize_query(sql: str) -> str:
+    """ The SQL without its values. Example: SELECT ... WHERE "id" IN (...) AND "status" = ? """
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_fingerprint(normalized_sql: str) -> str:
+    return hashlib.md5(normalized_sql.encode()).hexdigest()[:16]
+
+
+# the files of the execute wrappers (the slow query logger, and the query recorder of the requests)
+WRAPPER_FILES = {__file__, os.path.join(os.path.dirname(__file__), "middleware.py")}
+
+
+def get_call_site() -> List[str]:
+    """ The frames of the app calling the query (not of Django or of the other packages), the innermost first """
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        if (
+            not frame.filename.startswith(base_dir) or frame.filename in WRAPPER_FILES
+            or f"{os.sep}site-packages{os.sep}" in frame.filename
+        ):
+            continue
+        frames.append(f"{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} in {frame.name}")
+        if len(frames) == MAX_STACK_FRAMES:
+            break
+    return frames
+
+
+@lru_cache(maxsize=None)
+def get_query_logger() -> logging.Logger:
+    """ The logger writing the slow queries to the rotating file of the process """
+    os.makedirs(os.path.dirname(settings.SLOW_QUERY_FILE) or ".", exist_ok=True)
+    handler = RotatingFileHandler(
+        get_process_path(settings.SLOW_QUERY_FILE),
+        maxBytes=getattr(settings, "SLOW_QUERY_MAX_BYTES", 10 * 1024 * 1024),
+        backupCount=getattr(settings, "SLOW_QUERY_BACKUP_COUNT", 5),
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    query_logger = logging.getLogger("soccerapp.querylog.slow_queries")
+    for previous_handler in query_logger.handlers:
+        previous_handler.close()
+    query_logger.handlers = [handler]
+    query_logger.setLevel(logging.INFO)
+    query_logger.propagate = False
+    return query_logger
+
+
+# the workers forked from the process have their own file
+os.register_at_fork(after_in_child=get_query_logger.cache_clear)
+
+
+class SlowQueryLogger:
+    """ The execute wrapper of the connection, logging its slow queries """
+
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # the queries of the EXPLAIN itself
+        if self.explaining:
+            return execute(sql, params, many, context)
+
+        start_time = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start_time
+
+        if duration >= getattr(settings, "SLOW_QUERY_THRESHOLD", 0.1):
+            try:
+                self.log(sql, params, many, duration)
+            except Exception as exc:
+                # the log never fails the query
+                print(f"The slow query couldn't be logged: {exc}", file=sys.stderr)
+        return result
+
+    def log(self, sql: str, params, many: bool, duration: float) -> None:
+        normalized_sql = normalize_query(sql)
+        plan = None
+        if not many and random.random() < getattr(settings, "SLOW_QUERY_EXPLAIN_RATE", 0.1):
+            plan = self.explain(sql, params)
+
+        get_query_logger().info(json.dumps({
+            "time": timezone.now().isoformat(),
+            "fingerprint": get_fingerprint(normalized_sql),
+            "query": normalized_sql,
+            "duration": round(duration, 6),
+            "many": many,
+            "stack": get_call_site(),
+            "plan": plan,
+        }))
+
+    def explain(self, sql: str, params) -> Optional[Any]:
+        """ The JSON plan of the query, in a savepoint so a failed EXPLAIN doesn't break the transaction """
+        statement = sql.lstrip()[:6].upper()
+        if self.connection.vendor != "postgresql" or statement not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            return None
+
+        self.explaining = True
+        savepoint_id = self.connection.savepoint() if self.connection.in_atomic_block else None
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE off, FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+        except DatabaseError:
+            if savepoint_id:
+                self.connection.savepoint_rollback(savepoint_id)
+            return None
+        else:
+            if savepoint_id:
+                self.connection.savepoint_commit(savepoint_id)
+            return json.loads(plan) if isinstance(plan, str) else plan
+        finally:
+            self.explaining = False
+
+
+def install_slow_query_logger(sender, connection, **kwargs) -> None:
+    """ Receiver of ```connection_created```, adding the wrapper to the new connection """
+    if getattr(settings, "SLOW_QUERY_LOG_ENABLED", False):
+        connection.execute_wrappers.append(SlowQueryLogger(connection))
+
+
+def read_slow_queries(file_path: Optional[str]=None) -> Iterator[Dict[str, Any]]:
+    """ The logged slow queries of every process (and of the file), from their rotated files to the current one """
+    file_path = file_path or settings.SLOW_QUERY_FILE
+    backup_count = getattr(settings, "SLOW_QUERY_BACKUP_COUNT", 5)
+    # the current and rotated files of each process (e.g. slow_queries.4242.jsonl.1), by pid
+    root, extension = os.path.splitext(file_path)
+    process_file_pattern = re.compile(rf"{re.escape(os.path.basename(root))}\.(\d+){re.escape(extension)}(\.\d+)?")
+    log_dir = os.path.dirname(file_path) or "."
+    file_names = os.listdir(log_dir) if os.path.isdir(log_dir) else []
+    pids = {int(matched[1]) for matched in map(process_file_pattern.fullmatch, file_names) if matched}
+    process_paths = [f"{root}.{pid}{extension}" for pid in sorted(pids)]
+    paths = [
+        path for current_path in [*process_paths, file_path]
+        for path in [f"{current_path}.{i}" for i in range(backup_count, 0, -1)] + [current_path]
+    ]
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path) as query_file:
+            for line in query_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # the line being written
+                    continue
+
+
+def summarize_slow_queries(slow_queries: Iterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """ The slow queries grouped by fingerprint, with their time, call sites and last plan, by total time """
+    fingerprints = {}
+    for slow_query in slow_queries:
+        summary = fingerprints.get(slow_query["fingerprint"])
+        if summary is None:
+            summary = fingerprints[slow_query["fingerprint"]] = {
+                "fingerprint": slow_query["fingerprint"], "query": slow_query["query"],
+                "count": 0, "total": 0.0, "max": 0.0, "call_sites": {}, "plan": None,
+            }
+        summary["count"] += 1
+        summary["total"] += slow_query["duration"]
+        summary["max"] = max(summary["max"], slow_query["duration"])
+        call_site = slow_query["stack"][0] if slow_query["stack"] else "unknown"
+        summary["call_sites"][call_site] = summary["call_sites"].get(call_site, 0) + 1
+        if slow_query["plan"] is not None:
+            summary["plan"] = slow_query["plan"]
+
+    for summary in fingerprints.values():
+        summary["mean"] = summary["total"] / summary["count"]
+    return sorted(fingerprints.values(), key=lambda summary: summary["total"], reverse=True)
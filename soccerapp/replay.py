@@ -0,0 +1,75 @@
+"""
+RECORDED RESPONSES OF API-FOOTBALL
+
+The transports of ```API_FOOTBALL_TRANSPORT``` for the benchmarks of the pipeline (bench_pipeline):
+- ```RecordingTransport```: call another transport (the real API or the fake one) and keep its responses,
+to be saved as a JSON file
+- ```ReplayTransport```: answer from the saved responses, after the simulated latency of the API
+
+The responses are looked up by the path and the parameters of the endpoint, without its dates
+(```from```, ```to```, ```date```), so a recording is replayed on any day
+"""
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from django.utils import timezone
+
+DATE_PARAMS = {"from", "to", "date"}
+""" The parameters of the endpoints that change with the day of the call """
+
+
+def get_recording_key(endpoint: str) -> str:
+    """ The key of the endpoint in the recording: its path and sorted parameters, without the dates """
+    url = urlsplit(endpoint)
+    params = sorted((name, value) for name, value in parse_qsl(url.query) if name not in DATE_PARAMS)
+    return f"{url.path}?{urlencode(params)}" if params else url.path
+
+
+class RecordingTransport:
+    """ The transport calling the given one, and recording the JSON bodies of its responses """
+
+    def __init__(self, transport: Callable[[str], Dict[str, Any]], source: str) -> None:
+        self.transport = transport
+        self.source = source
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self.num_calls = 0
+
+    def __call__(self, endpoint: str) -> Dict[str, Any]:
+        self.num_calls += 1
+        body = self.transport(endpoint)
+        self.responses[get_recording_key(endpoint)] = body
+        return body
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as recording_file:
+            json.dump({
+                "source": self.source,
+                "recorded": timezone.now().isoformat(),
+                "responses": self.responses,
+            }, recording_file)
+
+
+class ReplayTransport:
+    """ The transport answering from the recording of the file, each call after the latency (in seconds) """
+
+    def __init__(self, path: str, latency: float=0) -> None:
+        with open(path) as recording_file:
+            recording = json.load(recording_file)
+        self.source = recording["source"]
+        self.recorded = recording["recorded"]
+        self.responses: Dict[str, Dict[str, Any]] = recording["responses"]
+        self.latency = latency
+        self.num_calls = 0
+
+    def __call__(self, endpoint: str) -> Dict[str, Any]:
+        self.num_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return self.responses[get_recording_key(endpoint)]
+        except KeyError:
+            raise ValueError(f"The endpoint {endpoint} isn't recorded.") from None
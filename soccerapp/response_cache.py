@@ -0,0 +1,235 @@
+"""
+RESPONSE CACHE OF THE PUBLIC READ ENDPOINTS
+
+The successful responses are cached in a process-local LRU in front of the Django cache, keyed by
+the path, the query params, and the data versions of the scopes (league, match, standings, teams)
+the response depends on. The tasks bump the data versions when they change the data, so a cached
+response never outlives the data it was built from.
+
+The same data versions give the strong ETag and the Last-Modified of the responses, so the conditional
+requests of the clients polling the endpoints get a 304 without touching the database.
+
+The async read views (see soccerapp/views/async_views.py) share the cached responses with the sync views,
+through the async versions of the functions (prefixed with a).
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, Iterable, List
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import slugify
+from rest_framework.response import Response
+
+DATA_VERSION_PREFIX = "data-version:"
+RESPONSE_PREFIX = "response:"
+
+ALL_LEAGUES_SCOPE = "league:*"
+""" The scope of the data of every league """
+
+TEAMS_SCOPE = "teams"
+""" The scope of the data about the teams """
+
+
+def league_scope(league: str) -> str:
+    """ The scope of the matches of the league. Example: league:la-liga """
+    return f"league:{slugify(league)}"
+
+
+def match_scope(match_id: int) -> str:
+    """ The scope of the match and its bet info. Example: match:1208021 """
+    return f"match:{match_id}"
+
+
+def standings_scope(league: str) -> str:
+    """ The scope of the standings of the league. Example: standings:la-liga """
+    return f"standings:{slugify(league)}"
+
+
+class LocalLRUCache:
+    """ The least-recently-used cache of the responses of this process """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key: str, value) -> None:
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            # Evict the least recently used response
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LocalLRUCache(getattr(settings, "RESPONSE_CACHE_LOCAL_SIZE", 512))
+""" The local cache in front of the Django cache """
+
+
+def get_data_versions(scopes: Iterable[str]) -> Dict[str, int]:
+    """ The current data version of each scope, the scope without version gets a new one """
+
+    keys = [DATA_VERSION_PREFIX + scope for scope in scopes]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            # Another process may have just added the version of this scope
+            new_version = time.time_ns()
+            if not cache.add(key, new_version, timeout=None):
+                new_version = cache.get(key, new_version)
+            versions[key] = new_version
+    return {key[len(DATA_VERSION_PREFIX):]: versions[key] for key in keys}
+
+
+async def aget_data_versions(scopes: Iterable[str]) -> Dict[str, int]:
+    """ Async version of ```get_data_versions()``` """
+
+    keys = [DATA_VERSION_PREFIX + scope for scope in scopes]
+    versions = await cache.aget_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            new_version = time.time_ns()
+            if not await cache.aadd(key, new_version, timeout=None):
+                new_version = await cache.aget(key, new_version)
+            versions[key] = new_version
+    return {key[len(DATA_VERSION_PREFIX):]: versions[key] for key in keys}
+
+
+def bump_data_version(*scopes: str) -> None:
+    """
+    Give the scopes a new data version, which invalidates their cached responses.
+    Inside a transaction, the versions are bumped once the transaction commits
+    """
+    def bump() -> None:
+        new_version = time.time_ns()
+        cache.set_many({DATA_VERSION_PREFIX + scope: new_version for scope in scopes}, timeout=None)
+
+    if scopes:
+        transaction.on_commit(bump)
+
+
+def bump_league_data_version(league: str, match_ids: Iterable[int]=()) -> None:
+    """ Bump the data version of the matches of the league, and of the given matches """
+    bump_data_version(
+        ALL_LEAGUES_SCOPE, league_scope(league), *[match_scope(match_id) for match_id in match_ids])
+
+
+def get_response_key(request, versions: Dict[str, int]) -> str:
+    """ The key of the cached response of the request with the given data versions """
+
+    # the query params of the DRF request, or of the request of the async views
+    query_params = sorted(request.GET.lists())
+    raw_key = f"{request.path}|{query_params}|{sorted(versions.items())}"
+    return RESPONSE_PREFIX + hashlib.sha1(raw_key.encode()).hexdigest()
+
+
+def get_etag(request, response_key: str) -> str:
+    """ The strong ETag of the response, which differs for each rendered format (JSON, browsable API) """
+    # the async views only render JSON
+    raw_etag = f"{response_key}|{getattr(request, 'accepted_media_type', 'application/json')}"
+    return '"' + hashlib.sha1(raw_etag.encode()).hexdigest() + '"'
+
+
+def get_last_modified(versions: Dict[str, int]) -> int:
+    """ The timestamp (in seconds) of the latest data change of the scopes """
+    return max(versions.values()) // 10**9
+
+
+def set_cache_headers(response, etag: str, last_modified: int) -> None:
+    """ Set the validators and the caching policy (for the clients and the CDN) of the response """
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(
+        response, public=True,
+        max_age=getattr(settings, "RESPONSE_MAX_AGE", 60),
+        s_maxage=getattr(settings, "RESPONSE_SHARED_MAX_AGE", 60),
+    )
+    patch_vary_headers(response, ["Accept"])
+
+
+def get_cached_data(key: str):
+    """ The data of the cached response, from the local cache, then the Django cache """
+    data = local_cache.get(key)
+    if data is None:
+        data = cache.get(key)
+        if data is not None:
+            local_cache.set(key, data)
+    return data
+
+
+async def aget_cached_data(key: str):
+    """ Async version of ```get_cached_data()``` """
+    data = local_cache.get(key)
+    if data is None:
+        data = await cache.aget(key)
+        if data is not None:
+            local_cache.set(key, data)
+    return data
+
+
+def set_cached_data(key: str, data) -> None:
+    """ Cache the data of the response in both caches """
+    local_cache.set(key, data)
+    cache.set(key, data, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 3600))
+
+
+async def aset_cached_data(key: str, data) -> None:
+    """ Async version of ```set_cached_data()``` """
+    local_cache.set(key, data)
+    await cache.aset(key, data, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 3600))
+
+
+def cache_response(get_scopes: Callable[..., List[str]]):
+    """
+    Decorator of the GET method of the view, caching its successful responses and answering
+    the conditional requests (If-None-Match, If-Modified-Since).
+    ```get_scopes(request, **kwargs)``` returns the scopes the response depends on
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            versions = get_data_versions(get_scopes(request, **kwargs))
+            key = get_response_key(request, versions)
+            etag = get_etag(request, key)
+            last_modified = get_last_modified(versions)
+
+            # The client already has this version of the data
+            not_modified_response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified_response is not None:
+                set_cache_headers(not_modified_response, etag, last_modified)
+                return not_modified_response
+
+            data = get_cached_data(key)
+            if data is not None:
+                response = Response(data)
+                set_cache_headers(response, etag, last_modified)
+                return response
+
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                set_cached_data(key, response.data)
+                set_cache_headers(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -2,6 +2,15 @@ from .main_serializers import *
 from .bet_serializers import (
     UserMoneylineBetSerializer, 
     UserHandicapBetSerializer, 
-    UserTotalObjectsBetSerializer
+    UserTotalObjectsBetSerializer,
+    BetSlipSerializer,
+)
+from .read_serializers import (
+    MatchReadSerializer,
+    MoneylineBetInfoReadSerializer,
+    HandicapBetInfoReadSerializer,
+    TotalObjectsBetInfoReadSerializer,
+    TeamRankingReadSerializer,
+    BetHistoryReadSerializer,
 )
 from .validator import CustomValidator
\ No newline at end of file
@@ -15,6 +15,20 @@ from . import (
 )
 from .validator import CustomValidator
 
+
+class BetOwnerField(serializers.PrimaryKeyRelatedField): 
+    """ 
+    The user of the bet. When it's the user of the request, it is taken from the request 
+    instead of being queried again for every bet of the list 
+    """
+
+    def to_internal_value(self, data): 
+        request = self.context.get("request")
+        if request is not None and request.user.is_authenticated and str(request.user.pk) == str(data): 
+            return request.user
+        return super().to_internal_value(data)
+
+
 moneyline_validator = CustomValidator(MoneylineBetInfo, UserMoneylineBet)
 """ Custom validator for moneyline bet  """
 
@@ -41,6 +55,8 @@ class MoneylineBetListSerializer(serializers.ListSerializer):
 class UserMoneylineBetSerializer(serializers.ModelSerializer):
     """ Serializer of the user moneyline bets """
 
+    serializer_related_field = BetOwnerField
+
     class Meta: 
         """ The list serializer to cutomize the creation of multiple objects """
         list_serializer_class = MoneylineBetListSerializer 
@@ -91,6 +107,8 @@ class HandicapBetListSerializer(serializers.ListSerializer):
 
 class UserHandicapBetSerializer(serializers.ModelSerializer): 
     """ Serializer of the handicap bet """
+    serializer_related_field = BetOwnerField
+
     class Meta: 
         list_serializer_class = HandicapBetListSerializer
         model = UserHandicapBet
@@ -136,6 +154,8 @@ class TotalObjectsBetListSerializer(serializers.ListSerializer):
 
 class UserTotalObjectsBetSerializer(serializers.ModelSerializer): 
     """ Serializer of the total goals bet """
+    serializer_related_field = BetOwnerField
+
     class Meta: 
         list_serializer_class = TotalObjectsBetListSerializer
         model = UserTotalObjectsBet
@@ -156,3 +176,57 @@ class UserTotalObjectsBetSerializer(serializers.ModelSerializer):
         bet_representation["username"] = instance.user.username
         return bet_representation
 
+
+
+class BetSlipSerializer(serializers.Serializer): 
+    """ 
+    Serializer of the bet slip, which places the bets of every market type together. 
+    Each market takes the same list of bets as its own endpoint
+    """
+
+    MARKETS = {
+        "moneyline": (UserMoneylineBet, moneyline_validator), 
+        "handicap": (UserHandicapBet, handicap_validator), 
+        "total_objects": (UserTotalObjectsBet, total_objs_validator), 
+    }
+    """ Mapping the market type to its user bet model and validator """
+
+    moneyline = UserMoneylineBetSerializer(many=True, required=False)
+    handicap = UserHandicapBetSerializer(many=True, required=False)
+    total_objects = UserTotalObjectsBetSerializer(many=True, required=False)
+
+    def validate(self, attrs): 
+        """ Validate if the bet slip has any bet, and only the bets of the known markets """
+
+        unknown_markets = set(self.initial_data) - set(self.MARKETS)
+        if unknown_markets: 
+            raise serializers.ValidationError({
+                "error": "The bet slip has unknown markets.", 
+                "detail": f"Unknown markets: {', '.join(sorted(unknown_markets))}",
+            })
+        if not any(attrs.get(market) for market in self.MARKETS): 
+            raise serializers.ValidationError({"error": "The bet slip doesn't have any bet."})
+        return attrs
+
+    def create(self, validated_data): 
+        """ 
+        Create the bets of every market of the bet slip. 
+        Return the dictionary of the new bets of each market and the total bet amount 
+        """
+        saved_bet_lists, total_bet_amount = {}, 0
+
+        # validate the bets of each market, then the balance for the whole slip once 
+        for market, (_, validator) in self.MARKETS.items(): 
+            saved_bet_lists[market], market_bet_amount = validator.validate_create(
+                validated_data.get(market, []), check_balance=False
+            )
+            total_bet_amount += market_bet_amount
+        moneyline_validator.validate_balance(self.context["request"].user, total_bet_amount)
+
+        # save the bets of every market together, maintain the integrity of the data 
+        with transaction.atomic(): 
+            new_bet_lists = {
+                market: user_bet_class.objects.bulk_create(saved_bet_lists[market]) 
+                for market, (user_bet_class, _) in self.MARKETS.items()
+            }
+        return new_bet_lists, total_bet_amount
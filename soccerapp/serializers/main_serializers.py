@@ -93,7 +93,28 @@ class MatchSerializer(serializers.ModelSerializer):
         return representation
 
 
-class MoneylineBetInfoSerializer(serializers.ModelSerializer): 
+class RelatedIdField(serializers.PrimaryKeyRelatedField): 
+    """ The related object (the match of the bet info) by its id, which isn't queried: the bet info is matched with it """
+
+    def to_internal_value(self, data): 
+        return serializers.IntegerField().run_validation(data)
+
+
+class BetInfoSerializer(serializers.ModelSerializer): 
+    """ Base serializer of the bet infos, which the bets can reference by id """
+
+    # the id is writable so that the bets can reference their bet info by id
+    id = serializers.IntegerField(required=False)
+    serializer_related_field = RelatedIdField
+
+    def to_internal_value(self, data):
+        """ The bet info referenced by its id doesn't need its other fields validated (and queried) """
+        if isinstance(data, dict) and data.get("id") is not None: 
+            return {"id": serializers.IntegerField().run_validation(data["id"])}
+        return super().to_internal_value(data)
+
+
+class MoneylineBetInfoSerializer(BetInfoSerializer): 
     """ Serializer of the moneyline bet info """
 
     class Meta: 
@@ -108,7 +129,7 @@ class MoneylineBetInfoSerializer(serializers.ModelSerializer):
         return representation
 
 
-class HandicapBetInfoSerizalizer(serializers.ModelSerializer): 
+class HandicapBetInfoSerizalizer(BetInfoSerializer): 
     """ Serializer of the handicap bet info  """
     class Meta: 
         model = HandicapBetInfo
@@ -122,7 +143,7 @@ class HandicapBetInfoSerizalizer(serializers.ModelSerializer):
         return representation
 
 
-class TotalObjectsBetInfoSerializer(serializers.ModelSerializer):
+class TotalObjectsBetInfoSerializer(BetInfoSerializer):
     """ Serializer of the total goals bet info """ 
     class Meta: 
         model = TotalObjectsBetInfo
@@ -0,0 +1,226 @@
+"""
+READ-ONLY SERIALIZERS OF THE PUBLIC LISTS
+
+They build the representation straight from the ```.values_list()``` rows instead of the model instances
+and the fields of DRF, with the same output (keys, order and formats) as the model serializers:
+- MatchReadSerializer: MatchSerializer
+- MoneylineBetInfoReadSerializer: MoneylineBetInfoSerializer
+- HandicapBetInfoReadSerializer: HandicapBetInfoSerizalizer
+- TotalObjectsBetInfoReadSerializer: TotalObjectsBetInfoSerializer
+- TeamRankingReadSerializer: TeamRankingSerializer
+
+and of the bet history of the user, which doesn't have its model serializer:
+- BetHistoryReadSerializer: the rows of the bet history (see soccerapp/bet_history.py)
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Tuple, Union
+from django.db.models import QuerySet
+from soccerapp.bet_history import BET_HISTORY_FIELDS
+
+
+def format_decimal(value: Union[Decimal, None], decimal_places: int) -> Union[str, None]:
+    """ Format the decimal like the DecimalField of DRF. Example: 120.00 """
+    if value is None:
+        return None
+    return '{:f}'.format(value.quantize(Decimal(1).scaleb(-decimal_places)))
+
+
+def format_date(value: Union[date, None]) -> Union[str, None]:
+    """ Format the date like the DateField of DRF. Example: 2025-01-01 """
+    return None if value is None else value.isoformat()
+
+
+class ReadSerializer:
+    """
+    Base read-only serializer of the queryset, querying only the ```fields```, or of its rows
+    already queried with ```get_rows()``` (e.g. a page of them). The subclasses build the representation of each row
+    """
+    fields: List[str] = []
+
+    def __init__(self, rows: Union[QuerySet, Iterable[Tuple]]) -> None:
+        self.rows = rows
+
+    @classmethod
+    def get_rows(cls, queryset: QuerySet) -> QuerySet:
+        """ The queryset of the rows of the fields, which are named tuples """
+        return queryset.values_list(*cls.fields, named=True)
+
+    def to_representation(self, row: Tuple) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @property
+    def data(self) -> List[Dict[str, Any]]:
+        rows = self.rows.values_list(*self.fields) if isinstance(self.rows, QuerySet) else self.rows
+        return [self.to_representation(row) for row in rows]
+
+    async def adata(self) -> List[Dict[str, Any]]:
+        """ Async version of ```data``` for the async views, fetching the rows in the thread of the database """
+        if not isinstance(self.rows, QuerySet):
+            return self.data
+        # not aiterator(), which executes the query of values_list() in the event loop on Django 5.1
+        return [self.to_representation(row) async for row in self.rows.values_list(*self.fields)]
+
+
+class MatchReadSerializer(ReadSerializer):
+    """ Read-only serializer of the list of matches """
+    fields = [
+        "id", "league", "match_id", "date", "home_team", "home_team_logo", "away_team", "away_team_logo",
+        "status", "updated_date", "halftime_score", "fulltime_score", "penalty",
+        "possesion", "total_shots", "corners", "cards",
+    ]
+
+    def to_representation(self, row: Tuple) -> Dict[str, Any]:
+        (
+            id, league, match_id, match_date, home_team, home_team_logo, away_team, away_team_logo,
+            status, updated_date, halftime_score, fulltime_score, penalty,
+            possesion, total_shots, corners, cards,
+        ) = row
+
+        representation = {
+            "id": id,
+            "league": league,
+            "match_id": match_id,
+            "date": match_date.strftime("%m/%d/%Y, %a %H:%M%p"),
+            "home_team": home_team,
+            "home_team_logo": home_team_logo,
+            "away_team": away_team,
+            "away_team_logo": away_team_logo,
+            "status": status,
+        }
+        # The results of the matches that are not finished are blank
+        if status == "Not Finished":
+            representation.update({
+                "updated_date": "None-None", "halftime_score": "None-None", "fulltime_score": "None-None",
+                "penalty": "None-None", "possesion": "None-None", "total_shots": "None-None",
+                "corners": "None-None", "cards": "None-None",
+            })
+        else:
+            representation.update({
+                "updated_date": format_date(updated_date), "halftime_score": halftime_score,
+                "fulltime_score": fulltime_score, "penalty": penalty, "possesion": possesion,
+                "total_shots": total_shots, "corners": corners, "cards": cards,
+            })
+        return representation
+
+
+class BetInfoReadSerializer(ReadSerializer):
+    """
+    Base read-only serializer of the list of bet infos, with the info about their match.
+    The subclasses list the ```info_fields``` between bet_object and status, and their decimal places
+    """
+    info_fields: List[str] = []
+    decimal_places: Dict[str, int] = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.fields = [
+            "id", "time_type", "bet_object", *cls.info_fields, "status", "settled_date",
+            "match_id", "match__home_team", "match__away_team", "match__league", "match__date",
+        ]
+
+    def __init__(self, rows: Union[QuerySet, Iterable[Tuple]]) -> None:
+        super().__init__(rows)
+        # The bet infos of a list usually belong to the same matches
+        self.match_times = {}
+
+    def get_match_time(self, match_date: datetime) -> str:
+        if match_date not in self.match_times:
+            self.match_times[match_date] = match_date.strftime("%m/%d, %H:%M")
+        return self.match_times[match_date]
+
+    def to_representation(self, row: Tuple) -> Dict[str, Any]:
+        num_info_fields = len(self.info_fields)
+        id, time_type, bet_object = row[:3]
+        info_values = row[3:3 + num_info_fields]
+        status, settled_date, match, home_team, away_team, league, match_date = row[3 + num_info_fields:]
+
+        representation = {"id": id, "time_type": time_type, "bet_object": bet_object}
+        for field, value in zip(self.info_fields, info_values):
+            if field in self.decimal_places:
+                value = format_decimal(value, self.decimal_places[field])
+            representation[field] = value
+        representation.update({
+            "status": status,
+            "settled_date": format_date(settled_date),
+            "match": match,
+            "match_name": f"{home_team} vs {away_team}",
+            "match_league": league,
+            "match_time": self.get_match_time(match_date),
+        })
+        return representation
+
+
+class MoneylineBetInfoReadSerializer(BetInfoReadSerializer):
+    """ Read-only serializer of the list of moneyline bet infos """
+    info_fields = ["bet_team", "odd"]
+    decimal_places = {"odd": 2}
+
+
+class HandicapBetInfoReadSerializer(BetInfoReadSerializer):
+    """ Read-only serializer of the list of handicap bet infos """
+    info_fields = ["bet_team", "handicap_cover", "odd"]
+    decimal_places = {"handicap_cover": 2, "odd": 2}
+
+
+class TotalObjectsBetInfoReadSerializer(BetInfoReadSerializer):
+    """ Read-only serializer of the list of total objects bet infos """
+    info_fields = ["under_or_over", "target_num_objects", "odd"]
+    decimal_places = {"target_num_objects": 2, "odd": 2}
+
+
+class TeamRankingReadSerializer(ReadSerializer):
+    """ Read-only serializer of the standings """
+    fields = [
+        "id", "rank", "points", "num_watches", "num_wins", "num_loses", "num_draws",
+        "team__name", "team__logo",
+    ]
+
+    def to_representation(self, row: Tuple) -> Dict[str, Any]:
+        id, rank, points, num_watches, num_wins, num_loses, num_draws, team, logo = row
+        return {
+            "id": id, "rank": rank, "points": points, "num_watches": num_watches, "num_wins": num_wins,
+            "num_loses": num_loses, "num_draws": num_draws, "team": team, "logo": logo,
+        }
+
+
+class BetHistoryReadSerializer(ReadSerializer):
+    """
+    Read-only serializer of the rows (dictionaries) of the bet history of the user,
+    formatted like the user bet serializers and their bet info
+    """
+    fields = BET_HISTORY_FIELDS
+
+    def __init__(self, rows: Union[QuerySet, Iterable[Dict[str, Any]]]) -> None:
+        super().__init__(rows)
+        self.match_times = {}
+
+    def get_match_time(self, match_date: datetime) -> str:
+        if match_date not in self.match_times:
+            self.match_times[match_date] = match_date.strftime("%m/%d, %H:%M")
+        return self.match_times[match_date]
+
+    @property
+    def data(self) -> List[Dict[str, Any]]:
+        rows = self.rows.values(*self.fields) if isinstance(self.rows, QuerySet) else self.rows
+        return [self.to_representation(row) for row in rows]
+
+    def to_representation(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "bet_type": row["bet_type"],
+            "created_date": format_date(row["created_date"]),
+            "bet_amount": format_decimal(row["bet_amount"], 2),
+            "payout": format_decimal(row["payout"], 2),
+            "status": row["status"],
+            "time_type": row["time_type"],
+            "bet_object": row["bet_object"],
+            "selection": row["selection"],
+            "line": format_decimal(row["line"], 2),
+            "odd": format_decimal(row["odd"], 2),
+            "match_id": row["match_id"],
+            "match_name": row["match_name"],
+            "match_league": row["league"],
+            "match_time": self.get_match_time(row["match_date"]),
+        }
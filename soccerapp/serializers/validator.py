@@ -1,10 +1,12 @@
 """ SERIALIZER VALIDATOR """
 
+import operator
+from functools import reduce
 from rest_framework.serializers import ValidationError as DRFValidationError
 from django.utils import timezone
 from datetime import date
-from typing import Type, Tuple
-from django.db.models import Model
+from typing import Type, Tuple, List
+from django.db.models import Model, Q
 from decimal import Decimal
 
 class CustomValidator: 
@@ -17,19 +19,79 @@ class CustomValidator:
         self.user_bet_class = user_bet_class
 
 
-    def validate_create(self, create_data) -> Tuple:
+    def get_bet_info_list(self, bet_info_data_list: List[dict]) -> List[Model]: 
+        """ 
+        Get the bet info (with its match) of each bet. The bet infos referenced by id are 
+        fetched together in one query, the ones without id are matched on all of their fields in another one
+        """
+        bet_info_ids = [data["id"] for data in bet_info_data_list if data.get("id") is not None]
+        bet_info_dict = self.bet_info_class.objects.select_related("match").in_bulk(bet_info_ids)
+
+        field_lookups = [data for data in bet_info_data_list if data.get("id") is None]
+        matched_bet_infos = []
+        if field_lookups: 
+            matched_bet_infos = list(self.bet_info_class.objects.select_related("match").filter(
+                reduce(operator.or_, (Q(**data) for data in field_lookups))
+            ))
+
+        bet_info_list = []
+        for i, bet_info_data in enumerate(bet_info_data_list): 
+            if bet_info_data.get("id") is not None: 
+                bet_info = bet_info_dict.get(bet_info_data["id"])
+            else: 
+                # exactly one bet info has to match the fields
+                candidates = [
+                    bet_info for bet_info in matched_bet_infos if self.has_fields(bet_info, bet_info_data)
+                ]
+                bet_info = candidates[0] if len(candidates) == 1 else None
+            if bet_info is None: 
+                raise DRFValidationError({"error": f"The bet info of bet {i + 1} not defined."})
+            bet_info_list.append(bet_info)
+        return bet_info_list
+
+
+    def has_fields(self, bet_info: Model, bet_info_data: dict) -> bool: 
+        """ If the bet info has the values of the fields (the related ones by their id) """
+        for name, value in bet_info_data.items(): 
+            if isinstance(value, Model): 
+                value = value.pk
+            if getattr(bet_info, self.bet_info_class._meta.get_field(name).attname) != value: 
+                return False
+        return True
+
+
+    def validate_balance(self, bet_owner, total_bet_amount) -> None: 
+        """ Validate if the user's balance is sufficient for the total bet amount (fees included) """
+
+        if bet_owner.balance < total_bet_amount: 
+            raise DRFValidationError({
+                "error": "Sufficient balance to place these bets", 
+                "detail": f"Balance: ${bet_owner.balance}, total amount: ${total_bet_amount}"
+            })
+
+
+    def validate_create(self, create_data, check_balance: bool=True) -> Tuple:
         """ 
         Validate the data to be created for ```create()```, and return the list of bets 
-        to be added and total bet amount
+        to be added and total bet amount. 
+        The number of queries doesn't depend on the number of bets in the list.
+        ```check_balance=False``` leaves the balance to be validated with the other markets of the bet slip
         """
         total_bet_amount = 0 # total amount the user bet from the list, 
         saved_bet_list = [] # list of bets to be saved to the database
+        if len(create_data) == 0: 
+            return saved_bet_list, total_bet_amount
 
-        for i, item_data in enumerate(create_data): 
-            # get the bet info based on the classes
-            bet_info_data = item_data.pop("bet_info")
-            bet_info_object = self.bet_info_class.objects.get(**bet_info_data)
+        # get the bet info of all of the bets based on the classes
+        bet_info_list = self.get_bet_info_list([item_data.pop("bet_info") for item_data in create_data])
 
+        # the bet infos of the list that have been placed by the user in the past 
+        bet_owner = create_data[0]["user"]
+        placed_bet_info_ids = set(self.user_bet_class.objects.filter(
+            user=bet_owner, bet_info__in=bet_info_list
+        ).values_list("bet_info_id", flat=True))
+
+        for i, (item_data, bet_info_object) in enumerate(zip(create_data, bet_info_list)): 
             # validate if the bet info has been settled 
             if bet_info_object.status == "Settled": 
                 raise DRFValidationError({
@@ -43,13 +105,12 @@ class CustomValidator:
                     "detail": f"Match begins at {bet_info_object.match.date}"
                 })
             
-            # validate if the bet with same bet info has been added by the user in the past 
-            if self.user_bet_class.objects.filter(
-                user=item_data["user"], bet_info=bet_info_object
-            ).exists(): 
+            # validate if the bet with same bet info has been added by the user in the past (or in this list)
+            if bet_info_object.pk in placed_bet_info_ids: 
                 raise DRFValidationError({
                     "error": f"Bet {i + 1} in the list has already been placed",
                 })
+            placed_bet_info_ids.add(bet_info_object.pk)
                     
             # increment the total and add the instance to the list 
             total_bet_amount += item_data["bet_amount"]
@@ -59,11 +120,8 @@ class CustomValidator:
     
         total_bet_amount *= Decimal(1.05) # extra fees for placing the bets 
         # validate if the user's balance is sufficient 
-        if item_data["user"].balance < total_bet_amount: 
-            raise DRFValidationError({
-                "error": "Sufficient balance to place these bets", 
-                "detail": f"Balance: ${item_data["user"].balance}, total amount: ${total_bet_amount}"
-            })
+        if check_balance: 
+            self.validate_balance(bet_owner, total_bet_amount)
         
         # return the bet list, and total bet amount of the list 
         return saved_bet_list, total_bet_amount
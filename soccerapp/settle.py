@@ -5,10 +5,16 @@ LOGIC TO SETTLE THE BETS
 from .models import (
     User, TotalObjectsBetInfo, HandicapBetInfo, UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet
 )
+from .events import publish_event, user_channel
+from .telemetry import increment
+from .tracing import traced, set_attributes
 from decimal import Decimal
 from typing import Tuple
 from collections import defaultdict
 
+EVENT_BETS_SIZE = 50
+""" The max number of settled bets of an event of the user """
+
 
 def get_results(bet_info, handicap_cover=None) -> tuple:
     """ 
@@ -138,12 +144,14 @@ def get_total_objects_payout(bet_info: TotalObjectsBetInfo, bet_amount, target_n
     return total_payout
 
 
+@traced
 def settle_bet_list(bet_type: str, bet_list) -> Tuple[int, int]: 
     """ The main function: settle the queryset of bets of any type """
     
     bet_list = bet_list.select_related("user", "bet_info", "bet_info__match")
     updated_bet_list = []
     updated_user_dict = defaultdict(Decimal)
+    settled_bet_dict = defaultdict(list) # the settled bets of each user, for their events
 
     for i, bet in enumerate(bet_list.iterator()):  
         updated_bet_list.append(bet) # Add the bet to the list of updated bets 
@@ -164,6 +172,9 @@ def settle_bet_list(bet_type: str, bet_list) -> Tuple[int, int]:
         # Update the payout of the bets and balance of the user 
         updated_bet_list[i].payout = total_payout
         updated_user_dict[bet.user.id] += total_payout
+        settled_bet_dict[bet.user.id].append({
+            "id": bet.id, "match_id": bet_info.match.match_id, "payout": "{:.2f}".format(total_payout)
+        })
 
     updated_user_list = User.objects.filter(id__in=list(updated_user_dict.keys()))
     for user in updated_user_list: 
@@ -193,4 +204,16 @@ def settle_bet_list(bet_type: str, bet_list) -> Tuple[int, int]:
     
     # Update the balance of the list of users
     num_update_users = User.objects.bulk_update(updated_user_list, ["balance"], batch_size=250) 
+    increment("bets_settled", num_updated_bets)
+    increment("balance_updates", num_update_users)
+    set_attributes(bet_type=bet_type, bets_settled=num_updated_bets, balance_updates=num_update_users)
+
+    # Notify each user of their settled bets, a few bets per event (the events of NOTIFY are small)
+    for user in updated_user_list: 
+        settled_bets = settled_bet_dict[user.id]
+        for start in range(0, len(settled_bets), EVENT_BETS_SIZE): 
+            publish_event([user_channel(user.id)], "bets_settled", {
+                "bet_type": bet_type, "bets": settled_bets[start:start + EVENT_BETS_SIZE], 
+                "balance": "{:.2f}".format(user.balance)
+            })
     return num_updated_bets, num_update_users
@@ -5,6 +5,12 @@ from .uploaders import (
     upload_team_rankings, upload_matches, upload_match_bets, 
     update_match_scores, settle_bets, delete_empty_bet_infos
 )
+from .archive import archive_matches
+from .partitions import PARTITIONED_MODELS, create_bet_partitions, drop_bet_partitions
+from .response_cache import bump_league_data_version
+from .tokens import prune_expired_tokens
+from .telemetry import record_task_run, stage, increment
+from .profiling import ProfiledTask
 from datetime import date, timedelta
 
 LEAGUES = {
@@ -16,8 +22,7 @@ LEAGUES = {
     "League 1": 61,
 }
 
-@shared_task(bind=True, max_retries=1, default_retry_delay=60)
-@transaction.atomic
+@shared_task(bind=True, base=ProfiledTask, max_retries=1, default_retry_delay=60)
 def update_teams_rankings(self) -> None: 
     """ 
     CALLED EVERY 1 hour.
@@ -25,19 +30,23 @@ def update_teams_rankings(self) -> None:
     """
 
     try: 
-        upload_team_rankings()
+        # the run is recorded outside of the transaction, so the failed runs are recorded too 
+        with record_task_run("update_teams_rankings"), transaction.atomic(): 
+            upload_team_rankings()
     except Exception as exc: 
         raise self.retry(exc=exc)  # re-execute the task if something's wrong
     
 
-@shared_task(bind=True, max_retries=2, default_retry_delay=60)
-@transaction.atomic
+@shared_task(bind=True, base=ProfiledTask, max_retries=2, default_retry_delay=60)
 def upload_league_matches_and_bets(self, league_name: str) -> None: 
     """ Retry 2 times in case of failure, each between 1 minute """
 
     try: 
-        league_match_list = list(upload_matches(league_name, LEAGUES[league_name]))
-        upload_match_bets(league_match_list)
+        with record_task_run("upload_league_matches_and_bets", league_name), transaction.atomic(): 
+            with stage("upload_matches"): 
+                league_match_list = list(upload_matches(league_name, LEAGUES[league_name]))
+            with stage("upload_match_bets"): 
+                upload_match_bets(league_match_list)
     except Exception as exc: 
         raise self.retry(exc=exc)
     
@@ -53,15 +62,18 @@ def upload_matches_and_bets() -> None:
         upload_league_matches_and_bets.apply_async((league,), countdown=i*10)
 
 
-@shared_task(bind=True, max_retries=2, default_retry_delay=60)
-@transaction.atomic
+@shared_task(bind=True, base=ProfiledTask, max_retries=2, default_retry_delay=60)
 def update_league_scores_and_settle(self, league_name) -> None:
     """ Retry 2 times in case of failure, each between 1 minute """
 
     try: 
-        updated_match_list = update_match_scores(league_name, LEAGUES[league_name])
-        delete_empty_bet_infos(updated_match_list)
-        settle_bets(updated_match_list)
+        with record_task_run("update_league_scores_and_settle", league_name), transaction.atomic(): 
+            with stage("update_scores"): 
+                updated_match_list = update_match_scores(league_name, LEAGUES[league_name])
+            with stage("delete_empty_bet_infos"): 
+                delete_empty_bet_infos(updated_match_list)
+            with stage("settle_bets"): 
+                settle_bets(updated_match_list)
         print(f"{league_name}'s matches and bets settled successfully!")
     except Exception as exc: 
         raise self.retry(exc=exc)
@@ -80,26 +92,87 @@ def update_scores_and_settle() -> None:
     leagues.apply_async()
 
 
-@shared_task(bind=True, max_retries=2, default_retry_delay=60)
-@transaction.atomic
+@shared_task(bind=True, base=ProfiledTask, max_retries=2, default_retry_delay=60)
 def delete_past_betinfos_and_matches(self) -> None: 
     """
     CALLED EVERY DAY AT 0 hours
-    Delete the queryset of the bet infos and finished matches that have been their past 
+    Archive, then delete the queryset of the bet infos and finished matches that have been their past 
     days limit.
     retry 2 times in case of failure, each between 1 minute 
     """
 
     try:
-        # bet info's past day limit is 14 days or 2 weeks 
-        filter_date = date.today() - timedelta(days=14)
-        # delete the list of finished matches 
-        Match.objects.filter(
-            status="Finished", 
-            updated_date__lt=filter_date
-        ).delete()
+        with record_task_run("delete_past_betinfos_and_matches"): 
+            # bet info's past day limit is 14 days or 2 weeks 
+            filter_date = date.today() - timedelta(days=14)
+
+            # first archive and drop the weekly partitions of the user bets placed a week before the filter date, 
+            # as long as all of their bets belong to the purged matches, so the purge doesn't delete them row by row 
+            # (each one in its short transaction, so the bet tables aren't locked until the purge commits) 
+            with stage("drop_bet_partitions"): 
+                dropped_partitions = drop_bet_partitions(filter_date - timedelta(days=7), filter_date)
+            increment("partitions_dropped", len(dropped_partitions))
+
+            with transaction.atomic(): 
+                past_matches = Match.objects.filter(
+                    status="Finished", 
+                    updated_date__lt=filter_date
+                )
+                # archive the matches and their remaining bets before they are gone 
+                with stage("archive_matches"): 
+                    archived_counts = archive_matches(past_matches)
+                increment("rows_archived", sum(archived_counts.values()))
+
+                # invalidate the cached responses of the matches before they are gone 
+                league_match_ids = {}
+                for league, match_id in past_matches.values_list("league", "match_id"): 
+                    league_match_ids.setdefault(league, []).append(match_id)
+                for league, match_ids in league_match_ids.items(): 
+                    bump_league_data_version(league, match_ids)
+
+                # delete the remaining bets of the matches, placed before the filter date so only the older 
+                # partitions (and the default one) are read, then the list of finished matches 
+                with stage("delete_matches"): 
+                    num_deleted_rows = 0
+                    for user_bet_class in PARTITIONED_MODELS: 
+                        num_deleted_bets, _ = user_bet_class.objects.filter(
+                            bet_info__match__in=past_matches, 
+                            created_date__lt=filter_date
+                        ).delete()
+                        num_deleted_rows += num_deleted_bets
+                    num_deleted_matches, _ = past_matches.delete()
+                    num_deleted_rows += num_deleted_matches
+                increment("rows_deleted", num_deleted_rows)
         print("Past matches and associated bet infos deleted successfully!")
     except Exception as exc: 
         self.retry(exc=exc)
 
+
+@shared_task(bind=True, base=ProfiledTask, max_retries=2, default_retry_delay=60)
+@transaction.atomic
+def create_future_bet_partitions(self) -> None: 
+    """
+    CALLED EVERY MONDAY AT 0 hours
+    Create the weekly partitions of the user bet tables for the next 4 weeks 
+    """
+
+    try: 
+        create_bet_partitions(weeks_ahead=4)
+    except Exception as exc: 
+        raise self.retry(exc=exc)
+
+
+@shared_task(bind=True, base=ProfiledTask, max_retries=2, default_retry_delay=60)
+def prune_expired_jwt_tokens(self) -> None: 
+    """
+    CALLED EVERY DAY AT 3 hours
+    Delete the expired refresh tokens (and their blacklist rows) in batches, so the token tables stay bounded 
+    """
+
+    try: 
+        num_deleted_tokens = prune_expired_tokens(batch_size=1000)
+        print(f"{num_deleted_tokens} expired tokens deleted successfully!")
+    except Exception as exc: 
+        raise self.retry(exc=exc)
+
 if __name__ == "__main__": None
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+TELEMETRY OF THE CELERY TASKS
+
+The tasks record each of their runs with ```record_task_run()```, around their transaction so the failed runs
+are recorded too. During the run, the time of the stages (```stage()```) and the counters (```increment()```)
+are collected in the run of the current context, whichever function they are called from:
+- api_calls, api_seconds: the calls to API-Football and their time
+- rows_inserted, rows_updated, rows_deleted, rows_archived: the rows written by the uploaders and the purge
+- bets_settled, balance_updates: the settled bets and the updated balances of the users
+
+Outside of a run (e.g. in the shell), the stages and the counters are ignored.
+The run and its stages are also the spans of its trace (see soccerapp/tracing.py).
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Union
+from django.utils import timezone
+from .models import TaskRun
+from .tracing import span
+
+
+class TaskTelemetry:
+    """ The time of the stages (in seconds) and the counters of the run """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, Union[int, float]] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + time.perf_counter() - start_time
+
+    def increment(self, name: str, value: Union[int, float]=1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_counters(self) -> Dict[str, Union[int, float]]:
+        """ The counters, with the rates derived from them """
+        counters = {
+            name: round(value, 4) if isinstance(value, float) else value for name, value in self.counters.items()
+        }
+        if self.stages.get("settle_bets"):
+            counters["bets_settled_per_second"] = round(counters.get("bets_settled", 0) / self.stages["settle_bets"], 1)
+        return counters
+
+
+current_run: ContextVar[Optional[TaskTelemetry]] = ContextVar("current_task_run", default=None)
+""" The telemetry of the run of the current context """
+
+
+@contextmanager
+def record_task_run(task_name: str, league: Optional[str]=None) -> Iterator[TaskTelemetry]:
+    """ Record the run of the task (its stages, counters, and error if any) into the ```TaskRun``` table """
+
+    telemetry = TaskTelemetry()
+    token = current_run.set(telemetry)
+    started_at, start_time = timezone.now(), time.perf_counter()
+    status, error = "Succeeded", ""
+    try:
+        with span(task_name) as task_span:
+            if league:
+                task_span.set_attributes(league=league)
+            yield telemetry
+    except Exception as exc:
+        status, error = "Failed", f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        current_run.reset(token)
+        try:
+            task_run = TaskRun.objects.create(
+                task_name=task_name, league=league, status=status, started_at=started_at,
+                duration=round(time.perf_counter() - start_time, 4),
+                stages={name: round(duration, 4) for name, duration in telemetry.stages.items()},
+                counters=telemetry.get_counters(), error=error,
+            )
+            print(f"{task_run}: {task_run.counters}")
+        except Exception as exc:
+            # the telemetry never hides the error of the task
+            print(f"The run of {task_name} couldn't be recorded: {exc}")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """ Time the stage of the current run """
+    telemetry = current_run.get()
+    with span(name):
+        if telemetry is None:
+            yield
+            return
+        with telemetry.stage(name):
+            yield
+
+
+def increment(name: str, value: Union[int, float]=1) -> None:
+    """ Increment the counter of the current run """
+    telemetry = current_run.get()
+    if telemetry is not None:
+        telemetry.increment(name, value)
+
+
+def get_task_run_summary(since: datetime) -> Dict[str, Any]:
+    """
+    The summary of the runs since the date, by task and league: the number of runs and failures,
+    the average and max duration, the average time of each stage, the totals of the counters, and the last run
+    """
+    groups = {}
+    # the latest runs first
+    for task_run in TaskRun.objects.filter(started_at__gte=since).iterator():
+        key = f"{task_run.task_name} ({task_run.league})" if task_run.league else task_run.task_name
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "task_name": task_run.task_name, "league": task_run.league,
+                "runs": 0, "failures": 0, "total_duration": 0.0, "max_duration": 0.0,
+                "stages": {}, "counters": {},
+                "last_run": {
+                    "started_at": task_run.started_at, "status": task_run.status, "duration": task_run.duration,
+                    "stages": task_run.stages, "counters": task_run.counters, "error": task_run.error,
+                },
+            }
+
+        group["runs"] += 1
+        group["failures"] += task_run.status == "Failed"
+        group["total_duration"] += task_run.duration
+        group["max_duration"] = max(group["max_duration"], task_run.duration)
+        for name, duration in task_run.stages.items():
+            group["stages"][name] = group["stages"].get(name, 0) + duration
+        for name, value in task_run.counters.items():
+            # the rates aren't added up
+            if not name.endswith("_per_second"):
+                group["counters"][name] = group["counters"].get(name, 0) + value
+
+    for group in groups.values():
+        group["avg_duration"] = round(group.pop("total_duration") / group["runs"], 4)
+        group["avg_stages"] = {name: round(total / group["runs"], 4) for name, total in group.pop("stages").items()}
+    return groups
@@ -0,0 +1,1783 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+import asyncio
+import json
+import os
+import pstats
+import random
+import subprocess
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.db.models import Count, F
+from django.db import connection, transaction
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncRequestFactory, LiveServerTestCase, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from soccerapp.models import (
+    User, Team, TeamRanking, Match,
+    MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo,
+    UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet, TaskRun,
+)
+from soccerapp.partitions import (
+    get_week_start, get_partition_name, get_partitions,
+    create_bet_partitions, drop_bet_partitions,
+)
+from soccerapp.response_cache import local_cache, bump_league_data_version
+from soccerapp.archive import ArchiveWriter, archive_matches, archive_rows, read_archive
+from soccerapp.uploaders import (
+    upload_team_rankings, upload_matches, upload_match_bets, generic_update_match_scores,
+    update_match_scores, delete_empty_bet_infos, settle_bets,
+)
+from soccerapp.factories import TEAMS_PER_LEAGUE, seed_dataset
+from soccerapp.generator import delete_generated_season, generate_season, get_activity_counts
+from soccerapp.benchmarks import compare_results, load_baseline, measure, save_baseline
+from soccerapp.replay import ReplayTransport, get_recording_key
+from soccerapp.loadtest import BettingScenarios, LoadUser, compare_summaries
+from soccerapp.urls import urlpatterns
+from soccerapp.settle import settle_bet_list
+from soccerapp.events import InMemoryBackend, PostgresBackend, broker, publish_event
+from soccerapp.views import EventStream
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from soccerapp.tokens import blacklist_filter, prune_expired_tokens
+from soccerapp.metrics import registry
+from soccerapp.middleware import MetricsMiddleware, ProfilingMiddleware, TracingMiddleware
+from soccerapp.tasks import LEAGUES, delete_past_betinfos_and_matches, update_league_scores_and_settle
+from soccerapp.tracing import NOOP_SPAN, get_process_path, get_span_logger, span
+from soccerapp.profiling import profiled
+from soccerapp.querylog import SlowQueryLogger, get_query_logger, normalize_query, read_slow_queries
+from soccerapp.pagination import MatchPagination
+from soccerapp.renderers import ORJSONRenderer
+from soccerapp.views import async_views
+from soccerapp.serializers import (
+    MatchSerializer, TeamRankingSerializer,
+    MoneylineBetInfoSerializer, HandicapBetInfoSerizalizer, TotalObjectsBetInfoSerializer,
+    MatchReadSerializer, TeamRankingReadSerializer,
+    MoneylineBetInfoReadSerializer, HandicapBetInfoReadSerializer, TotalObjectsBetInfoReadSerializer,
+)
+from rest_framework.renderers import JSONRenderer
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+""" The tests don't share the cache of the running server """
+
+
+@skipUnless(connection.vendor == "postgresql", "The user bet tables are only partitioned on PostgreSQL")
+class BetPartitionTests(TestCase):
+    """ Tests of the weekly partitions of the user bet tables """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("partition_user", "partition@gmail.com", "password")
+        cls.match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2025, 1, 1, 12),
+            home_team="Real Madrid", away_team="Barcelona",
+        )
+        cls.bet_info = MoneylineBetInfo.objects.create(
+            match=cls.match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+
+    def get_bet_partition(self, bet: UserMoneylineBet) -> str:
+        """ The name of the partition the bet is stored in """
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT tableoid::regclass::text FROM {UserMoneylineBet._meta.db_table} WHERE id = %s", [bet.id])
+            return cursor.fetchone()[0]
+
+    def test_create_partitions_ahead(self):
+        create_bet_partitions(weeks_ahead=2)
+        week_starts = [week_start for _, week_start in get_partitions(UserMoneylineBet._meta.db_table)]
+
+        this_week = get_week_start(date.today())
+        for weeks in range(3):
+            self.assertIn(this_week + timedelta(weeks=weeks), week_starts)
+
+        # Creating them again doesn't create anything
+        self.assertEqual(create_bet_partitions(weeks_ahead=2), [])
+
+    def test_create_partitions_moves_default_bets(self):
+        created_date = date.today() - timedelta(days=30)
+        bet = UserMoneylineBet.objects.create(
+            user=self.user, bet_info=self.bet_info, bet_amount=100, created_date=created_date)
+        self.assertEqual(self.get_bet_partition(bet), f"{UserMoneylineBet._meta.db_table}_default")
+
+        create_bet_partitions(weeks_ahead=0)
+        self.assertEqual(
+            self.get_bet_partition(bet),
+            get_partition_name(UserMoneylineBet._meta.db_table, get_week_start(created_date))
+        )
+
+    def test_drop_partitions_of_purged_matches(self):
+        created_date = date.today() - timedelta(days=60)
+        bet = UserMoneylineBet.objects.create(
+            user=self.user, bet_info=self.bet_info, bet_amount=100, created_date=created_date)
+        create_bet_partitions(weeks_ahead=0)
+        filter_date = date.today() - timedelta(days=14)
+
+        # The match isn't finished, so its bets are kept
+        drop_bet_partitions(filter_date - timedelta(days=7), filter_date)
+        self.assertTrue(UserMoneylineBet.objects.filter(pk=bet.pk).exists())
+
+        Match.objects.filter(pk=self.match.pk).update(
+            status="Finished", updated_date=date.today() - timedelta(days=50))
+        dropped_partitions = drop_bet_partitions(filter_date - timedelta(days=7), filter_date)
+
+        self.assertIn(
+            get_partition_name(UserMoneylineBet._meta.db_table, get_week_start(created_date)),
+            dropped_partitions
+        )
+        self.assertFalse(UserMoneylineBet.objects.filter(pk=bet.pk).exists())
+
+    def test_partitions_kept_for_matches_without_updated_date(self):
+        created_date = date.today() - timedelta(days=60)
+        bet = UserMoneylineBet.objects.create(
+            user=self.user, bet_info=self.bet_info, bet_amount=100, created_date=created_date)
+        create_bet_partitions(weeks_ahead=0)
+        Match.objects.filter(pk=self.match.pk).update(status="Finished", updated_date=None)
+
+        filter_date = date.today() - timedelta(days=14)
+        self.assertEqual(drop_bet_partitions(filter_date - timedelta(days=7), filter_date), [])
+        self.assertTrue(UserMoneylineBet.objects.filter(pk=bet.pk).exists())
+
+    def test_purge_drops_partitions_instead_of_deleting_bets(self):
+        table = UserMoneylineBet._meta.db_table
+        created_date = date.today() - timedelta(days=60)
+        bet = UserMoneylineBet.objects.create(
+            user=self.user, bet_info=self.bet_info, bet_amount=100, created_date=created_date)
+        create_bet_partitions(weeks_ahead=0)
+        Match.objects.filter(pk=self.match.pk).update(
+            status="Finished", updated_date=date.today() - timedelta(days=50))
+
+        # the purge fails if it deletes any bet of the partition row by row
+        partition = get_partition_name(table, get_week_start(created_date))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE FUNCTION reject_bet_delete() RETURNS trigger AS $$ "
+                "BEGIN RAISE EXCEPTION 'bet deleted row by row'; END $$ LANGUAGE plpgsql"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER reject_bet_delete BEFORE DELETE ON {partition} "
+                f"FOR EACH ROW EXECUTE FUNCTION reject_bet_delete()"
+            )
+
+        with tempfile.TemporaryDirectory() as archive_dir, override_settings(ARCHIVE_DIR=archive_dir):
+            with self.captureOnCommitCallbacks(execute=True):
+                delete_past_betinfos_and_matches()
+
+            self.assertNotIn(partition, [name for name, _ in get_partitions(table)])
+            self.assertFalse(UserMoneylineBet.objects.filter(pk=bet.pk).exists())
+            self.assertFalse(Match.objects.filter(pk=self.match.pk).exists())
+            # the bets of the dropped partition are archived too
+            bet_row, = read_archive("user_moneyline_bet")
+            self.assertEqual(bet_row["id"], bet.id)
+
+
+class ArchiveTests(TestCase):
+    """ Tests of the archive of the purged matches and bets """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("archive_user", "archive@gmail.com", "password")
+        cls.match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2025, 2, 12, 20), status="Finished",
+            home_team="Real Madrid", away_team="Barcelona", fulltime_score="2-1",
+        )
+        bet_info = MoneylineBetInfo.objects.create(
+            match=cls.match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+        UserMoneylineBet.objects.create(user=user, bet_info=bet_info, bet_amount=100)
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+
+    def test_archive_round_trip(self):
+        with override_settings(ARCHIVE_DIR=self.archive_dir.name):
+            with self.captureOnCommitCallbacks(execute=True):
+                counts = archive_matches(Match.objects.filter(pk=self.match.pk))
+            self.assertEqual(counts["match"], 1)
+            self.assertEqual(counts["user_moneyline_bet"], 1)
+
+            match_row, = read_archive("match", league="La Liga", season="2024-2025", week="2025-W07")
+            self.assertEqual(
+                (match_row["match_id"], match_row["home_team"], match_row["fulltime_score"]), (1, "Real Madrid", "2-1"))
+            self.assertEqual(match_row["date"], "2025-02-12T20:00:00")
+            bet_row, = read_archive("user_moneyline_bet")
+            self.assertEqual(bet_row["bet_amount"], "100.00")
+            self.assertEqual(list(read_archive("match", season="2025-2026")), [])
+
+    def test_rolled_back_archive_not_kept(self):
+        with override_settings(ARCHIVE_DIR=self.archive_dir.name):
+            with self.captureOnCommitCallbacks(execute=True):
+                archive_matches(Match.objects.filter(pk=self.match.pk))
+            # the purge fails after the archive, and is retried
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    archive_matches(Match.objects.filter(pk=self.match.pk))
+                    transaction.set_rollback(True)
+                archive_matches(Match.objects.filter(pk=self.match.pk))
+
+            # the match of the first purge and of the retry
+            self.assertEqual(len(list(read_archive("match"))), 2)
+
+    def test_failed_archive_not_published(self):
+        with override_settings(ARCHIVE_DIR=self.archive_dir.name):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(ValueError), ArchiveWriter() as writer:
+                    archive_rows(writer, "match", Match.objects.filter(pk=self.match.pk), F("league"), F("date"))
+                    raise ValueError("The archive failed.")
+
+            self.assertEqual(callbacks, [])
+            # nor its temporary files kept
+            self.assertEqual([path for path in Path(self.archive_dir.name).rglob("*") if path.is_file()], [])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ListQueryBudgetTests(APITestCase):
+    """ The list endpoints stay within a fixed query budget, whatever the number of rows """
+
+    QUERY_BUDGETS = {
+        "/soccerapp/moneyline_bets": 1,
+        "/soccerapp/handicap_bets": 1,
+        "/soccerapp/total_bets": 1,
+        "/soccerapp/standings?league=lal": 1,
+        "/soccerapp/match/1/moneyline_bet_info?bet_object=Goals": 3,
+        "/soccerapp/match/1/handicap_bet_info?bet_object=Goals": 3,
+        "/soccerapp/match/1/total_bet_info?bet_object=Goals": 3,
+        "/soccerapp/match/1/markets": 4,
+        "/soccerapp/match/1/markets?bet_object=Goals": 4,
+    }
+    """ Mapping the endpoint to the maximum number of queries of its request """
+
+    def setUp(self):
+        # The budgets are of the requests that miss the response cache
+        cache.clear()
+        local_cache.clear()
+
+    def seed(self, num_rows: int) -> None:
+        """ Create the given number of rows for each list """
+
+        self.user = User.objects.create_user("budget_user", "budget@gmail.com", "password")
+        match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12),
+            home_team="Real Madrid", away_team="Barcelona",
+        )
+
+        teams = Team.objects.bulk_create([
+            Team(league="La Liga", name=f"Team {i}", founded_year=1900, home_stadium="Stadium", description="")
+            for i in range(num_rows)
+        ])
+        TeamRanking.objects.bulk_create([
+            TeamRanking(
+                league="La Liga", team=team, rank=i + 1, points=0,
+                num_watches=0, num_wins=0, num_loses=0, num_draws=0,
+            )
+            for i, team in enumerate(teams)
+        ])
+
+        time_types = ["Full-time", "Half-time"]
+        moneyline_infos = MoneylineBetInfo.objects.bulk_create([
+            MoneylineBetInfo(match=match, time_type=time_types[i % 2], bet_team="Real Madrid", odd=120)
+            for i in range(num_rows)
+        ])
+        handicap_infos = HandicapBetInfo.objects.bulk_create([
+            HandicapBetInfo(
+                match=match, time_type=time_types[i % 2], bet_team=["Real Madrid", "Barcelona"][i % 2],
+                handicap_cover=i, odd=-110,
+            )
+            for i in range(num_rows)
+        ])
+        total_infos = TotalObjectsBetInfo.objects.bulk_create([
+            TotalObjectsBetInfo(
+                match=match, time_type=time_types[i % 2], under_or_over=["Under", "Over"][i % 2],
+                target_num_objects=i + 0.5, odd=150,
+            )
+            for i in range(num_rows)
+        ])
+
+        for user_bet_class, bet_infos in [
+            (UserMoneylineBet, moneyline_infos),
+            (UserHandicapBet, handicap_infos),
+            (UserTotalObjectsBet, total_infos),
+        ]:
+            user_bet_class.objects.bulk_create([
+                user_bet_class(user=self.user, bet_info=bet_info, bet_amount=100) for bet_info in bet_infos
+            ])
+
+    def check_query_budgets(self, num_rows: int) -> None:
+        self.seed(num_rows)
+        self.client.force_authenticate(self.user)
+
+        for url, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(url=url, num_rows=num_rows):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(queries), budget)
+
+    def test_query_budgets_with_one_row(self):
+        self.check_query_budgets(1)
+
+    def test_query_budgets_with_500_rows(self):
+        self.check_query_budgets(500)
+
+
+@override_settings(CACHES=LOCAL_CACHES, API_FOOTBALL_TRANSPORT="soccerapp.factories.fake_api_football")
+class QueryBudgetTests(APITestCase):
+    """
+    Every endpoint, uploader and settlement stays within a fixed budget of queries and of wall time on a
+    realistic dataset, with the recorded responses of API-Football. The budgets of the requests don't depend
+    on the number of rows (an N+1 of a serializer fails them), the ones of the uploaders are linear
+    in the number of matches or teams they process. The wall times depend on the machine, so they're only
+    checked with the environment variable ```CHECK_TIME_BUDGETS=1```
+    """
+
+    CHECK_TIME_BUDGETS = os.environ.get("CHECK_TIME_BUDGETS") == "1"
+
+    REQUEST_TIME_BUDGET = 1.0
+    """ The max wall time of a request (in seconds) """
+
+    UPLOADER_TIME_BUDGET = 0.05
+    """ The max wall time of an uploader per match or team it processes (in seconds) """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed_data = seed_dataset()
+        cls.user = cls.seed_data.users[0]
+        cls.admin = User.objects.create_user("budget_admin", "budget_admin@gmail.com", "password", is_staff=True)
+        cls.upcoming_match = cls.seed_data.upcoming_matches[0]
+        cls.team = Team.objects.first()
+
+    def setUp(self):
+        # the budgets are of the requests that miss the response cache
+        cache.clear()
+        local_cache.clear()
+        self.addCleanup(broker.subscriptions.clear)
+
+    def get_new_bet(self, bet_info_class, user_bet_class, index: int=0) -> dict:
+        """ The data of a new bet of the user on an upcoming match """
+        bet_info = bet_info_class.objects.filter(
+            match=self.upcoming_match, status="Unsettled",
+        ).exclude(pk__in=user_bet_class.objects.filter(user=self.user).values("bet_info"))[index]
+        return {"bet_info": {"id": bet_info.id}, "bet_amount": "10.00"}
+
+    def get_new_bets(self, bet_info_class, user_bet_class, num_bets: int, num_by_fields: int=0) -> list:
+        """
+        The data of new bets of the user on the upcoming matches, the bet info of the first ones
+        by all of its fields instead of its id
+        """
+        bet_infos = bet_info_class.objects.filter(
+            match__in=self.seed_data.upcoming_matches, status="Unsettled",
+        ).exclude(pk__in=user_bet_class.objects.filter(user=self.user).values("bet_info"))[:num_bets]
+        self.assertEqual(len(bet_infos), num_bets)
+        return [
+            {
+                "bet_info": {
+                    field.name: getattr(bet_info, field.attname)
+                    for field in bet_info_class._meta.concrete_fields if not field.primary_key
+                } if i < num_by_fields else {"id": bet_info.id},
+                "bet_amount": "10.00",
+            }
+            for i, bet_info in enumerate(bet_infos)
+        ]
+
+    def get_request_budgets(self) -> list:
+        """ The list of (route, method, path, data, max number of queries) of every endpoint """
+        match_id = self.upcoming_match.match_id
+        bet_object = MoneylineBetInfo.objects.filter(match=self.upcoming_match).first().bet_object
+        moneyline_bet = UserMoneylineBet.objects.filter(user=self.user).first()
+        handicap_bet = UserHandicapBet.objects.filter(user=self.user).first()
+        total_bet = UserTotalObjectsBet.objects.filter(user=self.user).first()
+        refresh = str(RefreshToken.for_user(self.user))
+
+        new_moneyline_bet = self.get_new_bet(MoneylineBetInfo, UserMoneylineBet)
+        new_handicap_bet = self.get_new_bet(HandicapBetInfo, UserHandicapBet)
+        new_total_bet = self.get_new_bet(TotalObjectsBetInfo, UserTotalObjectsBet)
+        bet_slip = {
+            "moneyline": [self.get_new_bet(MoneylineBetInfo, UserMoneylineBet, 1)],
+            "handicap": [self.get_new_bet(HandicapBetInfo, UserHandicapBet, 1)],
+            "total_objects": [self.get_new_bet(TotalObjectsBetInfo, UserTotalObjectsBet, 1)],
+        }
+        register = {
+            "username": "budget_new_user", "email": "budget_new_user@gmail.com", "password": "Password123!",
+            "password2": "Password123!", "first_name": "Budget", "last_name": "User", "balance": "100.00",
+        }
+
+        return [
+            ("login", "post", "/soccerapp/login", {"username": "user0", "password": "password"}, 2),
+            ("register", "post", "/soccerapp/register", register, 4),
+            ("login/refresh", "post", "/soccerapp/login/refresh", {"refresh": refresh}, 2),
+            ("logout", "post", "/soccerapp/logout", {"refresh": refresh}, 5),
+            ("detail", "get", "/soccerapp/detail", None, 3),
+            ("teams", "get", "/soccerapp/teams?league=lal", None, 1),
+            ("teams/<int:pk>", "get", f"/soccerapp/teams/{self.team.pk}", None, 1),
+            ("standings", "get", "/soccerapp/standings?league=lal", None, 1),
+            ("matches", "get", "/soccerapp/matches?status=NF", None, 1),
+            ("matches", "get", "/soccerapp/matches?status=FN&league=lal&page_size=50", None, 1),
+            ("matches/<int:match_id>", "get", f"/soccerapp/matches/{match_id}", None, 1),
+            ("match/<int:match_id>/moneyline_bet_info", "get", f"/soccerapp/match/{match_id}/moneyline_bet_info?bet_object={bet_object}", None, 3),
+            ("match/<int:match_id>/handicap_bet_info", "get", f"/soccerapp/match/{match_id}/handicap_bet_info?bet_object={bet_object}", None, 3),
+            ("match/<int:match_id>/total_bet_info", "get", f"/soccerapp/match/{match_id}/total_bet_info?bet_object={bet_object}", None, 3),
+            ("match/<int:match_id>/markets", "get", f"/soccerapp/match/{match_id}/markets", None, 4),
+            ("moneyline_bets", "get", "/soccerapp/moneyline_bets", None, 1),
+            ("moneyline_bets", "post", "/soccerapp/moneyline_bets", [new_moneyline_bet], 9),
+            ("handicap_bets", "get", "/soccerapp/handicap_bets", None, 1),
+            ("handicap_bets", "post", "/soccerapp/handicap_bets", [new_handicap_bet], 9),
+            ("total_bets", "get", "/soccerapp/total_bets", None, 1),
+            ("total_bets", "post", "/soccerapp/total_bets", [new_total_bet], 9),
+            ("bet_slip", "post", "/soccerapp/bet_slip", bet_slip, 15),
+            ("bets", "get", "/soccerapp/bets", None, 4),
+            ("moneyline_bets/<int:pk>", "get", f"/soccerapp/moneyline_bets/{moneyline_bet.pk}", None, 1),
+            ("handicap_bets/<int:pk>", "get", f"/soccerapp/handicap_bets/{handicap_bet.pk}", None, 1),
+            ("total_bets/<int:pk>", "get", f"/soccerapp/total_bets/{total_bet.pk}", None, 1),
+            ("events", "get", f"/soccerapp/events?match={match_id}", None, 0),
+            ("task_runs/summary", "get", "/soccerapp/task_runs/summary", None, 2),
+        ]
+
+    def test_every_endpoint_budgeted(self):
+        routes = {route for route, *_ in self.get_request_budgets()}
+        for pattern in urlpatterns:
+            self.assertIn(str(pattern.pattern), routes)
+
+    def test_request_budgets(self):
+        for route, method, path, data, max_queries in self.get_request_budgets():
+            with self.subTest(method=method, path=path):
+                cache.clear()
+                local_cache.clear()
+                user = self.admin if route == "task_runs/summary" else self.user
+                self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+                start_time = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(self.client, method)(path, data, format="json")
+                duration = time.perf_counter() - start_time
+
+                if route == "events":
+                    # the event stream is only served by the ASGI workers, the test client is WSGI
+                    self.assertEqual(response.status_code, 501)
+                else:
+                    self.assertLess(response.status_code, 300, getattr(response, "data", None))
+                self.assertLessEqual(len(queries), max_queries)
+                if self.CHECK_TIME_BUDGETS:
+                    self.assertLess(duration, self.REQUEST_TIME_BUDGET)
+
+    def test_bet_queries_independent_of_the_number_of_legs(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        new_bets = self.get_new_bets(MoneylineBetInfo, UserMoneylineBet, 11)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/soccerapp/moneyline_bets", new_bets[:1], format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        # the bet infos are fetched together, whatever the number of bets
+        with self.assertNumQueries(len(queries)):
+            response = self.client.post("/soccerapp/moneyline_bets", new_bets[1:], format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+
+        markets = [
+            ("moneyline", MoneylineBetInfo, UserMoneylineBet),
+            ("handicap", HandicapBetInfo, UserHandicapBet),
+            ("total_objects", TotalObjectsBetInfo, UserTotalObjectsBet),
+        ]
+        new_bets = {
+            market: self.get_new_bets(bet_info_class, user_bet_class, 11)
+            for market, bet_info_class, user_bet_class in markets
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/soccerapp/bet_slip", {market: bets[:1] for market, bets in new_bets.items()}, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.post(
+                "/soccerapp/bet_slip", {market: bets[1:] for market, bets in new_bets.items()}, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+
+        # the bet infos without id too, alone or with the ones by id
+        for num_bets, num_by_fields in [(11, 11), (12, 6)]:
+            new_bets = self.get_new_bets(MoneylineBetInfo, UserMoneylineBet, num_bets, num_by_fields)
+            # the first bet of each kind, then the others
+            few_bets = [new_bets[0], new_bets[num_by_fields]] if num_by_fields < num_bets else new_bets[:1]
+            more_bets = [bet for bet in new_bets if bet not in few_bets]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/soccerapp/moneyline_bets", few_bets, format="json")
+            self.assertEqual(response.status_code, 201, response.data)
+            with self.assertNumQueries(len(queries)):
+                response = self.client.post("/soccerapp/moneyline_bets", more_bets, format="json")
+            self.assertEqual(response.status_code, 201, response.data)
+
+    def check_budget(self, func, args: tuple, max_queries: int, num_items: int) -> list:
+        """ Run the uploader, and check its number of queries and its wall time for the number of items """
+        start_time = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = func(*args)
+        duration = time.perf_counter() - start_time
+        self.assertLessEqual(len(queries), max_queries)
+        if self.CHECK_TIME_BUDGETS:
+            self.assertLess(duration, self.UPLOADER_TIME_BUDGET * max(num_items, 1))
+        return result
+
+    def test_upload_team_rankings_budget(self):
+        # for each league: the delete, the query of each team (by its name in the standings), the insert
+        self.check_budget(upload_team_rankings, (), 5 * (TEAMS_PER_LEAGUE + 2), 5 * TEAMS_PER_LEAGUE)
+        self.assertEqual(TeamRanking.objects.filter(league="La Liga").count(), TEAMS_PER_LEAGUE)
+
+    def test_upload_matches_and_bets_budget(self):
+        matches = self.check_budget(upload_matches, ("La Liga", LEAGUES["La Liga"]), 1, 1)
+        self.assertTrue(matches)
+        # for each match: the insert of each market
+        self.check_budget(upload_match_bets, (matches,), 3 * len(matches), len(matches))
+        self.assertEqual(MoneylineBetInfo.objects.filter(match__in=matches).count(), 3 * 3 * 2 * len(matches))
+
+    def test_settlement_budget(self):
+        num_matches = len([match for match in self.seed_data.today_matches if match.league == "La Liga"])
+        # the query of each match (by its id in the scores), and the update of them
+        matches = self.check_budget(update_match_scores, ("La Liga", LEAGUES["La Liga"]), num_matches + 2, num_matches)
+        self.assertEqual(len(matches), num_matches)
+        # for each match and market: the query of the empty bet infos, the delete of them and of their bets
+        self.check_budget(delete_empty_bet_infos, (matches,), 3 * 3 * num_matches, num_matches)
+        # for each match and market: the query of the bets and of their users, their updates, the update of the bet infos
+        self.check_budget(settle_bets, (matches,), 3 * 5 * num_matches, num_matches)
+        self.assertFalse(UserMoneylineBet.objects.filter(bet_info__match__in=matches, payout__isnull=True).exists())
+
+    def test_settlement_task_budget(self):
+        num_matches = len([match for match in self.seed_data.today_matches if match.league == "La Liga"])
+        # the budgets of its uploaders, and the record of the run
+        self.check_budget(update_league_scores_and_settle, ("La Liga",), (1 + 9 + 15) * num_matches + 10, num_matches)
+        self.assertEqual(TaskRun.objects.get().status, "Succeeded")
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ResponseCacheTests(APITestCase):
+    """ Tests of the cached responses of the public read endpoints """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12),
+            home_team="Real Madrid", away_team="Barcelona",
+        )
+
+    def test_cache_hit_does_not_query(self):
+        response = self.client.get("/soccerapp/matches?league=lal&status=NF")
+        self.assertEqual(len(response.data), 1)
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get("/soccerapp/matches?league=lal&status=NF")
+        self.assertEqual(cached_response.data, response.data)
+
+    def test_data_change_invalidates_the_league(self):
+        self.client.get("/soccerapp/matches?league=lal&status=NF")
+        self.client.get("/soccerapp/matches?status=NF")
+        Match.objects.create(
+            league="La Liga", match_id=2, date=datetime(2100, 1, 2, 12),
+            home_team="Sevilla", away_team="Valencia",
+        )
+        # The versions are bumped once the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_league_data_version("La Liga")
+
+        self.assertEqual(len(self.client.get("/soccerapp/matches?league=lal&status=NF").data), 2)
+        self.assertEqual(len(self.client.get("/soccerapp/matches?status=NF").data), 2)
+
+    def test_uploaded_bets_invalidate_the_match(self):
+        self.client.get("/soccerapp/match/1/markets")
+        with patch("soccerapp.uploaders.get_winner_bets") as get_winner_bets, \
+            patch("soccerapp.uploaders.get_total_bets") as get_total_bets:
+            get_winner_bets.side_effect = lambda market, *args: [
+                {"time_type": "Full-time", "bet_object": "Goals", "bet_team": "Real Madrid", "odd": 120}
+            ] if market == "moneyline" else []
+            get_total_bets.return_value = []
+            with self.captureOnCommitCallbacks(execute=True):
+                upload_match_bets([self.match])
+
+        response = self.client.get("/soccerapp/match/1/markets")
+        self.assertEqual(len(response.data["Goals"]["moneyline"]["full_time"]), 1)
+
+    def test_error_response_is_not_cached(self):
+        self.assertEqual(self.client.get("/soccerapp/match/2/markets").status_code, 404)
+        Match.objects.create(
+            league="La Liga", match_id=2, date=datetime(2100, 1, 2, 12),
+            home_team="Sevilla", away_team="Valencia",
+        )
+        self.assertEqual(self.client.get("/soccerapp/match/2/markets").status_code, 200)
+
+    def test_conditional_request_not_modified(self):
+        response = self.client.get("/soccerapp/standings?league=lal")
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("public", response["Cache-Control"])
+
+        # Neither the cache nor the database is needed for the unchanged data
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            not_modified_response = self.client.get(
+                "/soccerapp/standings?league=lal", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response.content, b"")
+
+        not_modified_response = self.client.get(
+            "/soccerapp/standings?league=lal", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(not_modified_response.status_code, 304)
+
+    def test_conditional_request_after_data_change(self):
+        response = self.client.get("/soccerapp/matches/1")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_league_data_version("La Liga", [1])
+
+        modified_response = self.client.get("/soccerapp/matches/1", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response["ETag"], response["ETag"])
+
+
+class ReadSerializerTests(TestCase):
+    """ The read serializers and the orjson renderer output the same JSON as the model serializers and DRF """
+
+    @classmethod
+    def setUpTestData(cls):
+        team = Team.objects.create(
+            league="La Liga", name="Atlético Madrid", founded_year=1903, home_stadium="Metropolitano", description="")
+        TeamRanking.objects.create(
+            league="La Liga", team=team, rank=1, points=30,
+            num_watches=12, num_wins=9, num_loses=0, num_draws=3,
+        )
+        not_finished_match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 21, 5),
+            home_team="Atlético Madrid", away_team="Barcelona",
+        )
+        finished_match = Match.objects.create(
+            league="La Liga", match_id=2, date=datetime(2024, 10, 6, 9, 30),
+            home_team="Real Madrid", away_team="Villarreal", status="Finished", updated_date=date(2024, 10, 6),
+            halftime_score="1-0", fulltime_score="2-0", possesion="60-40", corners="7-2", cards="1-3",
+        )
+        for match in [not_finished_match, finished_match]:
+            MoneylineBetInfo.objects.create(match=match, time_type="Full-time", bet_team=match.home_team, odd=120)
+            HandicapBetInfo.objects.create(
+                match=match, time_type="Half-time", bet_team=match.away_team, handicap_cover=-1.25, odd=-110)
+            TotalObjectsBetInfo.objects.create(
+                match=match, time_type="Full-time", bet_object="Corners", under_or_over="Under",
+                target_num_objects=9.5, odd=105, status="Settled", settled_date=date(2024, 10, 6),
+            )
+
+    def assertSameJSON(self, model_serializer, read_serializer, queryset):
+        self.assertEqual(
+            ORJSONRenderer().render(read_serializer(queryset).data),
+            JSONRenderer().render(model_serializer(queryset, many=True).data),
+        )
+
+    def test_read_serializers(self):
+        self.assertSameJSON(MatchSerializer, MatchReadSerializer, Match.objects.all())
+        self.assertSameJSON(TeamRankingSerializer, TeamRankingReadSerializer, TeamRanking.objects.all())
+        self.assertSameJSON(MoneylineBetInfoSerializer, MoneylineBetInfoReadSerializer, MoneylineBetInfo.objects.order_by("pk"))
+        self.assertSameJSON(HandicapBetInfoSerizalizer, HandicapBetInfoReadSerializer, HandicapBetInfo.objects.order_by("pk"))
+        self.assertSameJSON(
+            TotalObjectsBetInfoSerializer, TotalObjectsBetInfoReadSerializer, TotalObjectsBetInfo.objects.order_by("pk"))
+
+    def test_renderer_same_bytes_as_drf(self):
+        data = {
+            "started_at": datetime(2025, 2, 17, 0, 0, 1, 123456),
+            "finished_at": timezone.make_aware(datetime(2025, 2, 17, 0, 5), timezone.get_fixed_timezone(0)),
+            "date": date(2025, 2, 17),
+            "time": datetime(2025, 2, 17, 21, 5, 30, 250000).time(),
+            "amounts": [Decimal("100.00"), Decimal("0.1"), Decimal("-1.25")],
+            "durations": [0.1, 1.5, -110.0, 2 / 3],
+            "team": "Atlético Madrid",
+            1: None,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class KeysetPaginationTests(APITestCase):
+    """ Tests of the cursor pagination of the matches and the bets of the user """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.user = User.objects.create_user("page_user", "page@gmail.com", "password")
+        # the matches at the same time are ordered by their id
+        self.matches = Match.objects.bulk_create([
+            Match(
+                league="La Liga", match_id=i, date=datetime(2100, 1, 1 + i // 2, 12),
+                home_team=f"Home {i}", away_team=f"Away {i}",
+            )
+            for i in range(7)
+        ])
+        bet_info = MoneylineBetInfo.objects.create(
+            match=self.matches[0], time_type="Full-time", bet_team="Home 0", odd=120)
+        UserMoneylineBet.objects.bulk_create([
+            UserMoneylineBet(
+                user=self.user, bet_info=bet_info, bet_amount=10, created_date=date(2025, 1, 1 + i // 2))
+            for i in range(5)
+        ])
+        self.client.force_authenticate(self.user)
+
+    def get_pages(self, url: str):
+        """ Follow the next links from the first page, return the list of pages """
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data["results"])
+            url = response.data["next"]
+        return pages
+
+    def test_not_paginated_without_params(self):
+        response = self.client.get("/soccerapp/matches?status=NF")
+        self.assertEqual(len(response.data), 7)
+
+    def test_match_pages(self):
+        pages = self.get_pages("/soccerapp/matches?league=lal&status=NF&page_size=3")
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(
+            [match["match_id"] for page in pages for match in page], list(range(7)))
+
+    def test_match_pages_stable_under_inserts(self):
+        first_page = self.client.get("/soccerapp/matches?status=NF&page_size=3").data
+        # a match inserted before the cursor doesn't shift the next page
+        Match.objects.create(
+            league="La Liga", match_id=100, date=datetime(2099, 1, 1, 12), home_team="Early", away_team="Bird")
+        second_page = self.client.get(first_page["next"]).data["results"]
+        self.assertEqual([match["match_id"] for match in second_page], [3, 4, 5])
+
+    def test_bet_pages_from_the_latest(self):
+        pages = self.get_pages("/soccerapp/moneyline_bets?page_size=2")
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+        positions = [(bet["created_date"], bet["id"]) for page in pages for bet in page]
+        self.assertEqual(positions, sorted(positions, reverse=True))
+        self.assertEqual(self.get_pages("/soccerapp/handicap_bets?page_size=2"), [[]])
+
+    def test_page_size_cap_and_invalid_cursor(self):
+        with patch.object(MatchPagination, "max_page_size", 5):
+            response = self.client.get("/soccerapp/matches?status=NF&page_size=100000")
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual(self.client.get("/soccerapp/matches?status=NF&cursor=abc").status_code, 400)
+        self.assertEqual(self.client.get("/soccerapp/moneyline_bets?cursor=WyJ4IiwgMV0=").status_code, 400)
+
+
+class BetSlipTests(APITestCase):
+    """ Tests of the bet slip, placing the bets of every market at once or none of them """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("slip_user", "slip@gmail.com", "password", balance=Decimal("100.00"))
+        match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12), home_team="Real Madrid", away_team="Barcelona")
+        started_match = Match.objects.create(
+            league="Serie A", match_id=2, date=datetime(2000, 1, 1, 12), home_team="Inter", away_team="Milan")
+        cls.moneyline_info = MoneylineBetInfo.objects.create(
+            match=match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+        cls.handicap_info = HandicapBetInfo.objects.create(
+            match=match, time_type="Full-time", bet_team="Barcelona", handicap_cover=0.5, odd=-110)
+        cls.started_handicap_info = HandicapBetInfo.objects.create(
+            match=started_match, time_type="Full-time", bet_team="Milan", handicap_cover=0.5, odd=-110)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def post_slip(self, bet_slip):
+        return self.client.post("/soccerapp/bet_slip", bet_slip, format="json")
+
+    def assertNothingPlaced(self):
+        self.assertFalse(UserMoneylineBet.objects.exists())
+        self.assertFalse(UserHandicapBet.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal("100.00"))
+
+    def test_slip_placed(self):
+        response = self.post_slip({
+            "moneyline": [{"bet_info": {"id": self.moneyline_info.id}, "bet_amount": "40.00"}],
+            "handicap": [{"bet_info": {"id": self.handicap_info.id}, "bet_amount": "20.00"}],
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((len(response.data["moneyline"]), len(response.data["handicap"])), (1, 1))
+        self.user.refresh_from_db()
+        # the fees of the whole slip
+        self.assertEqual(self.user.balance, Decimal("37.00"))
+
+    def test_legs_over_the_balance(self):
+        # each leg is within the balance, not the whole slip
+        response = self.post_slip({
+            "moneyline": [{"bet_info": {"id": self.moneyline_info.id}, "bet_amount": "60.00"}],
+            "handicap": [{"bet_info": {"id": self.handicap_info.id}, "bet_amount": "60.00"}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertNothingPlaced()
+
+    def test_bad_leg_places_nothing(self):
+        response = self.post_slip({
+            "moneyline": [{"bet_info": {"id": self.moneyline_info.id}, "bet_amount": "10.00"}],
+            "handicap": [
+                {"bet_info": {"id": self.handicap_info.id}, "bet_amount": "10.00"},
+                {"bet_info": {"id": self.started_handicap_info.id}, "bet_amount": "10.00"},
+            ],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("after the match begins", response.data["error"])
+        self.assertNothingPlaced()
+
+    def test_empty_slip_or_unknown_market(self):
+        moneyline_bets = [{"bet_info": {"id": self.moneyline_info.id}, "bet_amount": "10.00"}]
+        for bet_slip in [{}, {"moneyline": []}, {"parlay": moneyline_bets}, {"moneyline": moneyline_bets, "parlay": []}]:
+            with self.subTest(bet_slip=bet_slip):
+                self.assertEqual(self.post_slip(bet_slip).status_code, 400)
+        self.assertNothingPlaced()
+
+    def test_slip_not_a_dict(self):
+        moneyline_bet = {"bet_info": {"id": self.moneyline_info.id}, "bet_amount": "10.00"}
+        for bet_slip in [[moneyline_bet], "moneyline", {"moneyline": moneyline_bet}, {"moneyline": ["bet"]}]:
+            with self.subTest(bet_slip=bet_slip):
+                self.assertEqual(self.post_slip(bet_slip).status_code, 400)
+        self.assertNothingPlaced()
+
+
+class BetHistoryTests(APITestCase):
+    """ Tests of the merged bet history of the user and its summary """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("history_user", "history@gmail.com", "password")
+        other_user = User.objects.create_user("other_user", "other@gmail.com", "password")
+        la_liga_match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12), home_team="Real Madrid", away_team="Barcelona")
+        serie_a_match = Match.objects.create(
+            league="Serie A", match_id=2, date=datetime(2100, 1, 2, 12), home_team="Inter", away_team="Milan")
+
+        moneyline_info = MoneylineBetInfo.objects.create(
+            match=la_liga_match, time_type="Full-time", bet_team="Real Madrid", odd=120, status="Settled")
+        handicap_info = HandicapBetInfo.objects.create(
+            match=serie_a_match, time_type="Half-time", bet_team="Milan", handicap_cover=0.25, odd=-110)
+        total_info = TotalObjectsBetInfo.objects.create(
+            match=la_liga_match, time_type="Full-time", under_or_over="Over", target_num_objects=2.5, odd=150,
+            status="Settled")
+
+        # the same ids and dates in different tables
+        UserMoneylineBet.objects.create(
+            id=1, user=cls.user, bet_info=moneyline_info, bet_amount=100, payout=220, created_date=date(2025, 1, 1))
+        UserTotalObjectsBet.objects.create(
+            id=1, user=cls.user, bet_info=total_info, bet_amount=50, payout=0, created_date=date(2025, 1, 1))
+        UserHandicapBet.objects.create(
+            id=1, user=cls.user, bet_info=handicap_info, bet_amount=30, created_date=date(2025, 1, 3))
+        UserHandicapBet.objects.create(
+            id=2, user=cls.user, bet_info=handicap_info, bet_amount=20, created_date=date(2025, 1, 2))
+        UserHandicapBet.objects.create(
+            id=3, user=other_user, bet_info=handicap_info, bet_amount=1000, created_date=date(2025, 1, 2))
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_merged_pages_from_the_latest(self):
+        bets, url = [], "/soccerapp/bets?page_size=2"
+        while url:
+            response = self.client.get(url)
+            bets.extend(response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(
+            [(bet["bet_type"], bet["id"]) for bet in bets],
+            [("handicap", 1), ("handicap", 2), ("total_objects", 1), ("moneyline", 1)],
+        )
+        self.assertEqual(bets[0]["selection"], "Milan")
+        self.assertEqual(bets[0]["line"], "0.25")
+        self.assertEqual(bets[0]["match_name"], "Inter vs Milan")
+        self.assertIsNone(bets[3]["line"])
+        self.assertEqual(bets[3]["payout"], "220.00")
+
+    def test_summary(self):
+        with self.assertNumQueries(4):
+            response = self.client.get("/soccerapp/bets")
+        summary = response.data["summary"]
+
+        self.assertEqual(summary["total"], {
+            "num_bets": 4, "open_stake": "50.00", "settled_profit": "70.00", "win_rate": 0.5})
+        self.assertEqual(summary["by_bet_type"]["handicap"]["win_rate"], None)
+        self.assertEqual(summary["by_league"]["La Liga"]["settled_profit"], "70.00")
+        self.assertEqual(summary["by_league"]["Serie A"]["open_stake"], "50.00")
+
+    def test_status_filter(self):
+        response = self.client.get("/soccerapp/bets?status=Unsettled")
+        self.assertEqual([bet["bet_type"] for bet in response.data["results"]], ["handicap", "handicap"])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AsyncReadViewTests(TestCase):
+    """ The async read views respond with the same JSON as the sync views """
+
+    @classmethod
+    def setUpTestData(cls):
+        team = Team.objects.create(
+            league="La Liga", name="Real Madrid", logo="https://media.api-sports.io/football/teams/541.png",
+            founded_year=1902, home_stadium="Santiago Bernabeu", description="Real Madrid C.F.",
+        )
+        TeamRanking.objects.create(
+            league="La Liga", team=team, rank=1, points=30, num_watches=12, num_wins=9, num_loses=0, num_draws=3)
+        matches = Match.objects.bulk_create([
+            Match(
+                league="La Liga", match_id=i, date=datetime(2100, 1, 1 + i, 12),
+                home_team="Real Madrid", away_team=f"Away {i}",
+            )
+            for i in range(3)
+        ])
+        MoneylineBetInfo.objects.create(match=matches[0], time_type="Full-time", bet_team="Real Madrid", odd=120)
+        HandicapBetInfo.objects.create(
+            match=matches[0], time_type="Half-time", bet_team="Away 0", handicap_cover=0.25, odd=-110)
+        TotalObjectsBetInfo.objects.create(
+            match=matches[0], time_type="Full-time", under_or_over="Over", target_num_objects=2.5, odd=150)
+        cls.team = team
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def get_async_response(self, view_class, url: str, **kwargs):
+        # the sync view shouldn't have cached the response
+        await cache.aclear()
+        local_cache.clear()
+        return await view_class.as_view()(self.factory.get(url), **kwargs)
+
+    async def test_same_json_as_sync_views(self):
+        urls = [
+            (async_views.TeamList, "/soccerapp/teams?league=lal", {}),
+            (async_views.TeamDetail, f"/soccerapp/teams/{self.team.pk}", {"pk": self.team.pk}),
+            (async_views.Standings, "/soccerapp/standings?league=lal", {}),
+            (async_views.MatchList, "/soccerapp/matches?status=NF", {}),
+            (async_views.MatchList, "/soccerapp/matches?league=lal&status=NF&page_size=2", {}),
+            (async_views.MatchDetail, "/soccerapp/matches/0", {"match_id": 0}),
+            (async_views.MoneylineInfoList, "/soccerapp/match/0/moneyline_bet_info?bet_object=Goals", {"match_id": 0}),
+            (async_views.HandicapInfoList, "/soccerapp/match/0/handicap_bet_info?bet_object=Goals", {"match_id": 0}),
+            (async_views.TotalObjectsInfoList, "/soccerapp/match/0/total_bet_info?bet_object=Goals", {"match_id": 0}),
+        ]
+        for view_class, url, kwargs in urls:
+            sync_response = await self.async_client.get(url)
+            async_response = await self.get_async_response(view_class, url, **kwargs)
+            self.assertEqual(async_response.status_code, 200, url)
+            self.assertEqual(async_response.content, sync_response.content, url)
+
+            # same data versions, same ETag
+            cached_response = await self.async_client.get(url)
+            self.assertEqual(cached_response["ETag"], async_response["ETag"], url)
+
+    async def test_errors_and_not_modified(self):
+        response = await self.get_async_response(async_views.MatchList, "/soccerapp/matches")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, (await self.async_client.get("/soccerapp/matches")).content)
+
+        response = await self.get_async_response(async_views.MatchDetail, "/soccerapp/matches/9", match_id=9)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, (await self.async_client.get("/soccerapp/matches/9")).content)
+
+        response = await self.get_async_response(async_views.Standings, "/soccerapp/standings?league=lal")
+        not_modified_response = await async_views.Standings.as_view()(
+            self.factory.get("/soccerapp/standings?league=lal", headers={"if-none-match": response["ETag"]}))
+        self.assertEqual(not_modified_response.status_code, 304)
+
+
+class EventTests(TestCase):
+    """ Tests of the real-time events published by the tasks and their stream """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("event_user", "event@gmail.com", "password")
+        cls.match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12),
+            home_team="Real Madrid", away_team="Barcelona",
+        )
+
+    def test_match_finished_published_on_commit(self):
+        match_score = {
+            "match_id": 1, "halftime": "1-0", "fulltime": "2-1", "penalty": "None-None",
+            "possession": "55%-45%", "total_shots": "12-8", "corners": "6-3", "cards": "2-1",
+        }
+        with patch("soccerapp.uploaders.get_match_score", return_value=[match_score]), \
+            patch.object(InMemoryBackend, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                generic_update_match_scores("La Liga", 140, "2100-01-01")
+                publish.assert_not_called()
+
+        channels, message = publish.call_args.args
+        self.assertEqual(channels, ["match:*", "match:1"])
+        self.assertEqual(json.loads(message), {"type": "match_finished", "data": {
+            "match_id": 1, "league": "La Liga", "home_team": "Real Madrid", "away_team": "Barcelona",
+            "halftime_score": "1-0", "fulltime_score": "2-1", "penalty": "None-None",
+        }})
+
+    def test_bets_settled_published_per_user(self):
+        Match.objects.filter(pk=self.match.pk).update(status="Finished", halftime_score="1-0", fulltime_score="2-1")
+        bet_info = MoneylineBetInfo.objects.create(match=self.match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+        UserMoneylineBet.objects.bulk_create([
+            UserMoneylineBet(user=self.user, bet_info=bet_info, bet_amount=10) for _ in range(2)])
+
+        with patch.object(InMemoryBackend, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                settle_bet_list("moneyline", UserMoneylineBet.objects.filter(bet_info__match=self.match))
+
+        publish.assert_called_once()
+        channels, message = publish.call_args.args
+        event = json.loads(message)
+        self.assertEqual(channels, [f"user:{self.user.id}"])
+        self.assertEqual(event["type"], "bets_settled")
+        self.assertEqual([bet["payout"] for bet in event["data"]["bets"]], ["22.00", "22.00"])
+        self.assertEqual(event["data"]["balance"], "44.00")
+
+    def test_bets_settled_split_into_small_events(self):
+        Match.objects.filter(pk=self.match.pk).update(status="Finished", halftime_score="1-0", fulltime_score="2-1")
+        bet_info = MoneylineBetInfo.objects.create(match=self.match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+        UserMoneylineBet.objects.bulk_create([
+            UserMoneylineBet(user=self.user, bet_info=bet_info, bet_amount=10) for _ in range(120)])
+
+        with patch.object(InMemoryBackend, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                settle_bet_list("moneyline", UserMoneylineBet.objects.filter(bet_info__match=self.match))
+
+        events = [json.loads(call.args[1]) for call in publish.call_args_list]
+        self.assertEqual([len(event["data"]["bets"]) for event in events], [50, 50, 20])
+        # even the largest event fits in a NOTIFY
+        payloads = [json.dumps({"channels": call.args[0], "message": call.args[1]}) for call in publish.call_args_list]
+        self.assertLessEqual(max(len(payload) for payload in payloads), PostgresBackend.max_payload_size)
+
+    def test_too_large_event_logged(self):
+        backend = PostgresBackend(broker)
+        with self.assertRaises(ValueError):
+            backend.publish(["user:1"], "x" * 8000)
+
+        with patch("soccerapp.events.get_event_backend", return_value=backend), \
+            patch("sys.stdout", new_callable=StringIO) as stdout:
+            with self.captureOnCommitCallbacks(execute=True):
+                publish_event(["user:1"], "bets_settled", {"bets": ["x" * 8000]})
+        self.assertIn("Publishing the event bets_settled to user:1 failed", stdout.getvalue())
+
+    async def test_stream_of_the_subscribed_channels(self):
+        token = str(AccessToken.for_user(self.user))
+        request = AsyncRequestFactory().get(f"/soccerapp/events?match=1&token={token}")
+        response = await EventStream.as_view()(request)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        # only the events of the subscribed channels
+        broker.deliver(["match:*", "match:2"], '{"type": "match_finished", "data": {"match_id": 2}}')
+        broker.deliver([f"user:{self.user.id}"], '{"type": "bets_settled", "data": {}}')
+        event = await asyncio.wait_for(anext(stream), timeout=1)
+        self.assertEqual(event, b'data: {"type": "bets_settled", "data": {}}\n\n')
+
+        # the server cancels the response of the disconnected client
+        next_event = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        next_event.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await next_event
+        self.assertNotIn(f"user:{self.user.id}", broker.subscriptions)
+
+    async def test_stream_only_under_asgi(self):
+        # the request of the sync (WSGI) workers
+        request = RequestFactory().get("/soccerapp/events?match=1")
+        response = await EventStream.as_view()(request)
+        self.assertEqual(response.status_code, 501)
+        self.assertNotIn("match:1", broker.subscriptions)
+
+    async def test_stream_invalid_token(self):
+        request = AsyncRequestFactory().get("/soccerapp/events?token=abc")
+        response = await EventStream.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_stream_of_inactive_user(self):
+        token = str(AccessToken.for_user(self.user))
+        await User.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+        request = AsyncRequestFactory().get(f"/soccerapp/events?token={token}")
+        response = await EventStream.as_view()(request)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn(f"user:{self.user.id}", broker.subscriptions)
+
+    async def test_stream_ends_when_token_expires(self):
+        channels = [f"user:{self.user.id}"]
+        stream = aiter(EventStream().stream(broker.subscribe(channels), expires_at=time.time() + 0.1))
+        self.assertEqual(await anext(stream), "retry: 5000\n\n")
+        # before the heartbeat
+        self.assertEqual(await asyncio.wait_for(anext(stream), timeout=1), "event: token_expired\ndata: {}\n\n")
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertNotIn(f"user:{self.user.id}", broker.subscriptions)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class TokenAuthenticationTests(APITestCase):
+    """ Tests of the user of the access token, and of the cached blacklist check of the refresh token """
+
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.clear()
+        self.user = User.objects.create_user("token_user", "token@gmail.com", "password", balance=100)
+        tokens = self.client.post("/soccerapp/login", {"username": "token_user", "password": "password"}).data
+        self.access, self.refresh = tokens["access"], tokens["refresh"]
+
+    def test_user_not_queried_for_its_id(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        # only the query of the bets
+        with self.assertNumQueries(1):
+            response = self.client.get("/soccerapp/moneyline_bets")
+        self.assertEqual(response.status_code, 200)
+
+        # the user is queried for its other fields
+        response = self.client.get("/soccerapp/detail")
+        self.assertEqual(response.data["username"], "token_user")
+        self.assertEqual(response.data["balance"], "100.00")
+
+    def test_placed_bet_updates_the_balance(self):
+        match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12), home_team="Real Madrid", away_team="Barcelona")
+        bet_info = MoneylineBetInfo.objects.create(match=match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+        response = self.client.post("/soccerapp/moneyline_bets", [{
+            "bet_info": {
+                "id": bet_info.id, "match": match.id, "time_type": "Full-time",
+                "bet_object": "Goals", "bet_team": "Real Madrid", "odd": "120.00",
+            },
+            "bet_amount": "20.00",
+        }], format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal("79.00"))
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer abc")
+        self.assertEqual(self.client.get("/soccerapp/moneyline_bets").status_code, 401)
+
+    def test_deactivated_user_rejected_when_loaded(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # the user is loaded for its balance
+        self.assertEqual(self.client.get("/soccerapp/detail").status_code, 401)
+
+        self.user.delete()
+        self.assertEqual(self.client.get("/soccerapp/detail").status_code, 401)
+
+    def test_blacklist_check_in_memory(self):
+        with CaptureQueriesContext(connection) as first_queries:
+            self.assertEqual(self.client.post("/soccerapp/login/refresh", {"refresh": self.refresh}).status_code, 200)
+        with CaptureQueriesContext(connection) as second_queries:
+            self.assertEqual(self.client.post("/soccerapp/login/refresh", {"refresh": self.refresh}).status_code, 200)
+        self.assertEqual(len(second_queries), len(first_queries) - 1)
+
+        # the logout blacklists the token in the cache
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post("/soccerapp/logout", {"refresh": self.refresh}).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.post("/soccerapp/login/refresh", {"refresh": self.refresh})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(TOKEN_BLACKLIST_REFRESH_INTERVAL=0)
+    def test_blacklist_loaded_from_other_processes(self):
+        self.assertEqual(self.client.post("/soccerapp/login/refresh", {"refresh": self.refresh}).status_code, 200)
+        # blacklisted in the admin, or by another process
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(user=self.user))
+        self.assertEqual(self.client.post("/soccerapp/login/refresh", {"refresh": self.refresh}).status_code, 401)
+
+    def test_prune_expired_tokens(self):
+        OutstandingToken.objects.bulk_create([
+            OutstandingToken(user=self.user, jti=f"expired-{i}", token="token", expires_at=timezone.now() - timedelta(days=1))
+            for i in range(5)
+        ])
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti="expired-0"))
+
+        self.assertEqual(prune_expired_tokens(batch_size=2), 5)
+        # the token of the login hasn't expired
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(CACHES=LOCAL_CACHES, METRICS_DIR=tempfile.mkdtemp())
+class MetricsTests(TestCase):
+    """ Tests of the metrics of the requests, and of their merge across the processes """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        registry.clear()
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.metrics_dir.cleanup)
+        Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12), home_team="Real Madrid", away_team="Barcelona")
+
+    def get_metrics(self) -> str:
+        return self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").content.decode()
+
+    def write_other_snapshot(self, file_name: str) -> None:
+        """ The snapshot of this process, as the one of another process """
+        registry.flush(force=True)
+        with open(registry.get_snapshot_path()) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        with open(os.path.join(self.metrics_dir.name, file_name), "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+
+    def test_metrics_by_route(self):
+        with override_settings(METRICS_DIR=self.metrics_dir.name, METRICS_TOKEN="secret"):
+            self.client.get("/soccerapp/matches/1")
+            self.client.get("/soccerapp/matches/1") # cached, without queries
+            self.client.get("/soccerapp/unknown")
+            metrics = self.get_metrics()
+
+        labels = '{route="soccerapp/matches/<int:match_id>",method="GET"'
+        self.assertIn(f'soccerbet_requests_total{labels},status="200"}} 2', metrics)
+        self.assertIn(f"soccerbet_request_duration_seconds_count{labels}}} 2", metrics)
+        self.assertIn(f'soccerbet_db_queries_bucket{labels},le="0"}} 1', metrics)
+        self.assertIn(f'soccerbet_db_queries_bucket{labels},le="+Inf"}} 2', metrics)
+        self.assertIn('soccerbet_requests_total{route="unmatched",method="GET",status="404"} 1', metrics)
+
+    def test_metrics_merged_across_processes(self):
+        with override_settings(METRICS_DIR=self.metrics_dir.name, METRICS_TOKEN="secret"):
+            self.client.get("/soccerapp/matches/1")
+            # the same snapshot for another worker, which is still running
+            self.write_other_snapshot(f"{os.getpid()}-worker.json")
+            metrics = self.get_metrics()
+        self.assertIn(
+            'soccerbet_requests_total{route="soccerapp/matches/<int:match_id>",method="GET",status="200"} 2', metrics)
+
+    def test_metrics_of_exited_processes_kept(self):
+        exited_process = subprocess.Popen(["true"])
+        exited_process.wait()
+        labels = '{route="soccerapp/matches/<int:match_id>",method="GET",status="200"}'
+        with override_settings(METRICS_DIR=self.metrics_dir.name, METRICS_TOKEN="secret"):
+            self.client.get("/soccerapp/matches/1")
+            self.write_other_snapshot(f"{exited_process.pid}-worker.json")
+
+            self.assertIn(f"soccerbet_requests_total{labels} 2", self.get_metrics())
+            # merged into the snapshot of the exited processes, and counted once
+            self.assertFalse(os.path.exists(os.path.join(self.metrics_dir.name, f"{exited_process.pid}-worker.json")))
+            self.assertIn(f"soccerbet_requests_total{labels} 2", self.get_metrics())
+
+            # a new process with the same pid has its own file
+            self.write_other_snapshot(f"{exited_process.pid}-new_worker.json")
+            self.assertIn(f"soccerbet_requests_total{labels} 3", self.get_metrics())
+
+    async def test_async_requests_not_adapted(self):
+        # the whole chain of the middlewares stays async under ASGI (only the hooks of the views are adapted)
+        with patch("django.core.handlers.base.sync_to_async", wraps=sync_to_async) as adapt:
+            ASGIHandler()
+        adapted_names = {adapted_call.args[0].__name__ for adapted_call in adapt.call_args_list}
+        self.assertLessEqual(adapted_names, {"process_view", "process_template_response", "process_exception"})
+
+        async def get_response(request):
+            return await async_views.MatchDetail.as_view()(request, match_id=1)
+
+        middleware_chain = MetricsMiddleware(TracingMiddleware(ProfilingMiddleware(get_response)))
+        self.assertTrue(iscoroutinefunction(middleware_chain))
+        with override_settings(METRICS_DIR=self.metrics_dir.name):
+            response = await middleware_chain(AsyncRequestFactory().get("/soccerapp/matches/1"))
+        self.assertEqual(response.status_code, 200)
+
+        # the queries of the async view are recorded too
+        db_queries, = [
+            histogram for histogram in registry.snapshot()["histograms"] if histogram["name"] == "db_queries"]
+        self.assertGreater(db_queries["sum"], 0)
+
+    def test_metrics_flush_error(self):
+        # the directory of the metrics can't be created
+        with tempfile.NamedTemporaryFile() as metrics_file, \
+                override_settings(METRICS_DIR=metrics_file.name, METRICS_FLUSH_INTERVAL=0):
+            self.assertEqual(self.client.get("/soccerapp/matches/1").status_code, 200)
+
+    def test_metrics_token(self):
+        with override_settings(METRICS_DIR=self.metrics_dir.name):
+            # not public without the token
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+            with override_settings(METRICS_TOKEN="secret"):
+                self.assertEqual(self.client.get("/metrics").status_code, 401)
+                self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+
+class TaskTelemetryTests(APITestCase):
+    """ Tests of the runs of the tasks recorded with their stages and counters, and of their summary """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("telemetry_user", "telemetry@gmail.com", "password")
+        cls.match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12), home_team="Real Madrid", away_team="Barcelona")
+        bet_info = MoneylineBetInfo.objects.create(match=cls.match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+        UserMoneylineBet.objects.bulk_create([
+            UserMoneylineBet(user=cls.user, bet_info=bet_info, bet_amount=10) for _ in range(2)])
+        cls.match_score = {
+            "match_id": 1, "halftime": "1-0", "fulltime": "2-1", "penalty": "None-None",
+            "possession": "55%-45%", "total_shots": "12-8", "corners": "6-3", "cards": "2-1",
+        }
+
+    def test_settle_run_recorded(self):
+        with patch("soccerapp.uploaders.get_match_score", return_value=[self.match_score]):
+            update_league_scores_and_settle("La Liga")
+
+        task_run = TaskRun.objects.get()
+        self.assertEqual((task_run.task_name, task_run.league, task_run.status), (
+            "update_league_scores_and_settle", "La Liga", "Succeeded"))
+        self.assertEqual(list(task_run.stages), ["update_scores", "delete_empty_bet_infos", "settle_bets"])
+        self.assertEqual(task_run.counters["bets_settled"], 2)
+        self.assertEqual(task_run.counters["balance_updates"], 1)
+        # the finished match and its settled bet info
+        self.assertEqual(task_run.counters["rows_updated"], 2)
+        self.assertIn("bets_settled_per_second", task_run.counters)
+
+    def test_failed_run_recorded(self):
+        with patch("soccerapp.uploaders.get_match_score", side_effect=ConnectionError("API-Football is down")):
+            with self.assertRaises(ConnectionError):
+                update_league_scores_and_settle("La Liga")
+
+        task_run = TaskRun.objects.get()
+        self.assertEqual(task_run.status, "Failed")
+        self.assertEqual(task_run.error, "ConnectionError: API-Football is down")
+        self.assertEqual(list(task_run.stages), ["update_scores"])
+
+    def test_summary_for_the_admins(self):
+        with patch("soccerapp.uploaders.get_match_score", return_value=[self.match_score]):
+            update_league_scores_and_settle("La Liga")
+        with patch("soccerapp.uploaders.get_match_score", return_value=[]):
+            update_league_scores_and_settle("La Liga")
+        TaskRun.objects.create(task_name="update_teams_rankings", status="Succeeded", started_at=timezone.now() - timedelta(days=8))
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/soccerapp/task_runs/summary").status_code, 403)
+
+        admin = User.objects.create_user("telemetry_admin", "admin@gmail.com", "password", is_staff=True)
+        self.client.force_authenticate(admin)
+        summary = self.client.get("/soccerapp/task_runs/summary").json()
+        # the run older than a week isn't summarized
+        self.assertEqual(list(summary), ["update_league_scores_and_settle (La Liga)"])
+        league_summary = summary["update_league_scores_and_settle (La Liga)"]
+        self.assertEqual((league_summary["runs"], league_summary["failures"]), (2, 0))
+        self.assertEqual(league_summary["counters"]["bets_settled"], 2)
+        self.assertEqual(set(league_summary["avg_stages"]), {"update_scores", "delete_empty_bet_infos", "settle_bets"})
+
+        self.assertEqual(self.client.get("/soccerapp/task_runs/summary?days=abc").status_code, 400)
+        self.assertEqual(len(self.client.get("/soccerapp/task_runs/summary?days=30").json()), 2)
+
+
+class TracingTests(TestCase):
+    """ Tests of the spans of the tasks and the requests, written to the JSON lines file """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.trace_dir = tempfile.TemporaryDirectory()
+        self.trace_file = os.path.join(self.trace_dir.name, "spans.jsonl")
+        get_span_logger.cache_clear()
+        self.addCleanup(get_span_logger.cache_clear)
+        self.addCleanup(self.trace_dir.cleanup)
+
+    def read_spans(self):
+        with open(get_process_path(self.trace_file)) as trace_file:
+            return {span_json["name"]: span_json for span_json in map(json.loads, trace_file)}
+
+    def test_disabled(self):
+        with override_settings(TRACING_ENABLED=False, TRACING_FILE=self.trace_file):
+            self.assertIs(span("api_football"), NOOP_SPAN)
+            self.client.get("/soccerapp/matches")
+        self.assertEqual(os.listdir(self.trace_dir.name), [])
+
+    def test_spans_of_the_settle_run(self):
+        user = User.objects.create_user("trace_user", "trace@gmail.com", "password")
+        match = Match.objects.create(
+            league="La Liga", match_id=1, date=datetime(2100, 1, 1, 12), home_team="Real Madrid", away_team="Barcelona")
+        bet_info = MoneylineBetInfo.objects.create(match=match, time_type="Full-time", bet_team="Real Madrid", odd=120)
+        UserMoneylineBet.objects.create(user=user, bet_info=bet_info, bet_amount=10)
+        match_score = {
+            "match_id": 1, "halftime": "1-0", "fulltime": "2-1", "penalty": "None-None",
+            "possession": "55%-45%", "total_shots": "12-8", "corners": "6-3", "cards": "2-1",
+        }
+        with override_settings(TRACING_ENABLED=True, TRACING_FILE=self.trace_file), \
+            patch("soccerapp.uploaders.get_match_score", return_value=[match_score]):
+            update_league_scores_and_settle("La Liga")
+
+        spans = self.read_spans()
+        root = spans["update_league_scores_and_settle"]
+        self.assertEqual(root["parentSpanId"], "")
+        self.assertIn({"key": "league", "value": {"stringValue": "La Liga"}}, root["attributes"])
+        # the chain of the parents, in the same trace
+        for child, parent in [
+            ("generic_update_match_scores", "update_match_scores"), ("update_match_scores", "update_scores"),
+            ("update_scores", "update_league_scores_and_settle"), ("settle_bet_list", "settle_match"),
+        ]:
+            self.assertEqual(spans[child]["parentSpanId"], spans[parent]["spanId"])
+            self.assertEqual(spans[child]["traceId"], root["traceId"])
+        self.assertIn({"key": "match_id", "value": {"intValue": "1"}}, spans["settle_match"]["attributes"])
+        self.assertIn({"key": "rows_updated", "value": {"intValue": "1"}}, spans["generic_update_match_scores"]["attributes"])
+        self.assertEqual(root["status"], {"code": "STATUS_CODE_OK"})
+
+    def test_span_of_the_request(self):
+        with override_settings(TRACING_ENABLED=True, TRACING_FILE=self.trace_file):
+            self.client.get("/soccerapp/teams") # without the league
+
+        request_span = self.read_spans()["GET soccerapp/teams"]
+        self.assertEqual(request_span["kind"], "SPAN_KIND_SERVER")
+        self.assertIn({"key": "status_code", "value": {"intValue": "400"}}, request_span["attributes"])
+
+    def test_error_status(self):
+        with override_settings(TRACING_ENABLED=True, TRACING_FILE=self.trace_file):
+            with self.assertRaises(ValueError), span("settle_bet_list"):
+                raise ValueError("The bet type is invalid.")
+
+        self.assertEqual(self.read_spans()["settle_bet_list"]["status"], {
+            "code": "STATUS_CODE_ERROR", "message": "ValueError: The bet type is invalid."})
+
+
+class ProfilingTests(TestCase):
+    """ Tests of the profiles of the sampled or requested requests and task runs """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.profiling_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profiling_dir.cleanup)
+
+    def read_profile_infos(self):
+        return [
+            json.load(open(os.path.join(self.profiling_dir.name, file_name)))
+            for file_name in sorted(os.listdir(self.profiling_dir.name)) if file_name.endswith(".json")
+        ]
+
+    def slow_function(self):
+        time.sleep(0.05)
+
+    def test_task_profiled_on_demand(self):
+        with override_settings(PROFILING_DIR=self.profiling_dir.name), \
+            patch("soccerapp.uploaders.get_match_score", return_value=[]):
+            update_league_scores_and_settle("La Liga")
+            self.assertEqual(self.read_profile_infos(), [])
+            # sent like the workers receive it, the arguments are checked against the signature of the task
+            celery_conf = update_league_scores_and_settle.app.conf
+            task_always_eager, celery_conf.task_always_eager = celery_conf.task_always_eager, True
+            try:
+                update_league_scores_and_settle.apply_async(("La Liga",))
+                self.assertEqual(self.read_profile_infos(), [])
+                update_league_scores_and_settle.apply_profiled(("La Liga",))
+            finally:
+                celery_conf.task_always_eager = task_always_eager
+
+        profile_info, = self.read_profile_infos()
+        self.assertEqual(profile_info["name"], "soccerapp.tasks.update_league_scores_and_settle")
+        self.assertEqual(profile_info["tags"], {"args": ["La Liga"], "kwargs": {}})
+        self.assertTrue(os.path.exists(os.path.join(self.profiling_dir.name, profile_info["profile"])))
+
+    @override_settings(PROFILING_TOKEN="secret")
+    def test_request_profiled_with_the_header(self):
+        with override_settings(PROFILING_DIR=self.profiling_dir.name):
+            self.client.get("/soccerapp/teams?league=lal", HTTP_X_PROFILE="wrong")
+            self.assertEqual(self.read_profile_infos(), [])
+            self.client.get("/soccerapp/teams?league=lal&token=secret.jwt&cursor=abc", HTTP_X_PROFILE="secret")
+
+        profile_info, = self.read_profile_infos()
+        self.assertEqual(profile_info["name"], "GET /soccerapp/teams")
+        self.assertEqual(profile_info["tags"]["route"], "soccerapp/teams")
+        # without the token and the cursor
+        self.assertEqual(profile_info["tags"]["params"], {"league": "lal"})
+
+    def test_sampled_over_the_threshold(self):
+        with override_settings(
+            PROFILING_DIR=self.profiling_dir.name, PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1,
+            PROFILING_THRESHOLD=0.02, PROFILING_INTERVAL=0.001, PROFILING_MAX_FILES=2,
+        ):
+            with profiled("fast", {}):
+                pass
+            for i in range(3):
+                with profiled(f"slow {i}", {}):
+                    self.slow_function()
+
+        # only the last 2 slow ones are kept
+        profile_infos = self.read_profile_infos()
+        self.assertEqual([profile_info["name"] for profile_info in profile_infos], ["slow 1", "slow 2"])
+        self.assertGreater(profile_infos[-1]["samples"], 0)
+        with open(os.path.join(self.profiling_dir.name, profile_infos[-1]["profile"])) as profile_file:
+            stack, count = profile_file.readline().rsplit(" ", 1)
+        self.assertIn(";slow_function (soccerapp/tests.py:", stack)
+
+    def test_cprofile_mode(self):
+        with override_settings(PROFILING_DIR=self.profiling_dir.name, PROFILING_MODE="cprofile"):
+            with profiled("slow", {}, force=True):
+                self.slow_function()
+
+        profile_info, = self.read_profile_infos()
+        stats = pstats.Stats(os.path.join(self.profiling_dir.name, profile_info["profile"]))
+        self.assertTrue(any(function_name == "slow_function" for _, _, function_name in stats.stats))
+
+
+class SlowQueryLogTests(TestCase):
+    """ Tests of the log of the slow queries, by fingerprint and call site """
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.log_dir.name, "slow_queries.jsonl")
+        get_query_logger.cache_clear()
+        self.addCleanup(get_query_logger.cache_clear)
+        self.addCleanup(self.log_dir.cleanup)
+
+    def test_normalized_without_the_values(self):
+        self.assertEqual(
+            normalize_query("SELECT * FROM t WHERE id IN (1, 2, 3) AND status = 'Not Finished' AND odd > %s"),
+            "SELECT * FROM t WHERE id IN (...) AND status = ? AND odd > ?",
+        )
+        self.assertEqual(
+            normalize_query("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)"),
+            "INSERT INTO t (a, b) VALUES (...)",
+        )
+
+    def test_slow_queries_by_fingerprint(self):
+        with override_settings(SLOW_QUERY_FILE=self.log_file, SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_EXPLAIN_RATE=1):
+            with connection.execute_wrapper(SlowQueryLogger(connection)):
+                list(Match.objects.filter(match_id__in=[1, 2]))
+                list(Match.objects.filter(match_id__in=[3, 4, 5]))
+                Team.objects.count()
+
+            slow_queries = list(read_slow_queries())
+            self.assertEqual(len(slow_queries), 3)
+            self.assertEqual(slow_queries[0]["fingerprint"], slow_queries[1]["fingerprint"])
+            self.assertNotEqual(slow_queries[0]["fingerprint"], slow_queries[2]["fingerprint"])
+            self.assertIn("in test_slow_queries_by_fingerprint", slow_queries[0]["stack"][0])
+            self.assertTrue(slow_queries[0]["stack"][0].startswith("soccerapp/tests.py:"))
+            if connection.vendor != "postgresql":
+                self.assertIsNone(slow_queries[0]["plan"])
+
+            output = StringIO()
+            call_command("slow_queries", "--top", "1", stdout=output)
+        self.assertIn(f"1. {slow_queries[0]['fingerprint']}: 2 queries", output.getvalue())
+        self.assertNotIn("2. ", output.getvalue())
+
+    def test_slow_queries_of_every_process(self):
+        with override_settings(SLOW_QUERY_FILE=self.log_file, SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_EXPLAIN_RATE=0):
+            with connection.execute_wrapper(SlowQueryLogger(connection)):
+                Team.objects.count()
+            # each process writes and rotates its own file
+            self.assertEqual(os.listdir(self.log_dir.name), [os.path.basename(get_process_path(self.log_file))])
+            with open(get_process_path(self.log_file)) as process_file:
+                logged_query = process_file.read()
+            with open(os.path.join(self.log_dir.name, "slow_queries.1.jsonl.1"), "w") as rotated_file:
+                rotated_file.write(logged_query)
+
+            self.assertEqual(len(list(read_slow_queries())), 2)
+
+    @skipUnless(connection.vendor == "postgresql", "The plans are only sampled on PostgreSQL")
+    def test_plan_sampled_inside_the_transaction(self):
+        with override_settings(SLOW_QUERY_FILE=self.log_file, SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_EXPLAIN_RATE=1):
+            with connection.execute_wrapper(SlowQueryLogger(connection)):
+                MoneylineBetInfo.objects.annotate(bet_count=Count("usermoneylinebet")).filter(bet_count=0).delete()
+                # the transaction still works after the EXPLAIN
+                Team.objects.count()
+
+            plans = [slow_query["plan"] for slow_query in read_slow_queries()]
+        self.assertIn("Plan", plans[0][0])
+
+
+class SeasonGeneratorTests(TestCase):
+    """ Tests of the synthetic seasons and bettors of the scale tests """
+
+    def get_rows(self) -> list:
+        """ The generated rows, without their ids """
+        return [
+            list(Match.objects.order_by("match_id").values_list("match_id", "date", "home_team", "fulltime_score")),
+            list(HandicapBetInfo.objects.order_by("match__match_id", "id").values_list("bet_team", "handicap_cover", "odd")),
+            list(UserTotalObjectsBet.objects.order_by("user__username", "bet_info_id").values_list(
+                "user__username", "bet_info__target_num_objects", "bet_amount", "created_date")),
+        ]
+
+    def test_same_season_for_the_same_seed(self):
+        stats = generate_season(num_leagues=1, num_teams=4, num_users=10, num_bets=500, seed=1, today=date(2025, 10, 1),
+                                season_start=date(2025, 9, 1))
+        # the double round-robin of 4 teams, on 6 weekends
+        self.assertEqual(stats.matches, 12)
+        self.assertEqual(set(Match.objects.values_list("home_team", "away_team")), {
+            (f"Premiere League Club {home}", f"Premiere League Club {away}")
+            for home in range(1, 5) for away in range(1, 5) if home != away
+        })
+        self.assertEqual(stats.finished_matches, Match.objects.filter(date__lt=datetime(2025, 10, 1)).count())
+        self.assertFalse(Match.objects.filter(status="Finished", fulltime_score__isnull=True).exists())
+        self.assertAlmostEqual(sum(stats.bets.values()), 500, delta=10)
+        # at most one bet of the bettor on each bet info
+        self.assertFalse(UserHandicapBet.objects.values("user", "bet_info").annotate(count=Count("id")).filter(count__gt=1))
+        # the quarter lines of the handicap
+        self.assertTrue(HandicapBetInfo.objects.filter(handicap_cover=Decimal("-0.75")).exists())
+
+        rows = self.get_rows()
+        delete_generated_season()
+        self.assertFalse(Match.objects.exists())
+        generate_season(num_leagues=1, num_teams=4, num_users=10, num_bets=500, seed=1, today=date(2025, 10, 1),
+                        season_start=date(2025, 9, 1))
+        self.assertEqual(self.get_rows(), rows)
+
+    def test_activity_follows_a_power_law(self):
+        counts = sorted(get_activity_counts(random.Random(0), 1000, 100_000, alpha=1.1), reverse=True)
+        self.assertEqual(sum(counts), 100_000)
+        # the most active tenth of the bettors place most of the bets
+        self.assertGreater(sum(counts[:100]), sum(counts[100:]))
+
+
+class BenchmarkTests(TestCase):
+    """ Tests of the measures of the benchmarks and of their comparison with a baseline """
+
+    def test_measure(self):
+        measures, count = measure(lambda: Match.objects.count() + Team.objects.count(), 10)
+        self.assertEqual(count, 0)
+        self.assertEqual((measures["items"], measures["queries"]), (10, 2))
+        self.assertGreater(measures["peak_rss_mb"], 0)
+        self.assertIsNone(measures["spread"])
+
+    def test_measure_repeated_runs(self):
+        calls = []
+        measures, count = measure(
+            lambda: calls.append("run") or Team.objects.count(), 10, repeat=3, warmup=2,
+            reset=lambda: calls.append("reset"),
+        )
+        # the data is reset after every run, the warm-up ones too
+        self.assertEqual(calls, ["run", "reset"] * 5)
+        self.assertEqual((count, measures["runs"], measures["queries"]), (0, 3, 1))
+        self.assertLessEqual(measures["best_seconds"], measures["seconds"])
+        self.assertIsNotNone(measures["spread"])
+
+    def test_regressions_against_the_baseline(self):
+        baseline = [
+            {"engine": "settle_bets", "bets": 1000, "throughput": 1000.0, "queries": 10, "peak_rss_mb": 100.0},
+            {"engine": "settle_bet_list", "bets": 1000, "throughput": 1000.0, "queries": 10, "peak_rss_mb": 100.0},
+        ]
+        results = [
+            # within the threshold
+            {"engine": "settle_bets", "bets": 1000, "throughput": 950.0, "queries": 10, "peak_rss_mb": 105.0},
+            {"engine": "settle_bet_list", "bets": 1000, "throughput": 800.0, "queries": 11, "peak_rss_mb": 100.0},
+            # not in the baseline
+            {"engine": "settle_bets", "bets": 10000, "throughput": 1.0, "queries": 1000, "peak_rss_mb": 500.0},
+        ]
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            path = os.path.join(baseline_dir, "baseline.json")
+            save_baseline(path, "bench_settle", baseline, {"seed": 0})
+            lines, regressions = compare_results(load_baseline(path)["results"], results, ["engine", "bets"], 0.1)
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(regressions, [
+            "settle_bet_list 1000: throughput 1000.0 -> 800.0/s", "settle_bet_list 1000: queries 10 -> 11",
+        ])
+
+    def test_unstable_throughput_not_gated(self):
+        baseline = [{"engine": "settle_bets", "bets": 1000, "throughput": 1000.0, "spread": 0.05, "queries": 10,
+                     "peak_rss_mb": 100.0}]
+        results = [{"engine": "settle_bets", "bets": 1000, "throughput": 650.0, "spread": 0.6, "queries": 10,
+                    "peak_rss_mb": 100.0}]
+        lines, regressions = compare_results(baseline, results, ["engine", "bets"], 0.1)
+        self.assertEqual(regressions, [])
+        self.assertIn("throughput -35.0% (unstable, not gated)", lines[0])
+
+        results[0]["spread"] = 0.1
+        _, regressions = compare_results(baseline, results, ["engine", "bets"], 0.1)
+        self.assertEqual(regressions, ["settle_bets 1000: throughput 1000.0 -> 650.0/s"])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class PipelineBenchmarkTests(TestCase):
+    """ Tests of the replay of the recorded responses of API-Football, and of the benchmark of the pipeline """
+
+    def test_recording_key_without_dates(self):
+        self.assertEqual(
+            get_recording_key("fixtures?league=140&season=2025&from=2025-05-05&to=2025-05-08"),
+            "fixtures?league=140&season=2025",
+        )
+        self.assertEqual(
+            get_recording_key("fixtures?status=FT-AET-PEN&league=140&date=2025-05-05&season=2025"),
+            get_recording_key("fixtures?league=140&season=2025&status=FT-AET-PEN&date=2025-06-01"),
+        )
+
+    def test_record_then_replay_the_pipeline(self):
+        with tempfile.TemporaryDirectory() as bench_dir:
+            recording, baseline = os.path.join(bench_dir, "recording.json"), os.path.join(bench_dir, "pipeline.json")
+            call_command("bench_pipeline", recording, record="fake", users=10, stdout=StringIO())
+            call_command("bench_pipeline", recording, latency=0, users=10, save=baseline, stdout=StringIO())
+
+            transport = ReplayTransport(recording, latency=0)
+            results = {result["stage"]: result for result in load_baseline(baseline)["results"]}
+            with self.assertRaises(ValueError):
+                transport("odds?fixture=1&bookmaker=1&bet=1")
+
+        self.assertEqual(transport.source, "fake")
+        self.assertEqual(list(results), [
+            "upload_matches", "upload_match_bets", "place_bets", "update_match_scores",
+            "delete_empty_bet_infos", "settle_bets", "delete_past_betinfos_and_matches",
+        ])
+        self.assertEqual(results["upload_matches"]["requests"], 1)
+        self.assertEqual(results["place_bets"]["counters"]["rows_inserted"], 10 + 10 * 10)
+        self.assertGreater(results["settle_bets"]["counters"]["bets_settled"], 0)
+        self.assertGreater(results["delete_past_betinfos_and_matches"]["counters"]["rows_archived"], 0)
+        # the pipeline is rolled back
+        self.assertFalse(Match.objects.exists())
+        self.assertFalse(User.objects.filter(username__contains="pipeline").exists())
+
+
+class LoadTestTests(TestCase):
+    """ Tests of the scenarios of the load test and of the comparison of their results """
+
+    def get_load_user(self) -> LoadUser:
+        return LoadUser(
+            1, "token", {"moneyline": [1, 2], "handicap": [3], "total_objects": [4]},
+            {"moneyline": [(10, 5)], "handicap": [(11, 6)], "total_objects": [(12, 7)]},
+        )
+
+    def test_withdrawn_bets_not_reused(self):
+        scenarios = BettingScenarios([self.get_load_user()], [100, 101], ["lal"], {"withdraw_bet": 1})
+        names = [scenarios.next_request(0).name for _ in range(8)]
+
+        # each bet is withdrawn once, then the user browses the matches
+        self.assertEqual(sorted(name for name in names if name.startswith("DELETE")), [
+            "DELETE handicap_bets/<pk>", "DELETE moneyline_bets/<pk>", "DELETE total_bets/<pk>",
+        ])
+        self.assertEqual(names.count("GET bets"), 3)
+        self.assertEqual(names[6:], ["GET matches", "GET matches/<match_id>"])
+
+    def test_bet_slip_of_every_market(self):
+        user = self.get_load_user()
+        scenarios = BettingScenarios([user], [100], ["lal"], {"place_slip": 1})
+        load_request = scenarios.next_request(0)
+
+        self.assertEqual((load_request.method, load_request.path), ("POST", "/soccerapp/bet_slip"))
+        self.assertEqual(
+            {market: [bet["bet_info"]["id"] for bet in bets] for market, bets in json.loads(load_request.body).items()},
+            {"moneyline": [2], "handicap": [3], "total_objects": [4]},
+        )
+        self.assertEqual(user.headers["Authorization"], "Bearer token")
+        # the bet infos are used, so the next slip is only browsing
+        self.assertEqual(scenarios.next_request(0).name, "GET matches")
+
+    def test_regressions_against_the_previous_results(self):
+        previous = {
+            "GET matches": {"requests_per_second": 100.0, "p99_ms": 50.0, "error_rate": 0.0},
+            "POST bet_slip": {"requests_per_second": 10.0, "p99_ms": 100.0, "error_rate": 0.0},
+        }
+        summaries = {
+            "GET matches": {"requests_per_second": 95.0, "p99_ms": 80.0, "error_rate": 0.0},
+            "POST bet_slip": {"requests_per_second": 5.0, "p99_ms": 100.0, "error_rate": 0.01},
+            "DELETE total_bets/<pk>": {"requests_per_second": 1.0, "p99_ms": 10.0, "error_rate": 0.0},
+        }
+        lines, regressions = compare_summaries(previous, summaries, 0.2)
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(regressions, [
+            "GET matches: p99 50.0 -> 80.0 ms",
+            "POST bet_slip: throughput 10.0 -> 5.0 req/s",
+            "POST bet_slip: error rate 0.00% -> 1.00%",
+        ])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class LoadTestServerTests(LiveServerTestCase):
+    """ Test of the load test against the live server """
+
+    def test_load_test(self):
+        seed_dataset(leagues=["La Liga"], matches_per_league=30, num_users=0)
+        with tempfile.TemporaryDirectory() as results_dir:
+            path = os.path.join(results_dir, "load_test.json")
+            call_command(
+                "load_test", base_url=self.live_server_url, users=1, duration=2, save=path, stdout=StringIO())
+            results = {result["endpoint"]: result for result in load_baseline(path)["results"]}
+
+        self.assertEqual(results["login"]["requests"], 1)
+        self.assertGreater(results["total"]["requests"], 10)
+        self.assertEqual(results["total"]["errors"], 0)
+        self.assertIn("GET matches", results)
+        # the users of the load test are deleted with their bets
+        self.assertFalse(User.objects.filter(username__startswith="loadtest").exists())
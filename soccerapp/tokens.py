@@ -0,0 +1,113 @@
+"""
+REFRESH TOKENS WITH THE IN-MEMORY BLACKLIST CHECK
+
+Every refresh (and logout) checks that the refresh token isn't blacklisted. Each process keeps the ids (jti)
+of the blacklisted tokens that haven't expired in memory, and loads the ones blacklisted since its last load
+(by the id of the blacklist rows) at most every ```TOKEN_BLACKLIST_REFRESH_INTERVAL``` seconds, so the refreshes
+in between don't query the blacklist. Blacklisting the token through ```blacklist()``` (the logout)
+adds it to the filter of its process right away, the other processes (and the tokens blacklisted in the admin)
+catch up at their next load.
+
+The expired tokens are pruned from the tables every day by the task ```prune_expired_jwt_tokens```.
+"""
+
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Dict
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+
+class BlacklistFilter:
+    """ The blacklisted tokens (jti mapped to the expiry) that haven't expired, loaded incrementally """
+    lookback_rows = 1000
+    """ The rows before the last one loaded are loaded again, in case their transaction committed later """
+
+    def __init__(self) -> None:
+        self.expiries: Dict[str, datetime] = {}
+        self.last_id = 0 # the id of the last blacklist row loaded
+        self.loaded_at = None
+        self.lock = Lock()
+
+    def load(self) -> None:
+        """ Load the tokens blacklisted since the last load, and forget the expired ones """
+        now = aware_utcnow()
+        new_rows = BlacklistedToken.objects.filter(
+            id__gt=self.last_id - self.lookback_rows, token__expires_at__gt=now
+        ).order_by("id").values_list("id", "token__jti", "token__expires_at")
+
+        for row_id, jti, expires_at in new_rows:
+            self.expiries[jti] = expires_at
+            self.last_id = max(self.last_id, row_id)
+        self.expiries = {jti: expires_at for jti, expires_at in self.expiries.items() if expires_at > now}
+        self.loaded_at = time.monotonic()
+
+    def add(self, jti: str, expires_at: datetime) -> None:
+        with self.lock:
+            self.expiries[jti] = expires_at
+
+    def is_blacklisted(self, jti: str) -> bool:
+        with self.lock:
+            refresh_interval = getattr(settings, "TOKEN_BLACKLIST_REFRESH_INTERVAL", 30)
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= refresh_interval:
+                self.load()
+            return jti in self.expiries
+
+    def clear(self) -> None:
+        with self.lock:
+            self.expiries, self.last_id, self.loaded_at = {}, 0, None
+
+
+blacklist_filter = BlacklistFilter()
+""" The blacklist filter of this process """
+
+
+class RefreshToken(BaseRefreshToken):
+    """ Refresh token checked against the blacklist filter of the process """
+
+    def check_blacklist(self) -> None:
+        if blacklist_filter.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted_token = super().blacklist()
+        jti, expires_at = self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload["exp"])
+        transaction.on_commit(lambda: blacklist_filter.add(jti, expires_at))
+        return blacklisted_token
+
+
+class RefreshSerializer(TokenRefreshSerializer):
+    """ Serializer of the refresh (login/refresh) """
+    token_class = RefreshToken
+
+
+class LogoutSerializer(TokenBlacklistSerializer):
+    """ Serializer of the logout """
+    token_class = RefreshToken
+
+
+def prune_expired_tokens(batch_size: int=1000) -> int:
+    """
+    Delete the expired outstanding tokens and their blacklist rows, one batch at a time
+    so the tables aren't locked for long. Return the number of deleted tokens
+    """
+    num_deleted_tokens = 0
+    while True:
+        expired_token_ids = list(OutstandingToken.objects.filter(
+            expires_at__lte=aware_utcnow()
+        ).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not expired_token_ids:
+            return num_deleted_tokens
+
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=expired_token_ids).delete()
+            OutstandingToken.objects.filter(id__in=expired_token_ids).delete()
+        num_deleted_tokens += len(expired_token_ids)
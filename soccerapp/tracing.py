@@ -0,0 +1,159 @@
+"""
+TRACING SPANS OF THE REQUESTS AND THE TASKS
+
+The spans of the requests (see soccerapp/middleware.py), the task runs and their stages (see soccerapp/telemetry.py),
+the uploaders, the settlement and the API-Football calls are nested through the context: the span opened inside
+another span is its child, in the same trace. Example of a trace of the settlement:
+```update_league_scores_and_settle > update_scores > generic_update_match_scores > api_football```
+
+When ```TRACING_ENABLED```, each span is written on its end to the JSON lines file of the process, next to
+```TRACING_FILE``` (e.g. spans.4242.jsonl, rotated every ```TRACING_MAX_BYTES```, as the processes can't rotate
+a shared file), in the shape of the spans of OpenTelemetry (OTLP/JSON), so they can be loaded by any of its
+collectors. When disabled, the spans are a shared object that does nothing.
+"""
+
+import json
+import logging
+import os
+import secrets
+import time
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Optional
+from django.conf import settings
+
+
+class Span:
+    """ The span of an operation, with its attributes. The span is open inside its ```with``` block """
+
+    def __init__(self, name: str, kind: str="SPAN_KIND_INTERNAL", **attributes: Any) -> None:
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.parent: Optional[Span] = None
+        self.trace_id = self.span_id = ""
+        self.start_time = self.end_time = 0
+        self.error = ""
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.parent = current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.token = current_span.set(self)
+        self.start_time = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.end_time = time.time_ns()
+        current_span.reset(self.token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        export_span(self)
+
+    def to_json(self) -> Dict[str, Any]:
+        """ The span in OTLP/JSON """
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent is not None else "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": [
+                {"key": key, "value": format_attribute_value(value)} for key, value in self.attributes.items()
+            ],
+            "status": {"code": "STATUS_CODE_ERROR", "message": self.error} if self.error else {"code": "STATUS_CODE_OK"},
+            "resource": {"service.name": "soccerbet", "process.pid": os.getpid()},
+        }
+
+
+class NoopSpan:
+    """ The span when the tracing is disabled """
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+""" The open span of the current context """
+
+
+def format_attribute_value(value: Any) -> Dict[str, Any]:
+    """ The value of the attribute in OTLP/JSON, where the integers are strings """
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def span(name: str, kind: str="SPAN_KIND_INTERNAL", **attributes: Any):
+    """ The span of the operation, to open with ```with span("name", league="La Liga") as current:``` """
+    if not getattr(settings, "TRACING_ENABLED", False):
+        return NOOP_SPAN
+    return Span(name, kind, **attributes)
+
+
+def traced(func: Callable) -> Callable:
+    """ Decorator opening the span of the function, named after the function """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def set_attributes(**attributes: Any) -> None:
+    """ Set the attributes of the open span, if any. Example: ```set_attributes(rows_inserted=10)``` """
+    open_span = current_span.get()
+    if open_span is not None:
+        open_span.set_attributes(**attributes)
+
+
+def get_process_path(path: str) -> str:
+    """ The file of this process next to the given one. Example: /tmp/soccerbet_traces/spans.4242.jsonl """
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{extension}"
+
+
+@lru_cache(maxsize=None)
+def get_span_logger() -> logging.Logger:
+    """ The logger writing the spans to the rotating file of the process """
+    os.makedirs(os.path.dirname(settings.TRACING_FILE) or ".", exist_ok=True)
+    handler = RotatingFileHandler(
+        get_process_path(settings.TRACING_FILE),
+        maxBytes=getattr(settings, "TRACING_MAX_BYTES", 10 * 1024 * 1024),
+        backupCount=getattr(settings, "TRACING_BACKUP_COUNT", 5),
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    span_logger = logging.getLogger("soccerapp.tracing.spans")
+    for previous_handler in span_logger.handlers:
+        previous_handler.close()
+    span_logger.handlers = [handler]
+    span_logger.setLevel(logging.INFO)
+    span_logger.propagate = False
+    return span_logger
+
+
+# the workers forked from the process have their own file
+os.register_at_fork(after_in_child=get_span_logger.cache_clear)
+
+
+def export_span(ended_span: Span) -> None:
+    get_span_logger().info(json.dumps(ended_span.to_json(), default=str))
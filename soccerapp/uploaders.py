@@ -11,10 +11,17 @@ from .models import (
     MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo, 
     UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet
 ) 
+from .response_cache import (
+    TEAMS_SCOPE, match_scope, standings_scope, bump_data_version, bump_league_data_version
+)
+from .events import publish_match_event
+from .telemetry import stage, increment
+from .tracing import traced, span, set_attributes
 from datetime import date, timedelta
 import traceback
 from .api import get_date_str
 
+@traced
 @transaction.atomic
 def upload_teams() -> None: 
     """
@@ -38,11 +45,13 @@ def upload_teams() -> None:
                 league_teams.append(Team(league=league_name, **team))
             Team.objects.bulk_create(league_teams)
             print(f"{len(league_teams)} teams of {league_name} uploaded successfully!") 
+        bump_data_version(TEAMS_SCOPE)
     except Exception as e: 
         # print the exception in case something happened for immediate inspection
         traceback.print_exc()
 
 
+@traced
 def upload_team_rankings() -> None: 
     """ Upload (or update) data about the standings of the team """
 
@@ -55,24 +64,30 @@ def upload_team_rankings() -> None:
     }
 
     for name in list(leagues.keys()): 
-        # delete the current standings 
-        TeamRanking.objects.filter(league=name).delete()
-
-        # import the new standings 
-        api_ranks_data = get_league_standings(leagues[name])
-        league_standings = []
-        for rank in api_ranks_data: 
-            league_standings.append(TeamRanking(
-                league=name, team=Team.objects.get(name=rank["team"]), 
-                rank=rank["rank"], points=rank["points"], 
-                num_watches=rank["num_matches"], num_wins=rank["num_wins"], 
-                num_loses=rank["num_loses"], num_draws=rank["num_draws"],
-            ))
-
-        TeamRanking.objects.bulk_create(league_standings)
-        print(f"Standings of {name} uploaded or updated successfully!")
-
-
+        # each league is a stage of the run 
+        with stage(name): 
+            # delete the current standings 
+            num_deleted_rankings, _ = TeamRanking.objects.filter(league=name).delete()
+            increment("rows_deleted", num_deleted_rankings)
+
+            # import the new standings 
+            api_ranks_data = get_league_standings(leagues[name])
+            league_standings = []
+            for rank in api_ranks_data: 
+                league_standings.append(TeamRanking(
+                    league=name, team=Team.objects.get(name=rank["team"]), 
+                    rank=rank["rank"], points=rank["points"], 
+                    num_watches=rank["num_matches"], num_wins=rank["num_wins"], 
+                    num_loses=rank["num_loses"], num_draws=rank["num_draws"],
+                ))
+
+            created_rankings = TeamRanking.objects.bulk_create(league_standings)
+            increment("rows_inserted", len(created_rankings))
+            bump_data_version(standings_scope(name))
+            print(f"Standings of {name} uploaded or updated successfully!")
+
+
+@traced
 def generic_upload_matches(
     league_name: str, league_id: int, from_date_str: str, to_date_str: str
 ) -> QuerySet[Match]: 
@@ -94,12 +109,16 @@ def generic_upload_matches(
         ))
   
     created_matches = Match.objects.bulk_create(not_started_matches, batch_size=100) 
+    increment("rows_inserted", len(created_matches))
+    set_attributes(league=league_name, rows_inserted=len(created_matches))
+    bump_league_data_version(league_name)
 
     # notify the user 
     print(f"{len(created_matches)} matches of {league_name} uploaded successfully!")
     return created_matches
 
 
+@traced
 def upload_matches(league_name: str, league_id: int) -> QuerySet[Match]: 
     """ Upload data about the matches automatically and periodically to the database. """
 
@@ -115,54 +134,64 @@ def upload_matches(league_name: str, league_id: int) -> QuerySet[Match]:
     return list(generic_upload_matches(league_name, league_id, from_date_str, to_date_str))
 
 
+@traced
 def upload_match_bets(arg_matches: QuerySet[Match]) -> None: 
     """ Upload of the bets for each match in the list of given matches in arguments """
 
     for match in arg_matches:  
-        # save the data about the moneyline bets of the match to database
-        moneyline_info_data = get_winner_bets("moneyline", match.match_id, match.home_team, match.away_team)
-        moneyline_info_list = []
-
-        for bet_info in moneyline_info_data:
-            moneyline_info_list.append(MoneylineBetInfo(
-                match=match, 
-                time_type=bet_info["time_type"], 
-                bet_object=bet_info["bet_object"], bet_team=bet_info["bet_team"], 
-                odd=bet_info["odd"]
-            )) 
+        with span("upload_bets_of_match", match_id=match.match_id): 
+            # save the data about the moneyline bets of the match to database
+            moneyline_info_data = get_winner_bets("moneyline", match.match_id, match.home_team, match.away_team)
+            moneyline_info_list = []
+
+            for bet_info in moneyline_info_data:
+                moneyline_info_list.append(MoneylineBetInfo(
+                    match=match, 
+                    time_type=bet_info["time_type"], 
+                    bet_object=bet_info["bet_object"], bet_team=bet_info["bet_team"], 
+                    odd=bet_info["odd"]
+                )) 
             
-        created_moneyline = MoneylineBetInfo.objects.bulk_create(moneyline_info_list, batch_size=100) 
-        print(f"{len(created_moneyline)} moneyline bets of match {match} uploaded successfully!") 
-
-        # save the data about the handicap bets of the match to the database
-        handicap_info_data = get_winner_bets("handicap", match.match_id, match.home_team, match.away_team)
-        handicap_info_list = []
-
-        for bet_info in handicap_info_data: 
-            handicap_info_list.append(HandicapBetInfo(
-                match=match, 
-                time_type=bet_info["time_type"], 
-                bet_object=bet_info["bet_object"],  bet_team=bet_info["bet_team"], 
-                handicap_cover=bet_info["handicap_cover"], odd=bet_info["odd"]
-            ))
-        created_handicap = HandicapBetInfo.objects.bulk_create(handicap_info_list, batch_size=100)
-        print(f"{len(created_handicap)} handicap bets of match {match} uploaded successfully!") 
+            created_moneyline = MoneylineBetInfo.objects.bulk_create(moneyline_info_list, batch_size=100) 
+            print(f"{len(created_moneyline)} moneyline bets of match {match} uploaded successfully!") 
+
+            # save the data about the handicap bets of the match to the database
+            handicap_info_data = get_winner_bets("handicap", match.match_id, match.home_team, match.away_team)
+            handicap_info_list = []
+
+            for bet_info in handicap_info_data: 
+                handicap_info_list.append(HandicapBetInfo(
+                    match=match, 
+                    time_type=bet_info["time_type"], 
+                    bet_object=bet_info["bet_object"],  bet_team=bet_info["bet_team"], 
+                    handicap_cover=bet_info["handicap_cover"], odd=bet_info["odd"]
+                ))
+            created_handicap = HandicapBetInfo.objects.bulk_create(handicap_info_list, batch_size=100)
+            print(f"{len(created_handicap)} handicap bets of match {match} uploaded successfully!") 
                    
-        # save the data about the total goals bet of the match to the database
-        total_info_data = get_total_bets(match.match_id, match.home_team, match.away_team)
-        total_info_list = [] 
-
-        for bet_info in total_info_data: 
-            total_info_list.append(TotalObjectsBetInfo(
-                match=match, 
-                time_type=bet_info["time_type"], 
-                bet_object=bet_info["bet_object"], under_or_over=bet_info["under_or_over"], 
-                target_num_objects=bet_info["num_objects"], odd=bet_info["odd"]
-            ))
-        created_total = TotalObjectsBetInfo.objects.bulk_create(total_info_list, batch_size=100)
-        print(f"{len(created_total)} total goals bets of match {match} uploaded successfully!")
-
-
+            # save the data about the total goals bet of the match to the database
+            total_info_data = get_total_bets(match.match_id, match.home_team, match.away_team)
+            total_info_list = [] 
+
+            for bet_info in total_info_data: 
+                total_info_list.append(TotalObjectsBetInfo(
+                    match=match, 
+                    time_type=bet_info["time_type"], 
+                    bet_object=bet_info["bet_object"], under_or_over=bet_info["under_or_over"], 
+                    target_num_objects=bet_info["num_objects"], odd=bet_info["odd"]
+                ))
+            created_total = TotalObjectsBetInfo.objects.bulk_create(total_info_list, batch_size=100)
+            print(f"{len(created_total)} total goals bets of match {match} uploaded successfully!")
+            increment("rows_inserted", len(created_moneyline) + len(created_handicap) + len(created_total))
+            bump_data_version(match_scope(match.match_id))
+            publish_match_event(match.match_id, "odds_updated", {
+                "moneyline": len(created_moneyline),
+                "handicap": len(created_handicap),
+                "total_objects": len(created_total),
+            })
+
+
+@traced
 def generic_update_match_scores(league_name: str, league_id: int, given_date_str: str) -> QuerySet[Match]: 
     """ Update the score of the matches on the given date """
     
@@ -203,6 +232,18 @@ def generic_update_match_scores(league_name: str, league_id: int, given_date_str
         "cards"
     ]
     num_updated_matches = Match.objects.bulk_update(matches, updated_field_list, batch_size=100)
+    increment("rows_updated", num_updated_matches)
+    set_attributes(league=league_name, rows_updated=num_updated_matches)
+    bump_league_data_version(league_name, [match.match_id for match in matches])
+    for match in matches:
+        publish_match_event(match.match_id, "match_finished", {
+            "league": match.league,
+            "home_team": match.home_team,
+            "away_team": match.away_team,
+            "halftime_score": match.halftime_score,
+            "fulltime_score": match.fulltime_score,
+            "penalty": match.penalty,
+        })
 
     # Get the updated queryset 
     updated_matches = Match.objects.filter(match_id__in=[match.match_id for match in matches])
@@ -211,6 +252,7 @@ def generic_update_match_scores(league_name: str, league_id: int, given_date_str
     return updated_matches
 
 
+@traced
 def update_match_scores(league_name: str, league_id: int) -> QuerySet[Match]: 
     """ 
     Update the matches scores of matches finished today. 
@@ -220,70 +262,82 @@ def update_match_scores(league_name: str, league_id: int) -> QuerySet[Match]:
     return generic_update_match_scores(league_name, league_id, given_date_str)
 
 
+@traced
 def delete_empty_bet_infos(matches: QuerySet[Match]) -> None: 
     """ 
     Delete the bet infos from the given queryset of matches that are without user bets 
     """
     for match in matches: 
-        # filter the queryset of bet info that has 0 corresponding user bets 
-        MoneylineBetInfo.objects.annotate(
-            bet_count=Count('usermoneylinebet')
-        ).filter(
-            match=match, bet_count=0
-        ).delete()
-
-        HandicapBetInfo.objects.annotate(
-            bet_count=Count('userhandicapbet')
-        ).filter(
-            match=match, bet_count=0
-        ).delete()
-
-        TotalObjectsBetInfo.objects.annotate(
-            bet_count=Count('usertotalobjectsbet')
-        ).filter(
-            match=match, bet_count=0
-        ).delete()
-
-        print(f"Empty bet infos of match {match} deleted successfully!")
-
-
+        with span("delete_empty_bet_infos_of_match", match_id=match.match_id): 
+            # filter the queryset of bet info that has 0 corresponding user bets 
+            num_deleted, _ = MoneylineBetInfo.objects.annotate(
+                bet_count=Count('usermoneylinebet')
+            ).filter(
+                match=match, bet_count=0
+            ).delete()
+            increment("rows_deleted", num_deleted)
+
+            num_deleted, _ = HandicapBetInfo.objects.annotate(
+                bet_count=Count('userhandicapbet')
+            ).filter(
+                match=match, bet_count=0
+            ).delete()
+            increment("rows_deleted", num_deleted)
+
+            num_deleted, _ = TotalObjectsBetInfo.objects.annotate(
+                bet_count=Count('usertotalobjectsbet')
+            ).filter(
+                match=match, bet_count=0
+            ).delete()
+            increment("rows_deleted", num_deleted)
+
+            print(f"Empty bet infos of match {match} deleted successfully!")
+            bump_data_version(match_scope(match.match_id))
+
+
+@traced
 def settle_bets(matches: QuerySet[Match]) -> None: 
     """
     Settle the bets that are associated with the matches, and update the bet infos 
     """
 
     for match in matches: 
-        # settle all the moneyline bets of the match 
-        moneyline_bet_list = UserMoneylineBet.objects.filter(bet_info__match=match)
-        total, _ = settle_bet_list("moneyline", moneyline_bet_list)
-
-        # update the status and settled date of list of bet info
-        MoneylineBetInfo.objects.filter(match=match).update(
-            status="Settled", 
-            settled_date=date.today()
-        )
-        print(f"{total} moneyline bets of match {match} settled!")
+        with span("settle_match", match_id=match.match_id): 
+            # settle all the moneyline bets of the match 
+            moneyline_bet_list = UserMoneylineBet.objects.filter(bet_info__match=match)
+            total, _ = settle_bet_list("moneyline", moneyline_bet_list)
+
+            # update the status and settled date of list of bet info
+            num_settled_infos = MoneylineBetInfo.objects.filter(match=match).update(
+                status="Settled", 
+                settled_date=date.today()
+            )
+            increment("rows_updated", num_settled_infos)
+            print(f"{total} moneyline bets of match {match} settled!")
                         
-        # settle all the handicap bets of the match 
-        handicap_bet_list = UserHandicapBet.objects.filter(bet_info__match=match)
-        total, _ = settle_bet_list("handicap", handicap_bet_list)
-
-        # update the status and settled date
-        HandicapBetInfo.objects.filter(match=match).update(
-            status="Settled", 
-            settled_date=date.today()
-        )
-        print(f"{total} handicap bets of match {match} settled!")
+            # settle all the handicap bets of the match 
+            handicap_bet_list = UserHandicapBet.objects.filter(bet_info__match=match)
+            total, _ = settle_bet_list("handicap", handicap_bet_list)
+
+            # update the status and settled date
+            num_settled_infos = HandicapBetInfo.objects.filter(match=match).update(
+                status="Settled", 
+                settled_date=date.today()
+            )
+            increment("rows_updated", num_settled_infos)
+            print(f"{total} handicap bets of match {match} settled!")
                             
-        # settle all the total goals bets of the match 
-        total_goals_bet_list = UserTotalObjectsBet.objects.filter(bet_info__match=match)
-        total, _ = settle_bet_list("total_objects", total_goals_bet_list)
+            # settle all the total goals bets of the match 
+            total_goals_bet_list = UserTotalObjectsBet.objects.filter(bet_info__match=match)
+            total, _ = settle_bet_list("total_objects", total_goals_bet_list)
         
-        # update the status and settled date 
-        TotalObjectsBetInfo.objects.filter(match=match).update(
-            status="Settled", 
-            settled_date=date.today()
-        )
-        print(f"{total} total objects bets of match {match} settled!")
+            # update the status and settled date 
+            num_settled_infos = TotalObjectsBetInfo.objects.filter(match=match).update(
+                status="Settled", 
+                settled_date=date.today()
+            )
+            increment("rows_updated", num_settled_infos)
+            print(f"{total} total objects bets of match {match} settled!")
+            bump_data_version(match_scope(match.match_id))
 
 if __name__ == "__main__": None
\ No newline at end of file
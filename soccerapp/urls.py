@@ -1,7 +1,14 @@
 from . import views
 from rest_framework_simplejwt.views import TokenRefreshView, TokenBlacklistView
+from django.conf import settings
 from django.urls import path
 
+if settings.ASYNC_READ_VIEWS: 
+    # the async versions of the public read views, for the ASGI deployment 
+    from .views import async_views as read_views
+else: 
+    read_views = views
+
 urlpatterns = [
     # endpoints for authentication 
     path('login', views.Login.as_view()),
@@ -11,24 +18,33 @@ urlpatterns = [
     path('detail', views.UserDetail.as_view()),
 
     # endpoints for teams, matches, rankings
-    path('teams', views.TeamList.as_view()), # params: 'league' to indicate the list of teams from league 
-    path('teams/<int:pk>', views.TeamDetail.as_view()),
-    path('standings', views.Standings.as_view()), # params: 'league' to indicate the list of teams from league 
-    path('matches', views.MatchList.as_view()),
-    path('matches/<int:match_id>', views.MatchDetail.as_view()),
+    path('teams', read_views.TeamList.as_view()), # params: 'league' to indicate the list of teams from league 
+    path('teams/<int:pk>', read_views.TeamDetail.as_view()),
+    path('standings', read_views.Standings.as_view()), # params: 'league' to indicate the list of teams from league 
+    path('matches', read_views.MatchList.as_view()), # params: 'status', optional 'league', 'cursor' and 'page_size'
+    path('matches/<int:match_id>', read_views.MatchDetail.as_view()),
 
     # endpoints for the bet info
-    path('match/<int:match_id>/moneyline_bet_info', views.MoneylineInfoList.as_view()),
-    path('match/<int:match_id>/handicap_bet_info', views.HandicapInfoList.as_view()),
-    path('match/<int:match_id>/total_bet_info', views.TotalObjectsInfoList.as_view()), 
+    path('match/<int:match_id>/moneyline_bet_info', read_views.MoneylineInfoList.as_view()),
+    path('match/<int:match_id>/handicap_bet_info', read_views.HandicapInfoList.as_view()),
+    path('match/<int:match_id>/total_bet_info', read_views.TotalObjectsInfoList.as_view()), 
+    path('match/<int:match_id>/markets', views.MatchMarkets.as_view()), # params: optional 'bet_object'
 
     # endpoints for the list of bets of the user 
-    path('moneyline_bets', views.UserMoneylineBetList.as_view()), 
-    path('handicap_bets', views.UserHandicapBetList.as_view()),
-    path('total_bets', views.UserTotalGoalsBetList.as_view()),
+    path('moneyline_bets', views.UserMoneylineBetList.as_view()), # params: optional 'status', 'cursor' and 'page_size'
+    path('handicap_bets', views.UserHandicapBetList.as_view()), # same params as moneyline_bets
+    path('total_bets', views.UserTotalGoalsBetList.as_view()), # same params as moneyline_bets
+    path('bet_slip', views.BetSlip.as_view()), # bets of every market type placed at once
+    path('bets', views.UserBetHistory.as_view()), # params: optional 'status', 'cursor' and 'page_size'
 
     # endpoints for the detail of bet of the user 
     path('moneyline_bets/<int:pk>', views.UserMoneylineBetDetail.as_view()),
     path('handicap_bets/<int:pk>', views.UserHandicapBetDetail.as_view()), 
     path('total_bets/<int:pk>', views.UserTotalGoalsBetDetail.as_view()),
+
+    # stream of the real-time events (server-sent events) of the matches and the bets of the user
+    path('events', views.EventStream.as_view()), # params: optional 'match' (ids separated by commas) and 'token'
+
+    # summary of the runs of the celery tasks, for the admins 
+    path('task_runs/summary', views.TaskRunSummary.as_view()), # params: optional 'days' (7 by default)
 ]
\ No newline at end of file
@@ -1,2 +1,4 @@
 from .main_views import *
-from .bet_views import *
\ No newline at end of file
+from .bet_views import *
+from .event_views import *
+from .metrics_views import *
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+ASYNC VERSIONS OF THE PUBLIC READ VIEWS, FOR THE ASGI DEPLOYMENT (uvicorn workers)
+
+They are routed instead of the sync views when the setting ASYNC_READ_VIEWS is on (see soccerapp/urls.py),
+and serve the same JSON (and the same cached responses) with Django's async ORM, so a slow query only holds
+its own request instead of a whole worker. The other views (the writes) stay sync, Django runs them
+through ```sync_to_async``` under ASGI.
+"""
+
+from typing import Any, Callable, List
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework.validators import ValidationError
+from soccerapp.models import Match, Team, TeamRanking, MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo
+from soccerapp.pagination import MatchPagination
+from soccerapp.renderers import ORJSONRenderer
+from soccerapp.response_cache import (
+    aget_data_versions, aget_cached_data, aset_cached_data,
+    get_response_key, get_etag, get_last_modified, set_cache_headers,
+)
+from soccerapp.serializers import (
+    MatchSerializer, TeamSerializer,
+    MatchReadSerializer, TeamRankingReadSerializer,
+    MoneylineBetInfoReadSerializer, HandicapBetInfoReadSerializer, TotalObjectsBetInfoReadSerializer,
+)
+from .main_views import (
+    LEAGUES_MAP, TYPE_MAP,
+    HandicapInfoList as HandicapInfoListView, TotalObjectsInfoList as TotalObjectsInfoListView,
+    get_league_scopes, get_standings_scopes, get_teams_scopes, get_match_scopes,
+)
+
+
+class AsyncReadView(View):
+    """
+    Base async read view. The subclasses return the data of the response with ```get_data()```,
+    and its data scopes with ```get_scopes```, for the response cache and the conditional requests
+    """
+    http_method_names = ["get", "head", "options"]
+    get_scopes: Callable[..., List[str]] = staticmethod(lambda request, **kwargs: [])
+    renderer = ORJSONRenderer()
+
+    def render(self, data: Any, status: int=200) -> HttpResponse:
+        return HttpResponse(self.renderer.render(data), content_type="application/json", status=status)
+
+    async def get_data(self, request, **kwargs) -> Any:
+        raise NotImplementedError
+
+    async def get(self, request, **kwargs) -> HttpResponse:
+        versions = await aget_data_versions(self.get_scopes(request, **kwargs))
+        key = get_response_key(request, versions)
+        etag = get_etag(request, key)
+        last_modified = get_last_modified(versions)
+
+        # The client already has this version of the data
+        not_modified_response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified_response is not None:
+            set_cache_headers(not_modified_response, etag, last_modified)
+            return not_modified_response
+
+        data = await aget_cached_data(key)
+        if data is None:
+            # The errors have the same JSON as the ones of DRF
+            try:
+                data = await self.get_data(request, **kwargs)
+            except ValidationError as exc:
+                return self.render(exc.detail, status=400)
+            except Http404 as exc:
+                return self.render({"detail": str(exc)}, status=404)
+            await aset_cached_data(key, data)
+
+        response = self.render(data)
+        set_cache_headers(response, etag, last_modified)
+        return response
+
+
+class TeamList(AsyncReadView):
+    """ Async view to list all of the team according to the league """
+    get_scopes = staticmethod(get_teams_scopes)
+
+    async def get_data(self, request, **kwargs) -> Any:
+        league = request.GET.get("league")
+        if league is None:
+            raise ValidationError({ "error": "League not specified" })
+
+        team_list = [team async for team in Team.objects.filter(league=LEAGUES_MAP[league])]
+        return TeamSerializer(team_list, many=True).data
+
+
+class TeamDetail(AsyncReadView):
+    """ Async view of the team """
+    get_scopes = staticmethod(get_teams_scopes)
+
+    async def get_data(self, request, pk: int) -> Any:
+        team = await aget_object_or_404(Team, pk=pk)
+        return TeamSerializer(team).data
+
+
+class MatchList(AsyncReadView):
+    """ Async view to list all of the matches according to the league """
+    get_scopes = staticmethod(get_league_scopes)
+
+    async def get_data(self, request, **kwargs) -> Any:
+        STATUS_MAP = {
+            "NF": "Not Finished",
+            "FN": "Finished"
+        }
+        league = request.GET.get("league")
+        status = request.GET.get("status")
+
+        if status is None:
+            raise ValidationError({ "error": "Status is not defined" })
+
+        if league is None:
+            match_list = Match.objects.filter(status=STATUS_MAP[status])
+        else:
+            match_list = Match.objects.filter(league=LEAGUES_MAP[league], status=STATUS_MAP[status])
+
+        # Only one page of the matches when the client asks for it
+        paginator = MatchPagination()
+        match_rows = await paginator.apaginate_queryset(MatchReadSerializer.get_rows(match_list), request, view=self)
+        if match_rows is not None:
+            return {"next": paginator.get_next_link(), "results": MatchReadSerializer(match_rows).data}
+        return await MatchReadSerializer(match_list).adata()
+
+
+class MatchDetail(AsyncReadView):
+    """ Async view of the match with the given match id """
+    get_scopes = staticmethod(get_match_scopes)
+
+    async def get_data(self, request, match_id: int) -> Any:
+        match = await aget_object_or_404(Match, match_id=match_id)
+        return MatchSerializer(match).data
+
+
+class Standings(AsyncReadView):
+    """ Async view of the rankings of the league """
+    get_scopes = staticmethod(get_standings_scopes)
+
+    async def get_data(self, request, **kwargs) -> Any:
+        league_name = request.GET.get("league")
+        if not league_name:
+            raise ValidationError({"error": "League not specified"})
+
+        standings = TeamRanking.objects.filter(league=LEAGUES_MAP[league_name])
+        return await TeamRankingReadSerializer(standings).adata()
+
+
+class BetInfoList(AsyncReadView):
+    """
+    Base async view to list the bet info of the match for halftime and fulltime.
+    The subclasses give the bet info class, its read serializer, and how the bet info are grouped
+    """
+    get_scopes = staticmethod(get_match_scopes)
+    info_class = None
+    serializer_class = None
+
+    def group_info_list(self, info_list: List[dict], match: Match) -> List[Any]:
+        return info_list
+
+    async def get_data(self, request, match_id: int) -> Any:
+        bet_object = request.GET.get("bet_object")
+        if bet_object is None:
+            raise ValidationError({"error": "Bet object is not defined"})
+
+        match = await aget_object_or_404(Match, match_id=match_id)
+        response_data = {
+            "half_time": None,
+            "full_time": None
+        }
+        for time_type in list(response_data.keys()):
+            info_list = self.info_class.objects.filter(
+                match=match, bet_object=bet_object, time_type=TYPE_MAP[time_type])
+            info_list_data = await self.serializer_class(info_list).adata()
+            response_data[time_type] = self.group_info_list(info_list_data, match)
+        return response_data
+
+
+class MoneylineInfoList(BetInfoList):
+    """ Async view to list all of the moneyline bet info of the match """
+    info_class = MoneylineBetInfo
+    serializer_class = MoneylineBetInfoReadSerializer
+
+
+class HandicapInfoList(BetInfoList):
+    """ Async view to list all of the handicap bet info of the match """
+    info_class = HandicapBetInfo
+    serializer_class = HandicapBetInfoReadSerializer
+
+    def group_info_list(self, info_list: List[dict], match: Match) -> List[Any]:
+        return HandicapInfoListView.group_handicap_info(info_list, match.home_team)
+
+
+class TotalObjectsInfoList(BetInfoList):
+    """ Async view to list all of the total objects bet info of the match """
+    info_class = TotalObjectsBetInfo
+    serializer_class = TotalObjectsBetInfoReadSerializer
+
+    def group_info_list(self, info_list: List[dict], match: Match) -> List[Any]:
+        return TotalObjectsInfoListView.group_total_objects_info(info_list)
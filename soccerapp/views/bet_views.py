@@ -10,14 +10,19 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.validators import ValidationError
 from soccerapp.models import UserMoneylineBet, UserHandicapBet, UserTotalObjectsBet
 from soccerapp.serializers import (
     UserSerializer, 
     UserMoneylineBetSerializer, 
     UserHandicapBetSerializer, 
-    UserTotalObjectsBetSerializer
+    UserTotalObjectsBetSerializer,
+    BetSlipSerializer,
+    BetHistoryReadSerializer,
 )
 from soccerapp.serializers import CustomValidator
+from soccerapp.pagination import UserBetPagination, BetHistoryPagination
+from soccerapp.bet_history import get_bet_history_querysets, get_bet_summary
 from decimal import Decimal
 
 bet_validator = CustomValidator() 
@@ -41,9 +46,18 @@ class UserMoneylineBetList(APIView):
         status = request.query_params.get("status")
         # get the response data and return 
         if status: 
-            bet_list = UserMoneylineBet.objects.filter(user=request.user, bet_info__status=status)
+            bet_list = UserMoneylineBet.objects.filter(user_id=request.user.id, bet_info__status=status)
         else: 
-            bet_list = UserMoneylineBet.objects.filter(user=request.user)
+            bet_list = UserMoneylineBet.objects.filter(user_id=request.user.id)
+        # the serializer shows the user, the bet info, and its match of each bet 
+        bet_list = bet_list.select_related("user", "bet_info__match")
+
+        # only one page of the bets when the client asks for it 
+        paginator = UserBetPagination()
+        bet_page = paginator.paginate_queryset(bet_list, request, view=self)
+        if bet_page is not None: 
+            return paginator.get_paginated_response(UserMoneylineBetSerializer(bet_page, many=True).data)
+
         bet_list_serializer = UserMoneylineBetSerializer(bet_list, many=True)
         return Response(bet_list_serializer.data)
     
@@ -52,7 +66,8 @@ class UserMoneylineBetList(APIView):
         # Add the user field to request data
         for data in request_data: data['user'] = request.user.id
 
-        new_list_serializer = UserMoneylineBetSerializer(data=request_data, many=True)
+        new_list_serializer = UserMoneylineBetSerializer(
+            data=request_data, many=True, context={"request": request})
         new_list_serializer.is_valid(raise_exception=True)
         # Maintain the integrity of the data
         with transaction.atomic():
@@ -68,17 +83,75 @@ class UserMoneylineBetList(APIView):
         return Response(bet_list_serializer.data, status=status.HTTP_201_CREATED)
 
 
+class BetSlip(APIView): 
+    """ 
+    View to place the bets of every market type (moneyline, handicap, total objects) at once, 
+    with one transaction and one update of the balance of the user 
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None) -> Response: 
+        request_data = request.data
+        if not isinstance(request_data, dict): 
+            raise ValidationError({
+                "error": "The bet slip is not valid", 
+                "detail": "The bet slip must map each market to its list of bets",
+            })
+        # Add the user field to the bets of each market (the serializer rejects the other values) 
+        for market in BetSlipSerializer.MARKETS: 
+            market_data = request_data.get(market, [])
+            for data in market_data if isinstance(market_data, list) else []: 
+                if isinstance(data, dict): data['user'] = request.user.id
+
+        bet_slip_serializer = BetSlipSerializer(data=request_data, context={"request": request})
+        bet_slip_serializer.is_valid(raise_exception=True)
+        # Maintain the integrity of the data 
+        with transaction.atomic(): 
+            new_bet_lists, total_bet_amount = bet_slip_serializer.save()
+
+            # Adjust the balance of the user once for the whole slip 
+            bet_owner = request.user
+            bet_owner.balance -= total_bet_amount
+            bet_owner.save()
+
+        return Response({
+            "moneyline": UserMoneylineBetSerializer(new_bet_lists["moneyline"], many=True).data, 
+            "handicap": UserHandicapBetSerializer(new_bet_lists["handicap"], many=True).data, 
+            "total_objects": UserTotalObjectsBetSerializer(new_bet_lists["total_objects"], many=True).data, 
+        }, status=status.HTTP_201_CREATED)
+
+
+class UserBetHistory(APIView): 
+    """ 
+    View to list the bets of every market type of the user, from the latest, one page at a time, 
+    with the summary of all of them (open stake, settled profit, win rate by bet type and league) 
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None) -> Response: 
+        # one query for the page of the bets of the 3 tables 
+        paginator = BetHistoryPagination()
+        bet_querysets = get_bet_history_querysets(request.user.id, request.query_params.get("status"))
+        bet_page = paginator.paginate_union(bet_querysets, request, view=self)
+
+        return Response({
+            "next": paginator.get_next_link(), 
+            "results": BetHistoryReadSerializer(bet_page).data, 
+            "summary": get_bet_summary(request.user.id), 
+        })
+
+
 class UserMoneylineBetDetail(APIView): 
     """ View to handle the detail of the moneyline bets with given private key """
     permission_classes = [AllowAny]
 
     def get(self, request, pk: int, format=None) -> Response: 
-        moneyline_bet = get_object_or_404(UserMoneylineBet, pk=pk)
+        moneyline_bet = get_object_or_404(UserMoneylineBet.objects.select_related("user", "bet_info__match"), pk=pk)
         bet_serializer = UserMoneylineBetSerializer(moneyline_bet)
         return Response(bet_serializer.data)
     
     def put(self, request, pk: int, format=None) -> Response: 
-        moneyline_bet = get_object_or_404(UserMoneylineBet, pk=pk)
+        moneyline_bet = get_object_or_404(UserMoneylineBet.objects.select_related("user", "bet_info__match"), pk=pk)
         updated_bet_serializer = UserMoneylineBetSerializer(
             moneyline_bet, data=request.data
         )
@@ -99,7 +172,7 @@ class UserMoneylineBetDetail(APIView):
         return Response(updated_bet_serializer.data, status=status.HTTP_202_ACCEPTED)
     
     def delete(self, request, pk: int, format=None) -> Response: 
-        queried_moneyline_bet = get_object_or_404(UserMoneylineBet, pk=pk)
+        queried_moneyline_bet = get_object_or_404(UserMoneylineBet.objects.select_related("user", "bet_info__match"), pk=pk)
         # validate if the instance (bet) is elligible for withdrawing
         bet_validator.validate_delete(queried_moneyline_bet)
 
@@ -124,6 +197,8 @@ class UserBetList(generics.ListCreateAPIView):
 
     queryset = None
     serializer_class = None
+    # the list is only paginated when the params have the cursor or the page size 
+    pagination_class = UserBetPagination
 
     def perform_create(self, serializer):
         """ Override ```perform_create()``` method to adjust the balance of the user  """
@@ -164,11 +239,11 @@ class UserHandicapBetList(UserBetList):
     def get_queryset(self): 
         status = self.request.query_params.get('status')
         if not status: 
-            handicap_bet_list = UserHandicapBet.objects.filter(user=self.request.user)
+            handicap_bet_list = UserHandicapBet.objects.filter(user_id=self.request.user.id)
         else:
             handicap_bet_list = UserHandicapBet.objects.filter(
-                user=self.request.user, bet_info__status=status)
-        return handicap_bet_list
+                user_id=self.request.user.id, bet_info__status=status)
+        return handicap_bet_list.select_related("user", "bet_info__match")
     
 
 class UserTotalGoalsBetList(UserBetList): 
@@ -180,12 +255,12 @@ class UserTotalGoalsBetList(UserBetList):
         """ Get the queryset (list of the user's total goals bets) """
         status = self.request.query_params.get("status")
         if not status:  
-            total_bet_list = UserTotalObjectsBet.objects.filter(user=self.request.user)
+            total_bet_list = UserTotalObjectsBet.objects.filter(user_id=self.request.user.id)
         else: 
             total_bet_list = UserTotalObjectsBet.objects.filter(
-                user=self.request.user, bet_info__status=status
+                user_id=self.request.user.id, bet_info__status=status
             )
-        return total_bet_list
+        return total_bet_list.select_related("user", "bet_info__match")
     
 
 class UserBetDetail(generics.RetrieveUpdateDestroyAPIView): 
@@ -226,12 +301,12 @@ class UserBetDetail(generics.RetrieveUpdateDestroyAPIView):
 class UserHandicapBetDetail(UserBetDetail): 
     """ Handling the detail of the handicap bet """
     permission_classes = [IsAuthenticated]
-    queryset = UserHandicapBet.objects.all() 
+    queryset = UserHandicapBet.objects.select_related("user", "bet_info__match")
     serializer_class = UserHandicapBetSerializer # the serializer 
     
 
 class UserTotalGoalsBetDetail(UserBetDetail): 
     """ Handling the detailf of the total goals bet """
     permission_classes = [IsAuthenticated]
-    queryset = UserTotalObjectsBet.objects.all()
+    queryset = UserTotalObjectsBet.objects.select_related("user", "bet_info__match")
     serializer_class = UserTotalObjectsBetSerializer
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+VIEW OF THE STREAM OF REAL-TIME EVENTS (SERVER-SENT EVENTS)
+NOTE:
+THE STREAM STAYS OPEN, SO IT'S ONLY MEANT FOR THE ASGI DEPLOYMENT (uvicorn workers),
+    WHERE AN IDLE CLIENT ONLY COSTS ITS SUBSCRIPTION
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, List, Optional
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from soccerapp.events import ALL_MATCHES_CHANNEL, Subscription, broker, get_event_backend, match_channel, user_channel
+from soccerapp.models import User
+
+
+class EventStream(View):
+    """
+    View to stream the events of the matches (all of them, or the ones of the 'match' param),
+    and the events of the bets of the user of the 'token' param (the access token, as the browsers
+    can't set the headers of an EventSource). The stream of the token ends when the token expires
+    """
+    http_method_names = ["get"]
+
+    def get_token(self, request) -> Optional[AccessToken]:
+        """ The access token of the params, the invalid or expired one is a ValueError """
+        token = request.GET.get("token")
+        if not token:
+            return None
+        try:
+            access_token = AccessToken(token)
+            access_token[jwt_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            raise ValueError("The token is invalid or expired.")
+        return access_token
+
+    def get_channels(self, request, access_token: Optional[AccessToken]) -> List[str]:
+        """ The channels of the params, the invalid match ids are a ValueError """
+
+        match_ids = request.GET.get("match")
+        if match_ids:
+            channels = [match_channel(int(match_id)) for match_id in match_ids.split(",")]
+        else:
+            channels = [ALL_MATCHES_CHANNEL]
+
+        if access_token is not None:
+            channels.append(user_channel(access_token[jwt_settings.USER_ID_CLAIM]))
+        return channels
+
+    async def is_user_active(self, access_token: AccessToken) -> bool:
+        """ If the user of the token still exists and is active, like the authentication of the other views """
+        return await User.objects.filter(
+            **{jwt_settings.USER_ID_FIELD: access_token[jwt_settings.USER_ID_CLAIM]}, is_active=True
+        ).aexists()
+
+    async def stream(self, subscription: Subscription, expires_at: Optional[float]=None) -> AsyncIterator[str]:
+        """
+        The events of the subscription, with a comment to keep the idle connection alive.
+        At the expiry of the token, the event token_expired ends the stream, the client reconnects with a new token
+        """
+        heartbeat = getattr(settings, "EVENTS_HEARTBEAT", 15)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                timeout = heartbeat
+                if expires_at is not None:
+                    if time.time() >= expires_at:
+                        yield "event: token_expired\ndata: {}\n\n"
+                        return
+                    timeout = min(heartbeat, expires_at - time.time())
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    if expires_at is None or time.time() < expires_at:
+                        yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            # the client disconnected
+            subscription.close()
+
+    async def get(self, request):
+        # under WSGI, Django collects the whole (endless) stream before sending it, blocking the worker
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({
+                "error": "Not implemented", "detail": "The event stream is only served by the ASGI workers.",
+            }, status=501)
+
+        try:
+            access_token = self.get_token(request)
+            channels = self.get_channels(request, access_token)
+        except ValueError as exc:
+            return JsonResponse({"error": "Invalid params", "detail": str(exc)}, status=400)
+
+        expires_at = None
+        if access_token is not None:
+            if not await self.is_user_active(access_token):
+                return JsonResponse({"error": "Invalid token", "detail": "The user is inactive or not found."}, status=401)
+            expires_at = access_token["exp"]
+
+        get_event_backend().start()
+        response = StreamingHttpResponse(
+            self.stream(broker.subscribe(channels), expires_at), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # don't let the proxy buffer the events
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -13,11 +13,16 @@ from rest_framework.response import Response
 from rest_framework.validators import ValidationError
 from soccerapp.models import (
     User, Match, Team, TeamRanking,
-    MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo,
+    MoneylineBetInfo, HandicapBetInfo, TotalObjectsBetInfo, BET_OBJECT_CHOICES,
 )
 from soccerapp.serializers import (
-    MyTokenObtainPairSerializer, RegisterSerializer, MatchSerializer, TeamSerializer, TeamRankingSerializer,
-    MoneylineBetInfoSerializer, HandicapBetInfoSerizalizer, TotalObjectsBetInfoSerializer,
+    MyTokenObtainPairSerializer, RegisterSerializer, MatchSerializer, TeamSerializer,
+    MatchReadSerializer, TeamRankingReadSerializer,
+    MoneylineBetInfoReadSerializer, HandicapBetInfoReadSerializer, TotalObjectsBetInfoReadSerializer,
+)
+from soccerapp.pagination import MatchPagination
+from soccerapp.response_cache import (
+    ALL_LEAGUES_SCOPE, TEAMS_SCOPE, league_scope, match_scope, standings_scope, cache_response,
 )
 
 """Mapping the value of request parameter to the value of the database"""
@@ -36,6 +41,26 @@ TYPE_MAP = {
     "full_time": "Full-time"
 }
 
+
+""" 
+The data scopes the cached responses of the views depend on (see soccerapp/response_cache.py), 
+for the DRF requests and the requests of the async views 
+"""
+def get_league_scopes(request, **kwargs) -> List[str]: 
+    league = request.GET.get("league")
+    return [league_scope(LEAGUES_MAP[league])] if league in LEAGUES_MAP else [ALL_LEAGUES_SCOPE]
+
+def get_standings_scopes(request, **kwargs) -> List[str]: 
+    league = request.GET.get("league")
+    return [standings_scope(LEAGUES_MAP.get(league, league)), TEAMS_SCOPE]
+
+def get_teams_scopes(request, **kwargs) -> List[str]: 
+    return [TEAMS_SCOPE]
+
+def get_match_scopes(request, match_id: int, **kwargs) -> List[str]: 
+    return [match_scope(match_id)]
+
+
 class Login(TokenObtainPairView): 
     """View to handle the user login"""
     permission_classes = [AllowAny]
@@ -52,7 +77,9 @@ class Register(generics.CreateAPIView):
 class TeamList(APIView): 
     """View to list all of the team according to the league"""
     permission_classes = [AllowAny]
+    authentication_classes = [] # the public data doesn't depend on the user, skip the token lookup
 
+    @cache_response(get_teams_scopes)
     def get(self, request, format=None) -> Response: 
         league = request.query_params.get("league")
         if league is None: 
@@ -66,14 +93,21 @@ class TeamList(APIView):
 
 class TeamDetail(generics.RetrieveAPIView): 
     permission_classes = [AllowAny]
+    authentication_classes = []
     queryset = Team.objects.all() 
     serializer_class = TeamSerializer
 
+    @cache_response(get_teams_scopes)
+    def get(self, request, *args, **kwargs) -> Response: 
+        return super().get(request, *args, **kwargs)
+
 
 class MatchList(APIView): 
     """View to list all of the matches according to the league"""
     permission_classes = [AllowAny]
+    authentication_classes = []
 
+    @cache_response(get_league_scopes)
     def get(self, request, format=None) -> Response: 
         STATUS_MAP = { 
             "NF": "Not Finished", 
@@ -90,28 +124,42 @@ class MatchList(APIView):
             match_list = Match.objects.filter(status=STATUS_MAP[status])
         else: 
             match_list = Match.objects.filter(league=LEAGUES_MAP[league], status=STATUS_MAP[status])
-        match_list_serializer = MatchSerializer(match_list, many=True)
+
+        # Only one page of the matches when the client asks for it 
+        paginator = MatchPagination()
+        match_rows = paginator.paginate_queryset(MatchReadSerializer.get_rows(match_list), request, view=self)
+        if match_rows is not None: 
+            return paginator.get_paginated_response(MatchReadSerializer(match_rows).data)
+
+        match_list_serializer = MatchReadSerializer(match_list)
         return Response(match_list_serializer.data)
     
 
 class MatchDetail(generics.RetrieveAPIView): 
     permission_classes = [AllowAny]
+    authentication_classes = []
     queryset = Match.objects.all()
     serializer_class = MatchSerializer
     lookup_field = "match_id"
 
+    @cache_response(get_match_scopes)
+    def get(self, request, *args, **kwargs) -> Response: 
+        return super().get(request, *args, **kwargs)
+
 
 class Standings(APIView): 
     """View to handle the rankings of the league"""
     permission_classes = [AllowAny]
+    authentication_classes = []
 
+    @cache_response(get_standings_scopes)
     def get(self, request) -> Response: 
         league_name = request.query_params.get("league")
         if not league_name: 
             raise ValidationError({"error": "League not specified"})
 
         standings = TeamRanking.objects.filter(league=LEAGUES_MAP[league_name])
-        standings_serializer = TeamRankingSerializer(standings, many=True)
+        standings_serializer = TeamRankingReadSerializer(standings)
         return Response(standings_serializer.data)
      
 
@@ -119,7 +167,9 @@ class Standings(APIView):
 class MoneylineInfoList(APIView): 
     """ View to list all of the moneyline bet info of the match with given match id """
     permission_classes = [AllowAny]
+    authentication_classes = []
 
+    @cache_response(get_match_scopes)
     def get(self, request, match_id: int, format=None) -> Response: 
         bet_object = request.query_params.get("bet_object")
         if bet_object is None: 
@@ -136,7 +186,7 @@ class MoneylineInfoList(APIView):
             # List of moneyline bet info for this time type 
             info_list = MoneylineBetInfo.objects.filter(
                 match=match, bet_object=bet_object, time_type=TYPE_MAP[time_type])
-            info_list_serializer = MoneylineBetInfoSerializer(info_list, many=True)
+            info_list_serializer = MoneylineBetInfoReadSerializer(info_list)
             response_data[time_type] = info_list_serializer.data
 
         return Response(response_data)
@@ -146,9 +196,11 @@ class HandicapInfoList(APIView):
     """ View to list all of the handicap bet info of the match  """
 
     permission_classes = [AllowAny]
+    authentication_classes = []
     
+    @staticmethod
     def group_handicap_info(
-        self, info_list: QuerySet[HandicapBetInfo], home_team: str
+        info_list: QuerySet[HandicapBetInfo], home_team: str
         ) -> List[Dict[str, Union[HandicapBetInfo, None]]]: 
         """
         Group the handicap bet info that correspond to each other together.
@@ -175,6 +227,7 @@ class HandicapInfoList(APIView):
         # Convert the dictionary to the list of values
         return list(cover_to_info_dict.values())
     
+    @cache_response(get_match_scopes)
     def get(self, request, match_id: int, format=None) -> Response: 
         bet_object = request.query_params.get("bet_object")
         if bet_object is None: 
@@ -191,9 +244,8 @@ class HandicapInfoList(APIView):
         for time_type in list(response_data.keys()): 
             # List and serialize handicap bet info for this time type
             info_list = HandicapBetInfo.objects.filter(
-                match=match, bet_object=bet_object, time_type=TYPE_MAP[time_type]
-            )
-            info_list_serializer = HandicapBetInfoSerizalizer(info_list, many=True)
+                match=match, bet_object=bet_object, time_type=TYPE_MAP[time_type])
+            info_list_serializer = HandicapBetInfoReadSerializer(info_list)
             
             response_data[time_type] = self.group_handicap_info(
                 info_list_serializer.data, match.home_team) 
@@ -203,9 +255,11 @@ class HandicapInfoList(APIView):
 class TotalObjectsInfoList(APIView):
     """ View to list all of the total goals bet info of the match  """
     permission_classes = [AllowAny]
+    authentication_classes = []
     
+    @staticmethod
     def group_total_objects_info(
-        self, info_list: QuerySet[TotalObjectsBetInfo]) -> List[Dict[str, Union[TotalObjectsBetInfo, None]]]:
+        info_list: QuerySet[TotalObjectsBetInfo]) -> List[Dict[str, Union[TotalObjectsBetInfo, None]]]:
         """
         Group the the total goals bet infos that have the same number of target goals.
         Returns the form ```[[under num_goals1, over num_goals1], [under num_goals2, over num_goals2], ...]```
@@ -228,6 +282,7 @@ class TotalObjectsInfoList(APIView):
         # Convert dictionary into the list of grouped bet info
         return list(total_to_info_dict.values())
     
+    @cache_response(get_match_scopes)
     def get(self, request, match_id: int, format=None) -> Response: 
         bet_object = request.query_params.get("bet_object")
         if bet_object is None: 
@@ -243,11 +298,55 @@ class TotalObjectsInfoList(APIView):
         for time_type in list(response_data.keys()): 
             # List of total goals bet info for this time type
             info_list = TotalObjectsBetInfo.objects.filter(
-                match=match, bet_object=bet_object, time_type=TYPE_MAP[time_type]
-            )
+                match=match, bet_object=bet_object, time_type=TYPE_MAP[time_type])
             # Serialize data of the list 
-            info_list_serializer = TotalObjectsBetInfoSerializer(info_list, many=True)
+            info_list_serializer = TotalObjectsBetInfoReadSerializer(info_list)
             response_data[time_type] = self.group_total_objects_info(
                 info_list_serializer.data)
         return Response(response_data)
-    
+
+
+class MatchMarkets(APIView): 
+    """ 
+    View to list the bet info of every market type (moneyline, handicap, total objects) of the match 
+    with given match id, for every bet object or only the one in the params 
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @cache_response(get_match_scopes)
+    def get(self, request, match_id: int, format=None) -> Response: 
+        # Every bet object, unless one is specified
+        bet_object = request.query_params.get("bet_object")
+        bet_objects = [bet_object] if bet_object else [choice for choice, _ in BET_OBJECT_CHOICES]
+
+        match = get_object_or_404(Match, match_id=match_id)
+        time_type_map = {value: key for key, value in TYPE_MAP.items()}
+
+        # The bet info of each market of each bet object, for halftime and fulltime
+        response_data = {
+            bet_object: {
+                market: {"half_time": [], "full_time": []} 
+                for market in ["moneyline", "handicap", "total_objects"]
+            }
+            for bet_object in bet_objects
+        }
+        for market, info_class, serializer_class in [
+            ("moneyline", MoneylineBetInfo, MoneylineBetInfoReadSerializer), 
+            ("handicap", HandicapBetInfo, HandicapBetInfoReadSerializer), 
+            ("total_objects", TotalObjectsBetInfo, TotalObjectsBetInfoReadSerializer), 
+        ]: 
+            # List of bet info of this market, one query for all bet objects and time types
+            info_list = info_class.objects.filter(match=match, bet_object__in=bet_objects).order_by("pk")
+            for info_data in serializer_class(info_list).data: 
+                time_type = time_type_map[info_data["time_type"]]
+                response_data[info_data["bet_object"]][market][time_type].append(info_data)
+
+        # Group the handicap and total objects bet info like their own views 
+        for markets_data in response_data.values(): 
+            for time_type in ["half_time", "full_time"]: 
+                markets_data["handicap"][time_type] = HandicapInfoList.group_handicap_info(
+                    markets_data["handicap"][time_type], match.home_team)
+                markets_data["total_objects"][time_type] = TotalObjectsInfoList.group_total_objects_info(
+                    markets_data["total_objects"][time_type])
+        return Response(response_data)
@@ -0,0 +1,45 @@
+"""
+VIEWS OF THE PERFORMANCE METRICS (SCRAPED BY PROMETHEUS) AND OF THE TELEMETRY OF THE TASKS
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.validators import ValidationError
+from rest_framework.views import APIView
+from soccerapp.metrics import merge_snapshots, read_snapshots, render_metrics
+from soccerapp.telemetry import get_task_run_summary
+
+
+class Metrics(View):
+    """ View of the metrics of every process, in the Prometheus text format """
+    http_method_names = ["get"]
+
+    def get(self, request) -> HttpResponse:
+        # the metrics aren't public, they're only served to the scraper with the token
+        metrics_token = getattr(settings, "METRICS_TOKEN", "")
+        if not metrics_token:
+            return HttpResponse(status=404)
+        if request.headers.get("Authorization") != f"Bearer {metrics_token}":
+            return HttpResponse(status=401)
+
+        return HttpResponse(
+            render_metrics(merge_snapshots(read_snapshots())),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class TaskRunSummary(APIView):
+    """ View of the summary of the runs of the Celery tasks, by task and league, for the admins """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request) -> Response:
+        days = request.query_params.get("days", "7")
+        if not days.isdigit() or int(days) == 0:
+            raise ValidationError({"error": "Days is not valid", "detail": "Days must be a positive number"})
+
+        return Response(get_task_run_summary(timezone.now() - timedelta(days=int(days))))
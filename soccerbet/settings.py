@@ -55,7 +55,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # the user of the token is only queried when the view needs more than its id and username
+        'soccerapp.authentication.JWTLazyUserAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'soccerapp.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 }
 
@@ -65,10 +70,19 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_LIFETIME': timedelta(days=30),
     'SLIDING_TOKEN_REFRESH_LIFETIME_LATE_USER': timedelta(days=1),
     'SLIDING_TOKEN_LIFETIME_LATE_USER': timedelta(days=30),
+    # the refresh and the logout check the blacklist filter of the process (see soccerapp/tokens.py)
+    'TOKEN_REFRESH_SERIALIZER': 'soccerapp.tokens.RefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'soccerapp.tokens.LogoutSerializer',
 }
+# Seconds between the loads of the tokens blacklisted by the other processes
+TOKEN_BLACKLIST_REFRESH_INTERVAL = env.int("TOKEN_BLACKLIST_REFRESH_INTERVAL", default=30)
 
 
 MIDDLEWARE = [
+    # first, so it measures the whole request
+    'soccerapp.middleware.MetricsMiddleware',
+    'soccerapp.middleware.TracingMiddleware',
+    'soccerapp.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -126,6 +140,72 @@ DATABASES = {
 }
 
 
+# Cache of the responses of the public read endpoints (see soccerapp/response_cache.py).
+# It has to be shared by the web and worker processes, e.g. CACHE_URL=rediscache://127.0.0.1:6379/1
+CACHES = {
+    "default": env.cache("CACHE_URL", default="filecache:///tmp/soccerbet_cache"),
+}
+RESPONSE_CACHE_TIMEOUT = env.int("RESPONSE_CACHE_TIMEOUT", default=60 * 60) # in seconds
+RESPONSE_CACHE_LOCAL_SIZE = env.int("RESPONSE_CACHE_LOCAL_SIZE", default=512) # responses per process
+# Cache-Control of the public responses, for the clients and for the CDN (in seconds)
+RESPONSE_MAX_AGE = env.int("RESPONSE_MAX_AGE", default=60)
+RESPONSE_SHARED_MAX_AGE = env.int("RESPONSE_SHARED_MAX_AGE", default=60)
+
+
+# Route the public read endpoints to their async views (see soccerapp/views/async_views.py),
+# for the ASGI deployment with the uvicorn workers
+ASYNC_READ_VIEWS = env.bool("ASYNC_READ_VIEWS", default=False)
+
+
+# Backend of the real-time events (see soccerapp/events.py). The events of the Celery workers only reach
+# the servers with soccerapp.events.PostgresBackend
+EVENTS_BACKEND = env("EVENTS_BACKEND", default="soccerapp.events.InMemoryBackend")
+EVENTS_HEARTBEAT = env.int("EVENTS_HEARTBEAT", default=15) # seconds between the keep-alive comments
+EVENTS_QUEUE_SIZE = env.int("EVENTS_QUEUE_SIZE", default=100) # events queued per client
+
+
+# Metrics of the requests (see soccerapp/metrics.py). Each process writes them to its file in the directory,
+# which has to be shared by the workers of the server
+METRICS_DIR = env("METRICS_DIR", default="/tmp/soccerbet_metrics")
+METRICS_FLUSH_INTERVAL = env.int("METRICS_FLUSH_INTERVAL", default=5) # in seconds
+METRICS_TOKEN = env("METRICS_TOKEN", default="") # bearer token of the scraper, /metrics is off without it
+
+
+# Tracing of the requests and the tasks (see soccerapp/tracing.py), written to the rotating JSON lines file
+# of each process, next to the file (e.g. spans.<pid>.jsonl)
+TRACING_ENABLED = env.bool("TRACING_ENABLED", default=False)
+TRACING_FILE = env("TRACING_FILE", default="/tmp/soccerbet_traces/spans.jsonl")
+TRACING_MAX_BYTES = env.int("TRACING_MAX_BYTES", default=10 * 1024 * 1024) # rotated at 10MB
+TRACING_BACKUP_COUNT = env.int("TRACING_BACKUP_COUNT", default=5)
+
+
+# Profiling of the slow requests and tasks (see soccerapp/profiling.py). When enabled, the sampled requests
+# and runs over the threshold are profiled, the others only with the header X-Profile, or the tasks sent
+# with the header profile (apply_profiled)
+PROFILING_ENABLED = env.bool("PROFILING_ENABLED", default=False)
+PROFILING_SAMPLE_RATE = env.float("PROFILING_SAMPLE_RATE", default=0.01) # fraction of the requests and runs
+PROFILING_THRESHOLD = env.float("PROFILING_THRESHOLD", default=1.0) # in seconds
+PROFILING_INTERVAL = env.float("PROFILING_INTERVAL", default=0.005) # seconds between the samples of the stack
+PROFILING_MODE = env("PROFILING_MODE", default="sampling") # or cprofile
+PROFILING_DIR = env("PROFILING_DIR", default="/tmp/soccerbet_profiles")
+PROFILING_MAX_FILES = env.int("PROFILING_MAX_FILES", default=100) # the older profiles are deleted
+PROFILING_TOKEN = env("PROFILING_TOKEN", default="") # value of the header X-Profile, the header is ignored without it
+
+
+# Log of the slow queries of the servers and the workers (see soccerapp/querylog.py), with the plans of a sample,
+# to the rotating file of each process next to the file (e.g. slow_queries.<pid>.jsonl)
+SLOW_QUERY_LOG_ENABLED = env.bool("SLOW_QUERY_LOG_ENABLED", default=False)
+SLOW_QUERY_THRESHOLD = env.float("SLOW_QUERY_THRESHOLD", default=0.1) # in seconds
+SLOW_QUERY_EXPLAIN_RATE = env.float("SLOW_QUERY_EXPLAIN_RATE", default=0.1) # fraction of the slow queries explained
+SLOW_QUERY_FILE = env("SLOW_QUERY_FILE", default="/tmp/soccerbet_queries/slow_queries.jsonl")
+SLOW_QUERY_MAX_BYTES = env.int("SLOW_QUERY_MAX_BYTES", default=10 * 1024 * 1024) # rotated at 10MB
+SLOW_QUERY_BACKUP_COUNT = env.int("SLOW_QUERY_BACKUP_COUNT", default=5)
+
+
+# Transport of the calls to API-Football (see soccerapp/api.py): the real API, or the fake one answering
+# from the seed without the network (soccerapp.factories.fake_api_football) for the tests and the benchmarks
+API_FOOTBALL_TRANSPORT = env("API_FOOTBALL_TRANSPORT", default="soccerapp.api.request_api_football")
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -168,6 +248,10 @@ CELERY_TASK_TRACK_STARTED = True
 #CELERY_RESULT_BACKEND = env("BROKER_URL")
 
 
+# Archive of the purged matches and bets (see soccerapp/archive.py)
+ARCHIVE_DIR = Path(env("ARCHIVE_DIR", default=str(BASE_DIR / "archive")))
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from soccerapp.views import Metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('soccerapp/', include('soccerapp.urls'))
+    path('soccerapp/', include('soccerapp.urls')),
+    path('metrics', Metrics.as_view()), # the metrics of the requests for Prometheus
 ]